@@ -0,0 +1,37 @@
+"""
+Сравнение двух JSON-отчётов bench/run.py.
+
+    python bench/compare.py bench/results/old.json bench/results/new.json
+"""
+import json
+import sys
+
+METRICS = ("p50_ms", "p99_ms", "throughput_ops", "db_calls_per_update")
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return {(r["scenario"], r["members"]): r for r in report["results"]}
+
+def delta(old: float, new: float) -> str:
+    if not old:
+        return "   n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(2)
+
+    old, new = load(sys.argv[1]), load(sys.argv[2])
+
+    for key in sorted(old.keys() & new.keys()):
+        scenario, members = key
+        cells = [
+            f"{m}={new[key][m]} ({delta(old[key][m], new[key][m])})"
+            for m in METRICS
+        ]
+        print(f"{scenario:>14} n={members:<7} " + "  ".join(cells))
+
+if __name__ == "__main__":
+    main()
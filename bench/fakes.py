@@ -0,0 +1,400 @@
+"""
+Локальные подделки Telegram Bot API и PostgREST для бенчмарков.
+
+FakeBotSession подменяет сессию aiogram-бота, FakePostgrest — транспорт
+httpx-клиента supabase. Обе умеют добавлять задержку и считают вызовы.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from urllib.parse import unquote
+
+import httpx
+
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import (
+    EditMessageText,
+    GetChatAdministrators,
+    GetChatMember,
+    SendDocument,
+    SendMessage,
+)
+from aiogram.types import (
+    Chat,
+    ChatMemberAdministrator,
+    ChatMemberLeft,
+    ChatMemberMember,
+    Message,
+    User,
+)
+
+UNIQUE_KEYS = {
+    "members": ("chat_id", "user_id"),
+    "tmplist_items": ("tmplist_id", "user_id"),
+    "roster_messages": ("chat_id",),
+    "member_daily_stats": ("chat_id", "day"),
+    "member_active_days": ("chat_id", "day", "user_id"),
+    "reconciler_state": ("name",),
+}
+
+UUID_TABLES = {"tmplists", "chat_links"}
+
+class FakeBotSession(BaseSession):
+    """
+    Bot API без сети: отвечает правдоподобными объектами на нужные боту методы.
+    admin_ids — кто считается админом (id бота добавляется автоматически),
+    left_ratio — доля участников, которых getChatMember считает ушедшими.
+    """
+
+    def __init__(self, latency: float = 0.0, admin_ids: set[int] | None = None, left_ratio: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.admin_ids = admin_ids or set()
+        self.left_every = int(1 / left_ratio) if left_ratio else 0
+        self.calls: Counter = Counter()
+        self._message_id = 0
+
+    def _message(self, bot, chat_id, text: str | None = None) -> Message:
+        # Как настоящая сессия: ответ привязан к боту, на нём можно звать edit_text и т.п.
+        self._message_id += 1
+        return Message(
+            message_id=self._message_id,
+            date=datetime.now(),
+            chat=Chat(id=chat_id, type="supergroup"),
+            text=text,
+        ).as_(bot)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if isinstance(method, GetChatAdministrators):
+            return [
+                ChatMemberAdministrator(
+                    user=User(id=uid, is_bot=uid == bot.id, first_name=f"admin{uid}"),
+                    can_be_edited=False,
+                    is_anonymous=False,
+                    can_manage_chat=True,
+                    can_delete_messages=True,
+                    can_manage_video_chats=True,
+                    can_restrict_members=True,
+                    can_promote_members=True,
+                    can_change_info=True,
+                    can_invite_users=True,
+                )
+                for uid in self.admin_ids | {bot.id}
+            ]
+
+        if isinstance(method, GetChatMember):
+            user = User(id=method.user_id, is_bot=False, first_name=f"User {method.user_id}", username=f"user{method.user_id}")
+            if self.left_every and method.user_id % self.left_every == 0:
+                return ChatMemberLeft(user=user)
+            return ChatMemberMember(user=user)
+
+        if isinstance(method, (SendMessage, EditMessageText)):
+            return self._message(bot, method.chat_id, method.text)
+
+        if isinstance(method, SendDocument):
+            return self._message(bot, method.chat_id)
+
+        return True
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+class FakePostgrest:
+    """
+    Минимальный PostgREST в памяти: фильтры eq/neq/in/lt/lte/gt/gte/is, select,
+    order, limit/offset, count=exact, insert/upsert/update/delete и уникальные ключи.
+    Ответ на select обрезается до max_rows строк, как в supabase/config.toml.
+    Версии чатов (chat_versions), дневные агрегаты member_events и уведомления
+    в шину ведутся так же, как триггерами в Postgres.
+    Используется как httpx-транспорт: FakePostgrest().transport().
+    fail_rate — доля запросов, на которые отвечает 503; latency больше таймаута
+    клиента превращается в httpx.ReadTimeout после ожидания таймаута, как у живого сервера.
+    """
+
+    def __init__(self, latency: float = 0.0, bus=None, fail_rate: float = 0.0, max_rows: int = 1000):
+        self.latency = latency
+        self.max_rows = max_rows
+        self.fail_rate = fail_rate
+        self._random = random.Random(0)
+        self.bus = bus
+        self.tables: dict[str, dict[int, dict]] = defaultdict(dict)
+        self._by_chat: dict[str, dict] = defaultdict(lambda: defaultdict(dict))
+        self._unique: dict[str, dict] = defaultdict(dict)
+        self.calls: Counter = Counter()
+        self._ids: Counter = Counter()
+        self.versions: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def seed(self, table: str, rows: list[dict]):
+        with self._lock:
+            for row in rows:
+                self._insert_row(table, dict(row))
+
+    def _insert_row(self, table: str, row: dict) -> dict:
+        if "id" not in row:
+            if table in UUID_TABLES:
+                row["id"] = str(uuid.uuid4())
+            else:
+                self._ids[table] += 1
+                row["id"] = self._ids[table]
+        elif isinstance(row["id"], int):
+            self._ids[table] = max(self._ids[table], row["id"])
+
+        if table == "members":
+            row.setdefault("updated_at", _now())
+            _derive_member(row)
+        if table == "tmplists":
+            row.setdefault("is_active", True)
+        if table == "chat_links":
+            row.setdefault("is_active", True)
+
+        self.tables[table][id(row)] = row
+        if "chat_id" in row:
+            self._by_chat[table][_as_text(row["chat_id"])][id(row)] = row
+        if table in UNIQUE_KEYS:
+            self._unique[table][_unique_key(table, row)] = row
+        return row
+
+    def _delete_rows(self, table: str, rows: list[dict]):
+        for row in rows:
+            self.tables[table].pop(id(row), None)
+            if "chat_id" in row:
+                self._by_chat[table][_as_text(row["chat_id"])].pop(id(row), None)
+            if table in UNIQUE_KEYS:
+                self._unique[table].pop(_unique_key(table, row), None)
+
+    def _bump_versions(self, table: str, rows: list[dict]):
+        chat_ids = {int(r["chat_id"]) for r in rows if r.get("chat_id") is not None}
+
+        if table == "members":
+            for chat_id in chat_ids:
+                self.versions[chat_id] += 1
+
+        if self.bus is not None and table in NOTIFY_TABLES:
+            for chat_id in chat_ids:
+                self.bus.publish(table, chat_id, source="fake")
+
+    def _aggregate_events(self, rows: list[dict]):
+        for event in rows:
+            chat_id, day = event["chat_id"], event["created_at"][:10]
+            if event["kind"] == "active":
+                key = (_as_text(chat_id), day, _as_text(event["user_id"]))
+                if key in self._unique["member_active_days"]:
+                    continue
+                self._insert_row("member_active_days", {"chat_id": chat_id, "day": day, "user_id": event["user_id"]})
+
+            stats = self._unique["member_daily_stats"].get((_as_text(chat_id), day))
+            if stats is None:
+                stats = self._insert_row("member_daily_stats", {
+                    "chat_id": chat_id, "day": day, "joins": 0, "leaves": 0, "active": 0,
+                })
+            stats[{"join": "joins", "leave": "leaves", "active": "active"}[event["kind"]]] += 1
+
+    def _chat_versions(self) -> list[dict]:
+        """chat_versions как таблица: засеянные напрямую чаты тоже в ней, как после backfill миграции."""
+        chat_ids = {int(c) for c, rows in self._by_chat["members"].items() if rows} | set(self.versions)
+        return [{"chat_id": chat_id, "version": self.versions[chat_id]} for chat_id in chat_ids]
+
+    def _rpc(self, name: str, args: dict) -> httpx.Response:
+        if name == "get_chat_versions":
+            data = [
+                {"chat_id": chat_id, "version": self.versions[chat_id], "updated_at": None}
+                for chat_id in args.get("p_chat_ids") or []
+                if chat_id in self.versions
+            ]
+            return httpx.Response(200, json=data)
+        return httpx.Response(404, json={"message": f"function {name} not found"})
+
+    def _candidates(self, table: str, params: list[tuple[str, str]]):
+        key = UNIQUE_KEYS.get(table)
+        if key:
+            eq = {c: e[3:] for c, e in params if e.startswith("eq.")}
+            if all(k in eq for k in key):
+                row = self._unique[table].get(tuple(eq[k] for k in key))
+                return [row] if row else []
+
+        for column, expr in params:
+            if column == "chat_id" and expr.startswith("eq."):
+                return self._by_chat[table].get(expr[3:], {}).values()
+        return self.tables[table].values()
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            timeout = (request.extensions.get("timeout") or {}).get("read")
+            if timeout is not None and self.latency > timeout:
+                time.sleep(timeout)
+                raise httpx.ReadTimeout("fake read timeout", request=request)
+            time.sleep(self.latency)
+
+        if self.fail_rate and self._random.random() < self.fail_rate:
+            return httpx.Response(503, text="upstream unavailable")
+
+        table = request.url.path.split("/rest/v1/", 1)[-1]
+        self.calls[(table, request.method)] += 1
+
+        params = list(request.url.params.multi_items())
+        prefer = request.headers.get("prefer", "")
+
+        with self._lock:
+            if table.startswith("rpc/"):
+                return self._rpc(table[4:], json.loads(request.content or b"{}"))
+
+            if table == "chat_versions":
+                candidates = self._chat_versions()
+            else:
+                candidates = self._candidates(table, params)
+            rows = [r for r in candidates if _matches(r, params)]
+
+            if request.method == "GET":
+                total = len(rows)
+                rows = _order(rows, dict(params).get("order"))
+                offset = int(dict(params).get("offset", 0))
+                limit = dict(params).get("limit")
+                rows = rows[offset:offset + int(limit)] if limit else rows[offset:]
+                # Как db-max-rows у настоящего PostgREST: больше за один ответ не отдаётся
+                rows = rows[:self.max_rows]
+                data = _project(rows, dict(params).get("select", "*"))
+                headers = {"Content-Range": f"0-{max(len(data) - 1, 0)}/{total}" if "count=" in prefer else f"0-{max(len(data) - 1, 0)}/*"}
+                return httpx.Response(200, json=data, headers=headers)
+
+            if request.method == "POST":
+                payload = json.loads(request.content or b"[]")
+                payload = payload if isinstance(payload, list) else [payload]
+                result = []
+                for item in payload:
+                    existing = self._unique[table].get(_unique_key(table, item)) if table in UNIQUE_KEYS else None
+                    if existing is not None:
+                        if "ignore-duplicates" in prefer:
+                            continue
+                        if "merge-duplicates" not in prefer:
+                            return _conflict(table)
+                        existing.update(item)
+                        if table == "members":
+                            existing["updated_at"] = _now()
+                            _derive_member(existing)
+                        result.append(existing)
+                    else:
+                        result.append(self._insert_row(table, dict(item)))
+                if table == "member_events":
+                    self._aggregate_events(result)
+                self._bump_versions(table, result)
+                return httpx.Response(201, json=result)
+
+            if request.method == "PATCH":
+                payload = json.loads(request.content or b"{}")
+                for row in rows:
+                    row.update(payload)
+                    if table == "members":
+                        row["updated_at"] = _now()
+                        _derive_member(row)
+                self._bump_versions(table, rows)
+                return httpx.Response(200, json=rows)
+
+            if request.method == "DELETE":
+                self._delete_rows(table, rows)
+                if table == "members":
+                    for row in rows:
+                        self._insert_row("member_tombstones", {
+                            "member_id": row["id"],
+                            "chat_id": row.get("chat_id"),
+                            "user_id": row.get("user_id"),
+                            "deleted_at": _now(),
+                        })
+                self._bump_versions(table, rows)
+                return httpx.Response(200, json=rows)
+
+        return httpx.Response(405, json={"message": "method not allowed"})
+
+NOTIFY_TABLES = ("members", "tmplists")
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="microseconds")
+
+def _conflict(table: str) -> httpx.Response:
+    return httpx.Response(409, json={
+        "code": "23505",
+        "message": f'duplicate key value violates unique constraint on "{table}"',
+        "details": None,
+        "hint": None,
+    })
+
+def _unique_key(table: str, row: dict) -> tuple:
+    return tuple(_as_text(row.get(k)) for k in UNIQUE_KEYS[table])
+
+def _as_text(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+def _compare(left, right: str) -> int:
+    try:
+        a, b = float(left), float(right)
+    except (TypeError, ValueError):
+        a, b = _as_text(left), right
+    return (a > b) - (a < b)
+
+def _matches(row: dict, params: list[tuple[str, str]]) -> bool:
+    for column, expr in params:
+        if column in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+            continue
+
+        op, _, value = expr.partition(".")
+        value = unquote(value)
+        current = row.get(column)
+
+        if op == "eq" and _as_text(current) != value:
+            return False
+        if op == "neq" and _as_text(current) == value:
+            return False
+        if op == "is" and _as_text(current) != value:
+            return False
+        if op == "in":
+            options = {v.strip().strip('"') for v in value.strip("()").split(",")}
+            if _as_text(current) not in options:
+                return False
+        if op in ("lt", "lte", "gt", "gte"):
+            if current is None:
+                return False
+            c = _compare(current, value)
+            if (
+                (op == "lt" and not c < 0) or (op == "lte" and not c <= 0)
+                or (op == "gt" and not c > 0) or (op == "gte" and not c >= 0)
+            ):
+                return False
+    return True
+
+def _order(rows: list[dict], order: str | None) -> list[dict]:
+    if not order:
+        return rows
+    for part in reversed(order.split(",")):
+        column, *mods = part.split(".")
+        rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column)), reverse="desc" in mods)
+    return rows
+
+def _derive_member(row: dict):
+    """Генерируемая колонка members.username_lower."""
+    row["username_lower"] = (row.get("username") or "").lower()
+
+def _project(rows: list[dict], select: str) -> list[dict]:
+    columns = [c.strip() for c in select.split(",") if c.strip()]
+    if not columns or "*" in columns:
+        return [dict(r) for r in rows]
+    return [{c: r.get(c) for c in columns} for r in rows]
@@ -0,0 +1,213 @@
+"""
+Запуск настоящих хендлеров dp в одном процессе поверх FakeBotSession и FakePostgrest.
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+BOT_DIR = BENCH_DIR.parent / "bot"
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHBENCHBENCHBENCHBENCHBENCHBENCH")
+os.environ.setdefault("SUPABASE_URL", "http://postgrest.bench")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("METRICS_PORT", "0")
+os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
+os.environ.setdefault("TRACE_SLOW_MS", "1e12")
+os.environ.setdefault("TRACE_LOG_PATH", os.devnull)
+
+sys.path.insert(0, str(BOT_DIR))
+
+import db  # noqa: E402
+from bus import BUS  # noqa: E402
+import handlers  # noqa: E402,F401
+from core import bot, dp  # noqa: E402
+from metrics import DB_REQUESTS  # noqa: E402
+from middlewares import setup_middlewares, setup_session_middlewares  # noqa: E402
+from storage.sqlite_backend import SqliteRepository  # noqa: E402
+
+from fakes import FakeBotSession, FakePostgrest  # noqa: E402
+
+ADMIN_ID = 1
+
+logging.getLogger().setLevel(logging.WARNING)
+logging.getLogger("aiogram").setLevel(logging.WARNING)
+
+# Middleware dp — один раз на процесс: каждый Harness иначе добавлял бы ещё по копии
+setup_middlewares(dp, bot)
+
+class Harness:
+    """
+    backend="postgrest" — настоящий SupabaseRepository поверх FakePostgrest,
+    backend="sqlite" — SqliteRepository в памяти (db_latency не применяется).
+    bus=True — FakePostgrest шлёт уведомления в локальную шину, как триггеры
+    pg_notify, и кэши живут с длинным TTL (только для postgrest).
+    db_fail_rate — доля запросов к FakePostgrest, завершающихся 503.
+    """
+
+    def __init__(
+        self,
+        backend: str = "postgrest",
+        db_latency: float = 0.0,
+        tg_latency: float = 0.0,
+        left_ratio: float = 0.0,
+        bus: bool = False,
+        db_fail_rate: float = 0.0,
+    ):
+        self.session = FakeBotSession(latency=tg_latency, admin_ids={ADMIN_ID}, left_ratio=left_ratio)
+
+        if backend == "sqlite":
+            self.backend = None
+            self.sqlite = SqliteRepository(":memory:")
+            db.repo.use(self.sqlite)
+        else:
+            self.backend = FakePostgrest(latency=db_latency, bus=BUS if bus else None, fail_rate=db_fail_rate)
+            self.sqlite = None
+            db.repo.use(db.create_repository())
+            db.repo.backend.client.postgrest.session._transport = self.backend.transport()
+
+        BUS.set_connected(bus and backend != "sqlite")
+        bot.session = self.session
+        setup_session_middlewares(self.session)
+
+    def seed_members(self, rows: list[dict]):
+        if self.backend is not None:
+            self.backend.seed("members", rows)
+            return
+
+        columns = ("chat_id", "user_id", "username", "full_name", "external_name", "extra_role")
+        with self.sqlite._lock:
+            self.sqlite.conn.executemany(
+                f"INSERT OR IGNORE INTO members ({','.join(columns)}) VALUES ({','.join('?' * len(columns))})",
+                [tuple(row.get(c, "") for c in columns) for row in rows],
+            )
+
+    def round_trips(self) -> tuple[int, int]:
+        return int(DB_REQUESTS.total()), sum(self.session.calls.values())
+
+    async def feed(self, update: dict) -> float:
+        start = time.perf_counter()
+        await dp.feed_raw_update(bot, update)
+        return time.perf_counter() - start
+
+    async def run(self, updates, concurrency: int = 1) -> dict:
+        """Прогоняет апдейты через dp и возвращает сводку по задержкам."""
+        updates = list(updates)
+        latencies: list[float] = []
+        errors = 0
+        db_before, tg_before = self.round_trips()
+        queue = iter(updates)
+
+        async def worker():
+            nonlocal errors
+            for update in queue:
+                start = time.perf_counter()
+                try:
+                    await dp.feed_raw_update(bot, update)
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+        db_after, tg_after = self.round_trips()
+        return summarize(latencies, wall, errors, db_after - db_before, tg_after - tg_before)
+
+async def cancel_background_tasks():
+    current = asyncio.current_task()
+    tasks = [t for t in asyncio.all_tasks() if t is not current]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(latencies: list[float], wall: float, errors: int, db_calls: int, tg_calls: int) -> dict:
+    n = len(latencies)
+    return {
+        "updates": n,
+        "errors": errors,
+        "wall_s": round(wall, 4),
+        "throughput_ops": round(n / wall, 2) if wall else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if n else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if n else 0.0,
+        "db_calls_per_update": round(db_calls / n, 2) if n else 0.0,
+        "tg_calls_per_update": round(tg_calls / n, 2) if n else 0.0,
+    }
+
+_update_id = 0
+
+def _next_update_id() -> int:
+    global _update_id
+    _update_id += 1
+    return _update_id
+
+def make_user(user_id: int) -> dict:
+    return {
+        "id": user_id,
+        "is_bot": False,
+        "first_name": f"User {user_id}",
+        "username": f"user{user_id}",
+    }
+
+def message_update(chat_id: int, user_id: int, text: str) -> dict:
+    entities = []
+    if text.startswith("/"):
+        entities.append({"type": "bot_command", "offset": 0, "length": len(text.split()[0])})
+
+    update_id = _next_update_id()
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "supergroup", "title": "bench"},
+            "from": make_user(user_id),
+            "text": text,
+            **({"entities": entities} if entities else {}),
+        },
+    }
+
+def callback_update(chat_id: int, user_id: int, data: str, message_id: int = 1) -> dict:
+    update_id = _next_update_id()
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": make_user(user_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup", "title": "bench"},
+                "text": "📋 Список участников",
+            },
+        },
+    }
+
+def chat_member_update(chat_id: int, user_id: int, old: str, new: str) -> dict:
+    return {
+        "update_id": _next_update_id(),
+        "chat_member": {
+            "chat": {"id": chat_id, "type": "supergroup", "title": "bench"},
+            "from": make_user(user_id),
+            "date": int(time.time()),
+            "old_chat_member": {"status": old, "user": make_user(user_id)},
+            "new_chat_member": {"status": new, "user": make_user(user_id)},
+        },
+    }
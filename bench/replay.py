@@ -0,0 +1,116 @@
+"""
+Воспроизведение записанных апдейтов (RECORD_UPDATES_PATH) через dp.feed_raw_update.
+
+    python bench/replay.py updates.jsonl --speed 10 --seed-members --db-latency-ms 20
+
+--speed 1 — в реальном времени, 10 — в 10 раз быстрее, 0 — без пауз.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from collections import defaultdict
+
+from harness import Harness, cancel_background_tasks, summarize
+
+UPDATE_TYPES = (
+    "message", "edited_message", "callback_query", "chat_member",
+    "my_chat_member", "inline_query",
+)
+
+def load(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def update_type(update: dict) -> str:
+    return next((t for t in UPDATE_TYPES if t in update), "other")
+
+def seed_rows(records: list[dict]) -> list[dict]:
+    """Участники, встречающиеся в записи, — чтобы /list и /find работали на похожих объёмах."""
+    seen: dict[tuple[int, int], dict] = {}
+    for record in records:
+        body = record["update"].get(update_type(record["update"]))
+        if not isinstance(body, dict):
+            continue
+        chat = body.get("chat") or (body.get("message") or {}).get("chat")
+        user = body.get("from")
+        if not chat or not user or user.get("is_bot"):
+            continue
+        seen.setdefault((chat["id"], user["id"]), {
+            "chat_id": chat["id"],
+            "user_id": user["id"],
+            "username": user.get("username", ""),
+            "full_name": user.get("first_name", ""),
+            "external_name": "",
+            "extra_role": "",
+        })
+    return list(seen.values())
+
+async def replay(args) -> dict:
+    records = load(args.path)
+    harness = Harness(
+        backend=args.backend,
+        db_latency=args.db_latency_ms / 1000,
+        tg_latency=args.tg_latency_ms / 1000,
+    )
+    if args.seed_members:
+        harness.seed_members(seed_rows(records))
+
+    latencies: list[float] = []
+    by_type: dict[str, list[float]] = defaultdict(list)
+    errors = 0
+    db_before, tg_before = harness.round_trips()
+
+    async def feed(update: dict):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            await harness.feed(update)
+        except Exception:
+            errors += 1
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        by_type[update_type(update)].append(elapsed)
+
+    tasks = []
+    started = time.perf_counter()
+    for record in records:
+        if args.speed:
+            delay = started + record["t"] / args.speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(feed(record["update"])))
+
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+    await cancel_background_tasks()
+
+    db_after, tg_after = harness.round_trips()
+    report = summarize(latencies, wall, errors, db_after - db_before, tg_after - tg_before)
+    report["by_type"] = {
+        name: summarize(values, wall, 0, 0, 0) for name, values in by_type.items()
+    }
+    report["speed"] = args.speed
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--seed-members", action="store_true")
+    parser.add_argument("--backend", choices=("postgrest", "sqlite"), default="postgrest")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--tg-latency-ms", type=float, default=0.0)
+    parser.add_argument("--out", default="")
+    args = parser.parse_args()
+
+    report = asyncio.run(replay(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Бенчмарк хендлеров бота на синтетических чатах.
+
+    python bench/run.py --sizes 100,10000 --db-latency-ms 20 --out bench/results/HEAD.json
+
+Результаты пишутся в JSON, сравнить два прогона: python bench/compare.py old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+
+from harness import (
+    ADMIN_ID,
+    BENCH_DIR,
+    Harness,
+    callback_update,
+    cancel_background_tasks,
+    message_update,
+)
+
+DEFAULT_SIZES = (100, 10_000, 100_000)
+
+def member_rows(chat_id: int, size: int) -> list[dict]:
+    rows = []
+    for uid in range(1, size + 1):
+        rows.append({
+            "id": uid,
+            "chat_id": chat_id,
+            "user_id": uid,
+            "username": f"user{uid}",
+            "full_name": f"User {uid}",
+            "external_name": f"Ext{uid}" if uid % 3 == 0 else "",
+            "extra_role": "Officer" if uid % 25 == 0 else "",
+            "created_at": "2026-01-01T00:00:00",
+        })
+    return rows
+
+def scenarios(chat_id: int, size: int, iterations: int) -> dict:
+    rnd = random.Random(size)
+
+    def tmplist_text(i: int) -> str:
+        mentions = " ".join(f"@user{rnd.randint(1, size)}" for _ in range(10))
+        return f"/tmplist raid{i % 3 + 1} {mentions}"
+
+    def flood_user() -> int:
+        # 80% пишут уже известные участники, 20% — новые
+        return rnd.randint(1, size) if rnd.random() < 0.8 else size + rnd.randint(1, size)
+
+    return {
+        "list": ([message_update(chat_id, ADMIN_ID, "/list") for _ in range(iterations)], 1),
+        "page_flip": ([callback_update(chat_id, ADMIN_ID, f"list_page:{i % 3 + 1}") for i in range(iterations)], 1),
+        "find": ([message_update(chat_id, ADMIN_ID, f"/find user{rnd.randint(1, 99)}") for _ in range(iterations)], 1),
+        "export": ([message_update(chat_id, ADMIN_ID, "/export n") for _ in range(max(1, iterations // 5))], 1),
+        "export_xlsx": ([message_update(chat_id, ADMIN_ID, "/export n xlsx") for _ in range(max(1, iterations // 5))], 1),
+        "tmplist": ([message_update(chat_id, ADMIN_ID, tmplist_text(i)) for i in range(iterations)], 1),
+        "auto_register": ([message_update(chat_id, flood_user(), "hello") for _ in range(iterations * 10)], 32),
+        "cleanup": ([message_update(chat_id, ADMIN_ID, "/cleanup")], 1),
+        "stats": ([message_update(chat_id, ADMIN_ID, "/stats") for _ in range(iterations)], 1),
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+async def bench(args) -> dict:
+    results = []
+    selected = set(args.scenarios.split(",")) if args.scenarios else None
+
+    for size in args.sizes:
+        chat_id = -100_000_000 - size
+        harness = Harness(
+            backend=args.backend,
+            db_latency=args.db_latency_ms / 1000,
+            tg_latency=args.tg_latency_ms / 1000,
+            left_ratio=0.01,
+            bus=args.bus,
+            db_fail_rate=args.db_fail_rate,
+        )
+        harness.seed_members(member_rows(chat_id, size))
+
+        for name, (updates, concurrency) in scenarios(chat_id, size, args.iterations).items():
+            if selected and name not in selected:
+                continue
+
+            summary = await harness.run(updates, concurrency=concurrency)
+            await cancel_background_tasks()
+
+            results.append({"scenario": name, "members": size, "concurrency": concurrency, **summary})
+            print(
+                f"{name:>14} n={size:<7} p50={summary['p50_ms']:>9.2f}ms "
+                f"p99={summary['p99_ms']:>9.2f}ms {summary['throughput_ops']:>8.1f} op/s "
+                f"db/upd={summary['db_calls_per_update']} errors={summary['errors']}",
+                flush=True,
+            )
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "backend": args.backend,
+            "bus": args.bus,
+            "db_latency_ms": args.db_latency_ms,
+            "db_fail_rate": args.db_fail_rate,
+            "tg_latency_ms": args.tg_latency_ms,
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=list(DEFAULT_SIZES))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--scenarios", default="", help="через запятую; по умолчанию все")
+    parser.add_argument("--backend", choices=("postgrest", "sqlite"), default="postgrest")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--db-fail-rate", type=float, default=0.0, help="доля запросов к БД с ответом 503")
+    parser.add_argument("--tg-latency-ms", type=float, default=0.0)
+    parser.add_argument("--bus", action="store_true", help="шина инвалидации вместо опроса версий")
+    parser.add_argument("--out", default="")
+    args = parser.parse_args()
+
+    report = asyncio.run(bench(args))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"saved: {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import asyncio
+import time
+
+from config import TELEGRAM_BUDGET_RATE
+from metrics import TELEGRAM_BUDGET_WAIT
+
+class RequestBudget:
+    """
+    Общий на процесс бюджет запросов к Bot API (token bucket).
+    Каждый запрос списывает токен в TelegramMetricsMiddleware и никогда не ждёт:
+    пользовательские команды не тормозятся. Фоновые задачи перед запросом
+    ждут в wait(), пока бюджет не восстановится, — так они забирают только
+    свободную часть лимита. После 429 бюджет замораживается на retry_after.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def spend(self, amount: float = 1.0):
+        self._refill()
+        # Долг ограничен: после всплеска фоновые задачи ждут не дольше burst / rate
+        self.tokens = max(self.tokens - amount, -self.burst)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def wait(self, task: str):
+        started = time.monotonic()
+        while True:
+            self._refill()
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+            elif self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+            else:
+                break
+        TELEGRAM_BUDGET_WAIT.observe(time.monotonic() - started, task=task)
+
+# Ниже лимита Telegram (~30 запросов/с на бота) с запасом
+TELEGRAM_BUDGET = RequestBudget(TELEGRAM_BUDGET_RATE)
@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+from typing import Callable
+
+from config import BUS_DATABASE_URL, BUS_CHANNEL
+from logger import logger
+from metrics import BUS_EVENTS
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+RECONNECT_DELAY = 5.0
+KEEPALIVE_INTERVAL = 30.0
+
+class LocalBus:
+    """
+    Шина инвалидации внутри процесса. События — {"table": ..., "chat_id": ...}.
+    connected=True означает, что шина видит все записи в БД, и кэшам можно
+    держать длинный TTL: так её используют как замену Postgres в бенчмарках.
+    """
+
+    def __init__(self, connected: bool = False):
+        self.connected = connected
+        self._subscribers: list[Callable[[dict], None]] = []
+        self._state_listeners: list[Callable[[bool], None]] = []
+
+    def subscribe(self, callback: Callable[[dict], None]):
+        self._subscribers.append(callback)
+
+    def on_state(self, callback: Callable[[bool], None]):
+        self._state_listeners.append(callback)
+
+    def publish(self, table: str, chat_id: int, source: str = "local"):
+        BUS_EVENTS.inc(table=table, source=source)
+        event = {"table": table, "chat_id": chat_id}
+
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error("Ошибка подписчика шины (%s): %s", event, e)
+
+    def set_connected(self, connected: bool):
+        if self.connected == connected:
+            return
+        self.connected = connected
+
+        for callback in self._state_listeners:
+            try:
+                callback(connected)
+            except Exception as e:
+                logger.error("Ошибка подписчика состояния шины: %s", e)
+
+    async def run(self):
+        return
+
+class PostgresBus(LocalBus):
+    """
+    LISTEN на канал, в который пишут триггеры members/tmplists (pg_notify).
+    Пока соединения нет, connected=False и кэши живут с обычным TTL;
+    при каждом переподключении подписчики сбрасывают кэши — уведомления могли потеряться.
+    """
+
+    def __init__(self, dsn: str, channel: str = BUS_CHANNEL):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+            self.publish(event["table"], int(event["chat_id"]), source="postgres")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Некорректное уведомление шины %r: %s", payload, e)
+
+    async def run(self):
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                conn.add_termination_listener(lambda _: closed.set())
+                await conn.add_listener(self.channel, self._on_notify)
+
+                logger.info("Шина инвалидации подключена (LISTEN %s)", self.channel)
+                self.set_connected(True)
+
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), KEEPALIVE_INTERVAL)
+                    except asyncio.TimeoutError:
+                        await conn.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Шина инвалидации недоступна: %s", e)
+            finally:
+                self.set_connected(False)
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+
+            await asyncio.sleep(RECONNECT_DELAY)
+
+def create_bus() -> LocalBus:
+    if not BUS_DATABASE_URL:
+        return LocalBus()
+
+    if asyncpg is None:
+        logger.warning("BUS_DATABASE_URL задан, но asyncpg не установлен — работает только локальная шина")
+        return LocalBus()
+
+    return PostgresBus(BUS_DATABASE_URL)
+
+BUS = create_bus()
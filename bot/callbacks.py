@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import hmac
+import struct
+import time
+
+from collections import OrderedDict
+
+from config import BOT_TOKEN, CALLBACK_SECRET
+
+# Telegram принимает callback_data не длиннее 64 байт
+CALLBACK_DATA_LIMIT = 64
+CALLBACK_PREFIX = "su:"
+CALLBACK_TTL = 6 * 3600
+
+OPERATIONS = {"name": 1, "role": 2}
+OPERATION_NAMES = {code: name for name, code in OPERATIONS.items()}
+STORED_VALUE = 0x80
+# Значение в cp1251: кириллица занимает байт, а не два, как в UTF-8
+CP1251_VALUE = 0x40
+VALUE_FLAGS = STORED_VALUE | CP1251_VALUE
+
+# операция и флаги (1) | user_id (7) | истекает, минуты от CALLBACK_EPOCH (3);
+# дальше значение, в конце подпись. ID в Telegram занимают до 52 бит, 3 байта минут хватает до 2055 года
+OPERATION_SIZE = 1
+USER_ID_SIZE = 7
+EXPIRES_SIZE = 3
+HEADER_SIZE = OPERATION_SIZE + USER_ID_SIZE + EXPIRES_SIZE
+CALLBACK_EPOCH = 1_704_067_200  # 2024-01-01 UTC
+# 48 бит подписи: перебор упирается в Telegram, а кнопка живёт не дольше CALLBACK_TTL
+MAC_SIZE = 6
+STORE_KEY_SIZE = 8
+
+# Сколько байт остаётся на значение после префикса и base64 без паддинга
+INLINE_VALUE_LIMIT = (CALLBACK_DATA_LIMIT - len(CALLBACK_PREFIX)) * 3 // 4 - HEADER_SIZE - MAC_SIZE
+
+# Значения, не влезающие в callback_data: ключ — хэш значения, размер ограничен
+VALUE_STORE: OrderedDict[bytes, str] = OrderedDict()
+VALUE_STORE_LIMIT = 1024
+
+_SECRET = (
+    CALLBACK_SECRET.encode("utf-8")
+    if CALLBACK_SECRET
+    else hashlib.sha256(f"memlist-callback:{BOT_TOKEN}".encode("utf-8")).digest()
+)
+
+def _sign(chat_id: int, body: bytes) -> bytes:
+    # chat_id не передаётся в данных, но входит в подпись: кнопку нельзя перенести в другой чат
+    return hmac.new(_SECRET, struct.pack(">q", chat_id) + body, hashlib.sha256).digest()[:MAC_SIZE]
+
+class ActionExpired(Exception):
+    """Подпись верна, но кнопка устарела или её значение уже вытеснено из VALUE_STORE."""
+
+def _store_value(value: str) -> bytes:
+    key = hashlib.blake2b(value.encode("utf-8"), digest_size=STORE_KEY_SIZE).digest()
+    VALUE_STORE[key] = value
+    VALUE_STORE.move_to_end(key)
+    while len(VALUE_STORE) > VALUE_STORE_LIMIT:
+        VALUE_STORE.popitem(last=False)
+    return key
+
+def _pack_value(value: str) -> tuple[int, bytes]:
+    try:
+        return CP1251_VALUE, value.encode("cp1251")
+    except UnicodeEncodeError:
+        return 0, value.encode("utf-8")
+
+def encode_action(chat_id: int, operation: str, user_id: int, value: str, ttl: float = CALLBACK_TTL) -> str:
+    """
+    Упаковывает выбор участника в подписанную callback_data не длиннее 64 байт.
+    Длинное значение кладётся в VALUE_STORE, в данных остаётся только его ключ.
+    """
+    flags, raw_value = _pack_value(value)
+
+    if len(raw_value) > INLINE_VALUE_LIMIT:
+        flags = STORED_VALUE
+        raw_value = _store_value(value)
+
+    # Срок округляется вверх до минуты — кнопка не истекает раньше ttl
+    expires = -(-(int(time.time() + ttl) - CALLBACK_EPOCH) // 60)
+    body = (
+        (OPERATIONS[operation] | flags).to_bytes(OPERATION_SIZE, "big")
+        + user_id.to_bytes(USER_ID_SIZE, "big", signed=True)
+        + expires.to_bytes(EXPIRES_SIZE, "big")
+        + raw_value
+    )
+    payload = base64.urlsafe_b64encode(body + _sign(chat_id, body)).rstrip(b"=")
+    return CALLBACK_PREFIX + payload.decode("ascii")
+
+def decode_action(chat_id: int, data: str) -> tuple[str, int, str] | None:
+    """
+    (operation, user_id, value) или None — если данные подделаны или не из этого чата.
+    Подлинная, но устаревшая кнопка (истёк срок, значение вытеснено) — ActionExpired.
+    """
+    if not data.startswith(CALLBACK_PREFIX):
+        return None
+
+    payload = data[len(CALLBACK_PREFIX):]
+    try:
+        raw = base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+    except ValueError:
+        return None
+
+    if len(raw) < HEADER_SIZE + MAC_SIZE:
+        return None
+
+    body, mac = raw[:-MAC_SIZE], raw[-MAC_SIZE:]
+    if not hmac.compare_digest(mac, _sign(chat_id, body)):
+        return None
+
+    code = body[0]
+    user_id = int.from_bytes(body[OPERATION_SIZE:OPERATION_SIZE + USER_ID_SIZE], "big", signed=True)
+    expires = int.from_bytes(body[OPERATION_SIZE + USER_ID_SIZE:HEADER_SIZE], "big")
+
+    operation = OPERATION_NAMES.get(code & ~VALUE_FLAGS)
+    if operation is None:
+        return None
+
+    if CALLBACK_EPOCH + expires * 60 < time.time():
+        raise ActionExpired("срок кнопки истёк")
+
+    raw_value = body[HEADER_SIZE:]
+    if code & STORED_VALUE:
+        value = VALUE_STORE.get(raw_value)
+        if value is None:
+            raise ActionExpired("значение вытеснено из VALUE_STORE")
+    elif code & CP1251_VALUE:
+        value = raw_value.decode("cp1251")
+    else:
+        value = raw_value.decode("utf-8")
+
+    return operation, user_id, value
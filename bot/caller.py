@@ -0,0 +1,122 @@
+import asyncio
+import html
+
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramRetryAfter
+
+from budget import TELEGRAM_BUDGET
+from helpers import MESSAGE_LIMIT, utf16_len
+from locks import KeyedLocks
+from logger import logger
+from metrics import CALL_MESSAGES
+
+# Telegram присылает уведомления не больше чем о 50 упоминаниях из одного сообщения
+MENTIONS_PER_MESSAGE = 50
+# В группу можно ~20 сообщений в минуту: между частями созыва держим паузу,
+# а если всё же пришёл 429 — ждём retry_after и повторяем ту же часть
+CALL_INTERVAL = 1.5
+CALL_ATTEMPTS = 3
+CALL_TEXT_LIMIT = 500
+
+# Созывы одного чата идут по очереди, чтобы их части не перемешивались
+CALL_LOCKS = KeyedLocks("call")
+
+def display_name(row: dict) -> str:
+    return (
+        row.get("external_name")
+        or row.get("full_name")
+        or (f"@{row['username']}" if row.get("username") else "")
+        or "участник"
+    )
+
+def mention(user_id: int, name: str) -> str:
+    return f'<a href="tg://user?id={user_id}">{html.escape(name)}</a>'
+
+def call_parts(title: str, text: str, members: list[dict]) -> list[str]:
+    """
+    Сообщения созыва: по MENTIONS_PER_MESSAGE упоминаний, каждое не длиннее
+    MESSAGE_LIMIT. Текст админа — только в первом сообщении.
+    """
+    text = html.escape(text[:CALL_TEXT_LIMIT])
+    lines = [mention(row["user_id"], display_name(row)) for row in members]
+    reserve = utf16_len(f"📣 <b>{title} (0000/0000)</b>\n{text}\n\n")
+
+    # Части набираются по обоим ограничениям сразу: упоминаний и длины.
+    # Имя в Telegram короче 130 символов, так что одна строка всегда влезает
+    bodies, chunk, size = [], [], 0
+    for line in lines:
+        length = utf16_len(line) + 1
+        if chunk and (len(chunk) >= MENTIONS_PER_MESSAGE or size + length > MESSAGE_LIMIT - reserve):
+            bodies.append("\n".join(chunk))
+            chunk, size = [], 0
+        chunk.append(line)
+        size += length
+    if chunk:
+        bodies.append("\n".join(chunk))
+
+    total = len(bodies)
+    parts = []
+    for i, body in enumerate(bodies, start=1):
+        counter = f" ({i}/{total})" if total > 1 else ""
+        intro = f"{text}\n\n" if i == 1 and text else "\n"
+        parts.append(f"📣 <b>{title}{counter}</b>\n{intro}{body}")
+    return parts
+
+def call_report(sent: int, failed: int) -> str:
+    return f"⚠ Созыв дошёл не полностью: сообщений отправлено {sent}, не отправлено {failed}."
+
+async def send_paced(bot: Bot, chat_id: int, thread_id: int | None, parts: list[str]) -> tuple[int, int]:
+    """
+    Отправляет части по очереди с паузой и учётом 429. Часть, которую Telegram
+    отклонил, пропускается, остальные уходят. Возвращает (отправлено, не отправлено).
+    """
+    sent = failed = 0
+
+    for index, part in enumerate(parts):
+        if index:
+            await asyncio.sleep(CALL_INTERVAL)
+
+        for attempt in range(CALL_ATTEMPTS):
+            await TELEGRAM_BUDGET.wait("call")
+            try:
+                await bot.send_message(
+                    chat_id,
+                    part,
+                    parse_mode="HTML",
+                    message_thread_id=thread_id,
+                    disable_web_page_preview=True,
+                )
+                CALL_MESSAGES.inc(result="sent")
+                sent += 1
+                break
+            except TelegramRetryAfter as e:
+                logger.warning("Созыв в чате %s: flood control, жду %s с", chat_id, e.retry_after)
+                CALL_MESSAGES.inc(result="retry")
+                await asyncio.sleep(e.retry_after)
+            except TelegramForbiddenError as e:
+                # Бота убрали из чата — остальные части тоже не уйдут
+                logger.error("Созыв в чате %s: нет доступа: %s", chat_id, e)
+                CALL_MESSAGES.inc(result="failed")
+                return sent, len(parts) - sent
+            except TelegramAPIError as e:
+                logger.error("Созыв в чате %s: часть %s не отправлена: %s", chat_id, index + 1, e)
+                CALL_MESSAGES.inc(result="failed")
+                failed += 1
+                break
+        else:
+            # Flood control не отпускает — дальше пытаться бессмысленно
+            CALL_MESSAGES.inc(result="failed")
+            return sent, len(parts) - sent
+
+    return sent, failed
+
+async def run_call(bot: Bot, msg: types.Message, title: str, text: str, members: list[dict]) -> tuple[int, int]:
+    """Созыв участников в чат команды. Возвращает (сообщений отправлено, не отправлено)."""
+    parts = call_parts(title, text, members)
+
+    async with CALL_LOCKS.hold(msg.chat.id):
+        sent, failed = await send_paced(bot, msg.chat.id, msg.message_thread_id, parts)
+
+    if failed:
+        logger.error("Созыв в чате %s дошёл не полностью: отправлено %s из %s", msg.chat.id, sent, len(parts))
+    return sent, failed
@@ -5,7 +5,96 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 ADMINS = os.getenv("ADMINS", "")
 
+# supabase | sqlite
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "memlist.db")
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", "slow_updates.jsonl")
+
+RECORD_UPDATES_PATH = os.getenv("RECORD_UPDATES_PATH", "")
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "cache.snapshot")
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "300"))
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "600"))
+
+# Фоновая дельта-синхронизация кэша участников для чатов, к которым недавно обращались
+MEMBERS_REFRESH_INTERVAL = float(os.getenv("MEMBERS_REFRESH_INTERVAL", "5"))
+MEMBERS_HOT_WINDOW = float(os.getenv("MEMBERS_HOT_WINDOW", "300"))
+TOMBSTONE_RETENTION = float(os.getenv("TOMBSTONE_RETENTION", "86400"))
+
+# Шина инвалидации: прямое подключение к Postgres для LISTEN (пусто — только локальная шина)
+BUS_DATABASE_URL = os.getenv("BUS_DATABASE_URL", "")
+BUS_CHANNEL = os.getenv("BUS_CHANNEL", "memlist_invalidate")
+# TTL кэшей, пока шина подключена: устаревание ловят уведомления, а не таймер
+BUS_CACHE_TTL = float(os.getenv("BUS_CACHE_TTL", "600"))
+
+# Ключ подписи callback_data; пусто — выводится из BOT_TOKEN (одинаков на всех репликах)
+CALLBACK_SECRET = os.getenv("CALLBACK_SECRET", "")
+
+# Устойчивость к деградации БД: таймаут одного HTTP-запроса, общий бюджет вызова
+# с повторами, повторы идемпотентных чтений и предохранитель
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "3"))
+DB_DEADLINE = float(os.getenv("DB_DEADLINE", "8"))
+DB_READ_RETRIES = int(os.getenv("DB_READ_RETRIES", "2"))
+DB_RETRY_BASE = float(os.getenv("DB_RETRY_BASE", "0.2"))
+DB_RETRY_MAX = float(os.getenv("DB_RETRY_MAX", "2"))
+DB_BREAKER_FAILURES = int(os.getenv("DB_BREAKER_FAILURES", "5"))
+DB_BREAKER_RESET = float(os.getenv("DB_BREAKER_RESET", "15"))
+
+# Пул процессов для CPU-тяжёлых задач (рендер больших экспортов)
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "2"))
+# Экспорт меньшего размера рендерится в потоке: пересылка в процесс дороже самого рендера
+EXPORT_POOL_MIN_ROWS = int(os.getenv("EXPORT_POOL_MIN_ROWS", "2000"))
+
+# /import: файлы больше не скачиваются (Bot API отдаёт ботам до 20 МБ)
+IMPORT_MAX_SIZE = int(os.getenv("IMPORT_MAX_SIZE", str(5 * 1024 * 1024)))
+
+# Журнал member_events: пакетная запись раз в интервал или по набору пакета
+EVENTS_FLUSH_INTERVAL = float(os.getenv("EVENTS_FLUSH_INTERVAL", "2"))
+EVENTS_BATCH = int(os.getenv("EVENTS_BATCH", "500"))
+EVENTS_MAX_PENDING = int(os.getenv("EVENTS_MAX_PENDING", "50000"))
+
+# Общий бюджет запросов к Bot API (в секунду); фоновые задачи берут только свободную часть
+TELEGRAM_BUDGET_RATE = float(os.getenv("TELEGRAM_BUDGET_RATE", "20"))
+
+# Фоновая сверка списков с Telegram: участников за такт и пауза между тактами (0 — выключена)
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", "10"))
+RECONCILE_SLICE = int(os.getenv("RECONCILE_SLICE", "20"))
+
+# Монитор цикла событий: период замера задержки и порог, после которого пишется стек
+# заблокировавшего кода и /healthz отвечает 503
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "1"))
+# /healthz: сколько можно жить без успешного getUpdates (long polling отвечает раз в ~10 с)
+POLL_STALE_AFTER = float(os.getenv("POLL_STALE_AFTER", "90"))
+# /readyz: пробный запрос к БД не чаще этого интервала
+HEALTH_DB_PROBE_INTERVAL = float(os.getenv("HEALTH_DB_PROBE_INTERVAL", "10"))
+
+# Логи пишет отдельный поток из очереди. Формат: color | plain | json (по строке JSON на запись)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "color").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Не больше LOG_RATE_BURST записей одного шаблона за LOG_RATE_WINDOW секунд (0 — без ограничения)
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", "10"))
+LOG_RATE_BURST = int(os.getenv("LOG_RATE_BURST", "20"))
+
+# Inline-поиск: сколько помнить, в каких чатах состоит пользователь, и cache_time ответа Telegram
+INLINE_ACCESS_TTL = float(os.getenv("INLINE_ACCESS_TTL", "300"))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "30"))
+# Сколько чатов пользователя проверять на участие и сколько getChatMember держать одновременно
+INLINE_MAX_CHATS = int(os.getenv("INLINE_MAX_CHATS", "20"))
+INLINE_CHECK_CONCURRENCY = int(os.getenv("INLINE_CHECK_CONCURRENCY", "4"))
+
+COMMANDS_HASH_PATH = os.getenv("COMMANDS_HASH_PATH", ".commands.hash")
+
 ADMIN_IDS = {int(x) for x in ADMINS.split(",") if x.strip().isdigit()}
 
-if not BOT_TOKEN or not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Missing BOT_TOKEN or SUPABASE_URL or SUPABASE_KEY in env variables")
+if not BOT_TOKEN:
+    raise RuntimeError("Missing BOT_TOKEN in env variables")
+
+if STORAGE_BACKEND == "supabase" and (not SUPABASE_URL or not SUPABASE_KEY):
+    raise RuntimeError("Missing SUPABASE_URL or SUPABASE_KEY in env variables")
@@ -1,31 +1,230 @@
-from supabase import create_client, Client
-from config import SUPABASE_URL, SUPABASE_KEY
+import time
+
+from datetime import datetime, timezone
+
+from bus import BUS
+from config import TOMBSTONE_RETENTION, BUS_CACHE_TTL, DB_DEADLINE
 from logger import logger
+from metrics import cache_hit, STALE_SERVED
 from aiogram import types
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from records import CACHE_COLUMNS, SEARCH_COLUMNS, Member, to_members
+from resilience import CircuitOpenError, deadline
+from storage import RepositoryHandle, create_repository
+
+repo = RepositoryHandle(create_repository)
+
+# chat_id -> (время последней проверки, записи участников, версия чата в БД)
+MEMBERS_CACHE: dict[int, tuple[float, list[Member], int | None]] = {}
+MEMBERS_CACHE_TTL = 30.0
+
+# chat_id -> (время синхронизации с БД, курсор — последний updated_at/deleted_at в unix-времени)
+MEMBERS_SYNC: dict[int, tuple[float, float]] = {}
+
+# chat_id -> время последнего обращения к списку; по нему выбираются горячие чаты
+MEMBERS_ACCESS: dict[int, float] = {}
+
+# Курсор отступает назад на это окно: строки транзакций, закоммиченных позже,
+# но с более ранним now(), всё равно попадут в следующую дельту
+SYNC_OVERLAP = 5.0
+
+# chat_id -> с какого момента список отдаётся из кэша, потому что БД недоступна
+MEMBERS_STALE: dict[int, float] = {}
+
+# chat_id -> (строки из MEMBERS_CACHE, {username.lower(): row})
+USERNAME_INDEX: dict[int, tuple[list, dict[str, dict]]] = {}
+
+def invalidate_members(chat_id: int):
+    """
+    Кэш после собственной записи не выбрасывается, а помечается устаревшим:
+    следующее чтение догонит его дельтой.
+    """
+    cached = MEMBERS_CACHE.get(chat_id)
+    if cached:
+        MEMBERS_CACHE[chat_id] = (0.0, cached[1], None)
+
+def members_ttl() -> float:
+    return BUS_CACHE_TTL if BUS.connected else MEMBERS_CACHE_TTL
+
+def _on_bus_event(event: dict):
+    if event["table"] == "members":
+        invalidate_members(event["chat_id"])
+
+def _on_bus_state(connected: bool):
+    # Пока шины не было, уведомления могли потеряться
+    for chat_id in list(MEMBERS_CACHE):
+        invalidate_members(chat_id)
+
+def members_stale(chat_id: int) -> float | None:
+    """Время, с которого список чата не удаётся обновить из БД; None — данные свежие."""
+    return MEMBERS_STALE.get(chat_id)
+
+def _serve_stale(chat_id: int, rows: list[dict] | None) -> list[dict] | None:
+    MEMBERS_STALE.setdefault(chat_id, time.time())
+    if rows is not None:
+        STALE_SERVED.inc(cache="members")
+    return rows
+
+BUS.subscribe(_on_bus_event)
+BUS.on_state(_on_bus_state)
+
+def chat_version(chat_id: int) -> int | None:
+    """Версия списка участников из chat_versions; None, если узнать не удалось."""
+    try:
+        return repo.chat_versions([chat_id]).get(chat_id, 0)
+    except CircuitOpenError:
+        return None
+    except Exception as e:
+        logger.warning("Не удалось получить версию чата %s: %s", chat_id, e)
+        return None
+
+def parse_timestamp(value: str | None) -> float:
+    """ISO-время из БД в unix-время. Python 3.10 не принимает «Z» и дробную часть не из 3/6 цифр."""
+    if not value:
+        return 0.0
+
+    value = value.replace("Z", "+00:00")
+    head, dot, rest = value.partition(".")
+    if dot:
+        digits = len(rest) - len(rest.lstrip("0123456789"))
+        value = f"{head}.{rest[:digits].ljust(6, '0')[:6]}{rest[digits:]}"
+
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def _cursor(changed: list[dict], removed: list[dict], cursor: float = 0.0) -> float:
+    stamps = [parse_timestamp(row.get("updated_at")) for row in changed]
+    stamps += [parse_timestamp(row.get("deleted_at")) for row in removed]
+    return max([cursor, *stamps])
+
+def sync_members(chat_id: int, version: int | None = None) -> list[dict] | None:
+    """
+    Дельта-синхронизация кэша: строки с updated_at позже курсора и tombstones
+    удалённых. None — дельту применить нельзя, нужен полный перечит.
+    """
+    cached = MEMBERS_CACHE.get(chat_id)
+    synced = MEMBERS_SYNC.get(chat_id)
+    if not cached or not synced:
+        return None
+
+    synced_at, cursor = synced
+    if time.time() - synced_at > TOMBSTONE_RETENTION:
+        # tombstones за пропущенный период могли быть уже вычищены
+        return None
+
+    started = time.time()
+    if version is None:
+        version = chat_version(chat_id)
+
+    since = datetime.fromtimestamp(max(cursor - SYNC_OVERLAP, 0.0), timezone.utc)
+    try:
+        changed = repo.members_changed_since(chat_id, since, CACHE_COLUMNS)
+        removed = repo.member_tombstones_since(chat_id, since)
+    except Exception as e:
+        logger.warning("Дельта-синхронизация чата %s не удалась: %s", chat_id, e)
+        return None
+
+    rows = cached[1]
+    if changed or removed:
+        merged = {row.id: row for row in rows}
+        for row in to_members(changed):
+            merged[row.id] = row
+        # id строк не переиспользуются, поэтому tombstone применяется последним
+        for row in removed:
+            merged.pop(row["member_id"], None)
+        rows = sorted(merged.values(), key=lambda row: row.id)
+
+    MEMBERS_CACHE[chat_id] = (time.time(), rows, version)
+    MEMBERS_SYNC[chat_id] = (started, _cursor(changed, removed, cursor))
+    MEMBERS_STALE.pop(chat_id, None)
+    return rows
+
+def cached_members(chat_id: int) -> list[dict] | None:
+    """
+    Строки из кэша. Когда TTL истёк, сверяется версия чата: если она
+    не менялась, кэш продлевается, иначе догоняется дельтой.
+    """
+    MEMBERS_ACCESS[chat_id] = time.time()
+
+    cached = MEMBERS_CACHE.get(chat_id)
+    if not cached:
+        return None
+
+    checked_at, rows, version = cached
+    if time.time() - checked_at < members_ttl():
+        return rows
+
+    if repo.breaker.is_open:
+        # БД недавно отказывала: отдаём последний список сразу, не дожидаясь таймаутов
+        return _serve_stale(chat_id, rows)
+
+    current = chat_version(chat_id) if version is not None else None
+    if current is not None and current == version:
+        cache_hit("members_version", True)
+        MEMBERS_CACHE[chat_id] = (time.time(), rows, version)
+        MEMBERS_STALE.pop(chat_id, None)
+        return rows
+
+    cache_hit("members_version", False)
+    rows = sync_members(chat_id, current)
+    cache_hit("members_delta", rows is not None)
+    return rows
+
+def refresh_hot_chats(window: float) -> int:
+    """
+    Одним запросом сверяет версии чатов, к которым обращались за последние
+    window секунд, и догоняет дельтой изменившиеся. Возвращает их число.
+    """
+    now = time.time()
+    hot = []
+    for chat_id, accessed_at in list(MEMBERS_ACCESS.items()):
+        if now - accessed_at > window:
+            MEMBERS_ACCESS.pop(chat_id, None)
+        elif chat_id in MEMBERS_CACHE:
+            hot.append(chat_id)
+
+    return refresh_chats(hot)
+
+def refresh_chats(chat_ids: list[int]) -> int:
+    """
+    Сверяет версии закэшированных чатов одним запросом и догоняет дельтой
+    изменившиеся. Возвращает их число; ошибка БД — 0, кэш остаётся как был.
+    """
+    if not chat_ids:
+        return 0
+
+    try:
+        versions = repo.chat_versions(chat_ids)
+    except Exception as e:
+        logger.warning("Не удалось получить версии чатов: %s", e)
+        return 0
+
+    refreshed = 0
+    for chat_id in chat_ids:
+        cached = MEMBERS_CACHE.get(chat_id)
+        if not cached:
+            continue
+
+        current = versions.get(chat_id, 0)
+        if current == cached[2]:
+            MEMBERS_CACHE[chat_id] = (time.time(), cached[1], current)
+        elif sync_members(chat_id, current) is not None:
+            refreshed += 1
+
+    return refreshed
 
 def upsert_user(chat_id: int, user: types.User, external_name=None, extra_role=None):
     if user.username == "GroupAnonymousBot" or (user.is_bot and user.id != chat_id):
         return
 
     try:
-        res = (
-            supabase.table("members")
-            .select("*")
-            .eq("chat_id", chat_id)
-            .eq("user_id", user.id)
-            .execute()
-        )
-
-        if res and isinstance(res.data, list) and len(res.data) > 0:
-            row = res.data[0]
-        else:
-            row = None
-
+        row = repo.get_member(chat_id, user.id)
     except Exception as e:
+        # Без ответа БД не понять, вставлять или обновлять: вставка наугад упадёт на ключе
         logger.error("Supabase SELECT error: %s", e)
-        row = None
+        return
 
     if not row:
         payload = {
@@ -38,10 +237,12 @@ def upsert_user(chat_id: int, user: types.User, external_name=None, extra_role=N
         }
 
         try:
-            supabase.table("members").insert(payload).execute()
+            repo.insert_member(payload)
         except Exception as e:
             logger.error("Supabase INSERT error: %s", e)
 
+        invalidate_members(chat_id)
+
         return
 
     update_data = {}
@@ -65,52 +266,111 @@ def upsert_user(chat_id: int, user: types.User, external_name=None, extra_role=N
         return
 
     try:
-        (
-            supabase.table("members")
-            .update(update_data)
-            .eq("chat_id", chat_id)
-            .eq("user_id", user.id)
-            .execute()
-        )
+        update_member(chat_id, user.id, update_data)
     except Exception as e:
         logger.error("Supabase upsert_user FIXED error: %s", e)
 
+def update_member(chat_id: int, user_id: int, fields: dict):
+    """Обновление полей участника. Ошибки пробрасываются вызывающему."""
+    try:
+        repo.update_member(chat_id, user_id, fields)
+    finally:
+        invalidate_members(chat_id)
+
+def bulk_update_members(chat_id: int, rows: list[dict]):
+    """
+    Одним пакетным upsert меняет поля у нескольких участников. Строки —
+    {"user_id", "username", <поле>: значение} с одинаковым набором ключей.
+    Вызывающий держит member_locks этих участников и строит строки по
+    прочитанному под замком, иначе upsert затрёт параллельную правку.
+    Ошибки пробрасываются вызывающему.
+    """
+    try:
+        repo.upsert_members([{"chat_id": chat_id, **row} for row in rows])
+    finally:
+        invalidate_members(chat_id)
+
 def get_members(chat_id: int):
+    # Проверка версии, дельта и полный перечит делят один бюджет времени
+    with deadline(DB_DEADLINE):
+        return _get_members(chat_id)
+
+def _get_members(chat_id: int):
+    rows = cached_members(chat_id)
+    cache_hit("members", rows is not None)
+    if rows is not None:
+        return list(rows)
+
+    # Версию читаем до строк: запись между запросами даст устаревшую
+    # версию, и следующая проверка просто догонит список дельтой
+    started = time.time()
+    version = chat_version(chat_id)
+
     try:
-        res = (
-            supabase.table("members")
-            .select("*")
-            .eq("chat_id", chat_id)
-            .order("id")
-            .execute()
-        )
-        return res.data or []
+        rows = to_members(repo.list_members(chat_id, CACHE_COLUMNS))
     except Exception as e:
         logger.error("Supabase get_members error: %s", e)
-        return []
+        # Последний известный список лучше пустого; members_stale() подскажет, что он устарел
+        cached = MEMBERS_CACHE.get(chat_id)
+        return list(_serve_stale(chat_id, cached[1] if cached else None) or [])
+
+    MEMBERS_CACHE[chat_id] = (time.time(), rows, version)
+    MEMBERS_SYNC[chat_id] = (started, _cursor(rows, []))
+    MEMBERS_STALE.pop(chat_id, None)
+    return list(rows)
+
+def members_by_usernames(chat_id: int, usernames: list[str]) -> list[dict]:
+    """Поиск по username: из кэша участников, если он свежий, иначе одним запросом."""
+    with deadline(DB_DEADLINE):
+        rows = cached_members(chat_id)
+        cache_hit("usernames", rows is not None)
+
+        if rows is None:
+            return repo.members_by_usernames(
+                chat_id,
+                usernames,
+                SEARCH_COLUMNS
+            )
+
+    index = USERNAME_INDEX.get(chat_id)
+    if not index or index[0] is not rows:
+        index = (rows, {(r.get("username") or "").lower(): r for r in rows if r.get("username")})
+        USERNAME_INDEX[chat_id] = index
+
+    return [index[1][u.lower()] for u in usernames if u.lower() in index[1]]
 
 def delete_user(chat_id: int, user_id: int):
     try:
-        (
-            supabase.table("members")
-            .delete()
-            .eq("chat_id", chat_id)
-            .eq("user_id", user_id)
-            .execute()
-        )
+        repo.delete_members(chat_id, [user_id])
     except Exception as e:
         logger.error("delete_user error: %s", e)
 
+    invalidate_members(chat_id)
+
 def clear_left_users(chat_id: int, left_user_ids: list[int]):
-    for uid in left_user_ids:
-        try:
-            supabase.table("members") \
-                .delete() \
-                .eq("chat_id", chat_id) \
-                .eq("user_id", uid) \
-                .execute()
+    try:
+        repo.delete_members(chat_id, left_user_ids)
+        logger.info("Удалены из базы ушедшие пользователи %s из чата %s", left_user_ids, chat_id)
+    except Exception as e:
+        logger.error("Supabase clear_left_users error (chat %s users %s): %s", chat_id, left_user_ids, e)
 
-            logger.info("Удалён из базы ушедший пользователь %s из чата %s", uid, chat_id)
+    invalidate_members(chat_id)
 
-        except Exception as e:
-            logger.error("Supabase clear_left_users error (chat %s user %s): %s", chat_id, uid, e)
+def get_roster_message(chat_id: int):
+    """
+    Строка ростера чата или None, если его нет. Ошибки пробрасываются:
+    None из-за сбоя БД выключил бы ростер в кэше до перезапуска.
+    """
+    return repo.get_roster_message(chat_id)
+
+def save_roster_message(chat_id: int, message_id: int, thread_id: int | None, created_by: int):
+    try:
+        repo.save_roster_message(chat_id, message_id, thread_id, created_by)
+    except Exception as e:
+        logger.error("Supabase save_roster_message error: %s", e)
+
+def delete_roster_message(chat_id: int):
+    try:
+        repo.delete_roster_message(chat_id)
+    except Exception as e:
+        logger.error("Supabase delete_roster_message error: %s", e)
@@ -0,0 +1,82 @@
+import asyncio
+
+from datetime import datetime, timezone
+
+from config import EVENTS_FLUSH_INTERVAL, EVENTS_BATCH, EVENTS_MAX_PENDING
+from db import repo
+from logger import logger
+from metrics import QUEUE_DEPTH, MEMBER_EVENTS
+
+# События ждут пакетной записи в member_events: хендлер только дописывает
+# в список, в БД их отправляет event_writer_loop
+EVENTS_PENDING: list[dict] = []
+EVENTS_WAKE = asyncio.Event()
+
+# Кто уже отмечен активным за текущий день (UTC) — повторно не пишем
+ACTIVE_DAY = ""
+ACTIVE_SEEN: set[tuple[int, int]] = set()
+
+QUEUE_DEPTH.set_function(lambda: len(EVENTS_PENDING), queue="member_events")
+
+def _trim():
+    overflow = len(EVENTS_PENDING) - EVENTS_MAX_PENDING
+    if overflow > 0:
+        # БД долго недоступна: теряем самые старые события, а не память
+        del EVENTS_PENDING[:overflow]
+        MEMBER_EVENTS.inc(overflow, kind="dropped")
+        logger.warning("Очередь событий участников переполнена, отброшено %s", overflow)
+
+def record_event(chat_id: int, user_id: int, kind: str):
+    """join / leave / active. Время — момент события, а не записи: пакет может уйти позже."""
+    EVENTS_PENDING.append({
+        "chat_id": chat_id,
+        "user_id": user_id,
+        "kind": kind,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+    })
+    MEMBER_EVENTS.inc(kind=kind)
+
+    _trim()
+    if len(EVENTS_PENDING) >= EVENTS_BATCH:
+        EVENTS_WAKE.set()
+
+def record_activity(chat_id: int, user_id: int):
+    global ACTIVE_DAY
+
+    day = datetime.now(timezone.utc).date().isoformat()
+    if day != ACTIVE_DAY:
+        ACTIVE_DAY = day
+        ACTIVE_SEEN.clear()
+
+    key = (chat_id, user_id)
+    if key in ACTIVE_SEEN:
+        return
+
+    ACTIVE_SEEN.add(key)
+    record_event(chat_id, user_id, "active")
+
+async def flush_events() -> bool:
+    """Пишет накопленное пакетами по EVENTS_BATCH. При ошибке пакет возвращается в начало очереди."""
+    while EVENTS_PENDING:
+        batch = EVENTS_PENDING[:EVENTS_BATCH]
+        del EVENTS_PENDING[:len(batch)]
+
+        try:
+            await asyncio.to_thread(repo.insert_member_events, batch)
+        except Exception as e:
+            EVENTS_PENDING[:0] = batch
+            _trim()
+            logger.warning("Не удалось записать события участников (%s): %s", len(batch), e)
+            return False
+
+    return True
+
+async def event_writer_loop():
+    while True:
+        try:
+            await asyncio.wait_for(EVENTS_WAKE.wait(), EVENTS_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+        EVENTS_WAKE.clear()
+        await flush_events()
@@ -0,0 +1,149 @@
+"""
+Рендер экспорта списка участников в TXT, CSV и XLSX.
+
+Модуль намеренно без зависимостей бота: render_export выполняется в пуле
+процессов (pool.run_cpu) и получает колонки — кортеж списков в порядке
+EXPORT_COLUMNS, а не список dict: между процессами передаётся меньше данных.
+"""
+import csv
+import io
+import re
+import zipfile
+
+from xml.sax.saxutils import escape
+
+EXPORT_COLUMNS = ("user_id", "username", "full_name", "external_name", "extra_role")
+EXPORT_FORMATS = ("txt", "csv", "xlsx")
+
+# Колонки, по которым сортирует /export [режим]
+SORT_COLUMNS = {
+    "name": "full_name",
+    "n": "full_name",
+    "username": "username",
+    "user": "username",
+    "u": "username",
+    "external": "external_name",
+    "ext": "external_name",
+    "e": "external_name",
+}
+
+# XML 1.0 не допускает управляющие символы, кроме табуляции и переводов строк
+XML_ILLEGAL_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+def member_columns(rows: list[dict]) -> tuple[list, ...]:
+    return (
+        [row["user_id"] for row in rows],
+        *([row.get(column) or "" for row in rows] for column in EXPORT_COLUMNS[1:]),
+    )
+
+def format_txt_line(full_name: str, username: str, external: str, role: str, index: int | None = None) -> str:
+    full_name = full_name or "Без имени"
+    username_part = f" (@{username})" if username else ""
+    # Роль без внешнего имени пишется после пустого поля «—  —», иначе /import принял бы её за имя
+    external_part = f" — {external}" if external or role else ""
+    role_part = f" — {role}" if role else ""
+
+    if index is not None:
+        return f"{index}. {full_name}{username_part}{external_part}{role_part}"
+    return f"{full_name}{username_part}{external_part}{role_part}"
+
+def _order(columns: tuple[list, ...], sort_mode: str | None) -> range | list[int]:
+    column = SORT_COLUMNS.get(sort_mode or "")
+    if not column:
+        return range(len(columns[0]))
+
+    values = columns[EXPORT_COLUMNS.index(column)]
+    return sorted(range(len(values)), key=lambda i: values[i].lower())
+
+def render_txt(columns: tuple[list, ...], order) -> bytes:
+    user_ids, usernames, full_names, externals, roles = columns
+    lines = ["📋 Список участников:", ""]
+    lines.extend(
+        format_txt_line(full_names[i], usernames[i], externals[i], roles[i], n)
+        for n, i in enumerate(order, start=1)
+    )
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def render_csv(columns: tuple[list, ...], order) -> bytes:
+    # Колонки совместимы с /import; BOM — чтобы Excel узнал UTF-8
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([column[i] for column in columns] for i in order)
+    return output.getvalue().encode("utf-8-sig")
+
+def _xlsx_cell(value) -> str:
+    if isinstance(value, int):
+        return f"<c><v>{value}</v></c>"
+    text = escape(XML_ILLEGAL_RE.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Участники" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+def render_xlsx(columns: tuple[list, ...], order) -> bytes:
+    """Минимальная книга SpreadsheetML на zipfile: один лист, строки inline, без стилей."""
+    rows = ["<row>" + "".join(_xlsx_cell(name) for name in EXPORT_COLUMNS) + "</row>"]
+    rows.extend(
+        "<row>" + "".join(_xlsx_cell(column[i]) for column in columns) + "</row>"
+        for i in order
+    )
+    sheet = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<sheetViews><sheetView workbookViewId="0">'
+        '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+        '</sheetView></sheetViews>'
+        f'<sheetData>{"".join(rows)}</sheetData>'
+        '</worksheet>'
+    )
+
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as book:
+        book.writestr("[Content_Types].xml", XLSX_CONTENT_TYPES)
+        book.writestr("_rels/.rels", XLSX_ROOT_RELS)
+        book.writestr("xl/workbook.xml", XLSX_WORKBOOK)
+        book.writestr("xl/_rels/workbook.xml.rels", XLSX_WORKBOOK_RELS)
+        book.writestr("xl/worksheets/sheet1.xml", sheet)
+    return output.getvalue()
+
+RENDERERS = {
+    "txt": render_txt,
+    "csv": render_csv,
+    "xlsx": render_xlsx,
+}
+
+def render_export(fmt: str, columns: tuple[list, ...], sort_mode: str | None = None) -> bytes:
+    return RENDERERS[fmt](columns, _order(columns, sort_mode))
@@ -1,6 +1,10 @@
 from . import admin
 from . import events
+from . import importer
 from . import members
 from . import misc
 from . import profile
 from . import tmplist
+from . import roster
+from . import stats
+from . import inline
@@ -1,6 +1,5 @@
 import asyncio
-import csv
-import io
+import html
 
 from aiogram import types
 from aiogram.filters import Command
@@ -8,14 +7,124 @@ from aiogram.types import BufferedInputFile
 
 from core import bot, dp
 from logger import logger
-from db import supabase, upsert_user, get_members, clear_left_users
+from db import update_member, upsert_user, get_members, clear_left_users, bulk_update_members
 from helpers import (
     admin_check,
-    format_member_txt,
     get_target_user_from_reply,
+    parse_bulk_pairs,
+    send_long_message,
     auto_delete,
     answer_temp
 )
+from roster import schedule_roster_refresh
+from caller import call_report, run_call
+from locks import member_lock, member_locks
+from export import EXPORT_FORMATS, member_columns, render_export
+from pool import run_cpu
+from config import EXPORT_POOL_MIN_ROWS
+
+MAX_LEN = 100
+BULK_MAX_LINES = 200
+
+def strip_mentions(value: str) -> str:
+    return " ".join(word for word in value.split() if not word.startswith("@"))
+
+async def apply_bulk(msg: types.Message, field: str, pairs: list[tuple[str, str]], invalid: list[str], title: str):
+    """
+    Пакетная правка поля по парам «@username значение»: участники ищутся
+    по одному списку чата, изменения уходят одним upsert, в ответ — сводка.
+    """
+    chat_id = msg.chat.id
+    rows = await asyncio.to_thread(get_members, chat_id)
+
+    by_username: dict[str, list[dict]] = {}
+    for row in rows:
+        username = (row.get("username") or "").lower()
+        if username:
+            by_username.setdefault(username, []).append(row)
+
+    # user_id -> новое значение
+    updates: dict[int, str] = {}
+    applied, skipped, ambiguous = [], [], []
+    seen = set()
+
+    for username, value in pairs:
+        if field == "extra_role":
+            value = strip_mentions(value)
+
+        matches = by_username.get(username, [])
+
+        if username in seen:
+            skipped.append(f"@{username} — повтор")
+        elif not value:
+            skipped.append(f"@{username} — пустое значение")
+        elif len(value) > MAX_LEN:
+            skipped.append(f"@{username} — длиннее {MAX_LEN} символов")
+        elif not matches:
+            skipped.append(f"@{username} — нет в списке")
+        elif len(matches) > 1:
+            ambiguous.append(f"@{username} — записей: {len(matches)}")
+        elif (matches[0].get(field) or "") == value:
+            skipped.append(f"@{username} — без изменений")
+        else:
+            updates[matches[0]["user_id"]] = value
+            applied.append(f"@{username} → {value}")
+
+        seen.add(username)
+
+    if updates:
+        try:
+            # Строки собираются заново под замками: username мог смениться, участник — уйти
+            async with member_locks(chat_id, updates):
+                fresh = {row["user_id"]: row for row in await asyncio.to_thread(get_members, chat_id)}
+                batch = [
+                    {"user_id": user_id, "username": fresh[user_id].get("username") or "", field: value}
+                    for user_id, value in updates.items()
+                    if user_id in fresh
+                ]
+                if batch:
+                    await asyncio.to_thread(bulk_update_members, chat_id, batch)
+        except Exception as e:
+            logger.error("Bulk %s update error (chat %s): %s", field, chat_id, e)
+            await msg.answer("⚠ Произошла ошибка при сохранении, изменения не применены.")
+            return
+
+        schedule_roster_refresh(bot, chat_id)
+
+    lines = [f"✅ Применено: <b>{len(applied)}</b>"]
+    lines += [f"• {html.escape(line)}" for line in applied]
+
+    if skipped:
+        lines.append(f"\n⏭ Пропущено: <b>{len(skipped)}</b>")
+        lines += [f"• {html.escape(line)}" for line in skipped]
+
+    if ambiguous:
+        lines.append(f"\n❓ Неоднозначно: <b>{len(ambiguous)}</b>")
+        lines += [f"• {html.escape(line)}" for line in ambiguous]
+
+    if invalid:
+        lines.append(f"\n⚠ Не разобраны строки: <b>{len(invalid)}</b>")
+        lines += [f"• {html.escape(line[:60])}" for line in invalid]
+
+    await send_long_message(bot, msg, title, lines)
+
+    logger.info(
+        "Bulk %s: applied=%s skipped=%s ambiguous=%s invalid=%s chat=%s",
+        field, len(applied), len(skipped), len(ambiguous), len(invalid), chat_id
+    )
+
+async def try_bulk(msg: types.Message, field: str, title: str) -> bool:
+    """True, если сообщение — пакетная форма команды и оно обработано."""
+    pairs, invalid = parse_bulk_pairs(msg.text)
+    if not pairs:
+        return False
+
+    if len(pairs) + len(invalid) > BULK_MAX_LINES:
+        await answer_temp(msg, f"❌ Не больше {BULK_MAX_LINES} строк за раз.")
+        return True
+
+    await apply_bulk(msg, field, pairs, invalid, title)
+    return True
 
 @dp.message(Command("setname"))
 @auto_delete()
@@ -25,6 +134,9 @@ async def admin_set_name(msg: types.Message):
 
     target_user = get_target_user_from_reply(msg)
     if not target_user:
+        if await try_bulk(msg, "external_name", "✨ Имена участников"):
+            return
+
         await answer_temp(
             msg,
             "❌ Ответьте на сообщение конкретного пользователя.\n\n"
@@ -32,7 +144,9 @@ async def admin_set_name(msg: types.Message):
             "• обычные сообщения пользователя\n"
             "• сообщения о входе пользователя в чат\n\n"
             "⚠️ Если в одном сообщении добавлено несколько участников — "
-            "дождитесь, пока нужный пользователь напишет сообщение.",
+            "дождитесь, пока нужный пользователь напишет сообщение.\n\n"
+            "Несколько участников сразу — по строке на каждого:\n"
+            "<code>/setname\n@user1 Иван\n@user2 Пётр</code>",
             parse_mode="HTML"
         )
         return
@@ -56,20 +170,22 @@ async def admin_set_name(msg: types.Message):
         )
         return
 
-    await asyncio.to_thread(upsert_user, msg.chat.id, target_user)
+    async with member_lock(msg.chat.id, target_user.id):
+        await asyncio.to_thread(upsert_user, msg.chat.id, target_user)
 
-    try:
-        (
-            supabase.table("members")
-            .update({"external_name": new_name})
-            .eq("chat_id", msg.chat.id)
-            .eq("user_id", target_user.id)
-            .execute()
-        )
-    except Exception as e:
-        logger.error("Supabase setname update error: %s", e)
-        await msg.answer("⚠ Произошла ошибка при сохранении имени.")
-        return
+        try:
+            await asyncio.to_thread(
+                update_member,
+                msg.chat.id,
+                target_user.id,
+                {"external_name": new_name}
+            )
+        except Exception as e:
+            logger.error("Supabase setname update error: %s", e)
+            await msg.answer("⚠ Произошла ошибка при сохранении имени.")
+            return
+
+    schedule_roster_refresh(bot, msg.chat.id)
 
     await msg.answer(
         f"✨ Имя участника <b>{target_user.full_name}</b> обновлено на <b>{new_name}</b>",
@@ -84,11 +200,17 @@ async def admin_add_role(msg: types.Message):
 
     target_user = get_target_user_from_reply(msg)
     if not target_user:
+        if await try_bulk(msg, "extra_role", "✨ Роли участников"):
+            return
+
         await answer_temp(
+            msg,
             "❌ Ответьте на сообщение конкретного пользователя.\n\n"
             "Поддерживаются:\n"
             "• обычные сообщения пользователя\n"
-            "• сообщения о входе пользователя в чат",
+            "• сообщения о входе пользователя в чат\n\n"
+            "Несколько участников сразу — по строке на каждого:\n"
+            "<code>/addrole\n@user1 Танк\n@user2 Хил</code>",
             parse_mode="HTML"
         )
         return
@@ -112,28 +234,66 @@ async def admin_add_role(msg: types.Message):
         )
         return
 
-    role = " ".join(word for word in role.split() if not word.startswith("@"))
+    role = strip_mentions(role)
 
-    await asyncio.to_thread(upsert_user, msg.chat.id, target_user)
+    async with member_lock(msg.chat.id, target_user.id):
+        await asyncio.to_thread(upsert_user, msg.chat.id, target_user)
 
-    try:
-        (
-            supabase.table("members")
-            .update({"extra_role": role})
-            .eq("chat_id", msg.chat.id)
-            .eq("user_id", target_user.id)
-            .execute()
-        )
-    except Exception as e:
-        logger.error("Supabase addrole update error: %s", e)
-        await msg.answer("⚠ Произошла ошибка при сохранении роли.")
-        return
+        try:
+            await asyncio.to_thread(
+                update_member,
+                msg.chat.id,
+                target_user.id,
+                {"extra_role": role}
+            )
+        except Exception as e:
+            logger.error("Supabase addrole update error: %s", e)
+            await msg.answer("⚠ Произошла ошибка при сохранении роли.")
+            return
+
+    schedule_roster_refresh(bot, msg.chat.id)
 
     await msg.answer(
         f"✨ Роль участника <b>{target_user.full_name}</b> обновлена на <b>{role}</b>",
         parse_mode="HTML"
     )
 
+@dp.message(Command(commands=["call_role"], ignore_case=True))
+@auto_delete()
+async def cmd_call_role(msg: types.Message):
+    if not await admin_check(bot, msg):
+        return
+
+    # Первая строка — роль, остальное — текст созыва
+    head, _, text = (msg.text or "").partition("\n")
+    args = head.split(maxsplit=1)
+    if len(args) < 2 or not args[1].strip():
+        await answer_temp(
+            msg,
+            "❌ Укажи роль.\n\n"
+            "Пример:\n"
+            "<code>/call_role Хил\nСбор в 20:00</code>",
+            parse_mode="HTML"
+        )
+        return
+
+    role = args[1].strip()
+    query = role.lower()
+    rows = await asyncio.to_thread(get_members, msg.chat.id)
+    members = [row for row in rows if query in (row.get("extra_role") or "").lower()]
+
+    if not members:
+        await answer_temp(
+            msg,
+            f"❌ Нет участников с ролью <b>{html.escape(role)}</b>.",
+            parse_mode="HTML"
+        )
+        return
+
+    sent, failed = await run_call(bot, msg, html.escape(role), text.strip(), members)
+    if failed:
+        await answer_temp(msg, call_report(sent, failed))
+
 @dp.message(Command("export"))
 @auto_delete()
 async def cmd_export(msg: types.Message):
@@ -145,25 +305,23 @@ async def cmd_export(msg: types.Message):
         await msg.answer("Список пуст, нечего экспортировать.")
         return
 
-    args = msg.text.split()
-    sort_mode = args[1].lower() if len(args) > 1 else None
-
-    if sort_mode in ["name", "n"]:
-        rows.sort(key=lambda r: (r.get("full_name") or "").lower())
-    elif sort_mode in ["username", "user", "u"]:
-        rows.sort(key=lambda r: (r.get("username") or "").lower())
-    elif sort_mode in ["external", "ext", "e"]:
-        rows.sort(key=lambda r: (r.get("external_name") or "").lower())
+    # /export [сортировка] [txt|csv|xlsx] — аргументы в любом порядке
+    sort_mode, fmt = None, "txt"
+    for arg in msg.text.lower().split()[1:]:
+        if arg in EXPORT_FORMATS:
+            fmt = arg
+        else:
+            sort_mode = arg
 
-    output = io.StringIO()
-    output.write("📋 Список участников:\n\n")
-
-    for i, row in enumerate(rows, start=1):
-        output.write(format_member_txt(row, i) + "\n")
+    columns = member_columns(rows)
+    if len(rows) >= EXPORT_POOL_MIN_ROWS:
+        data = await run_cpu("export", render_export, fmt, columns, sort_mode)
+    else:
+        data = await asyncio.to_thread(render_export, fmt, columns, sort_mode)
 
     file = BufferedInputFile(
-        file=output.getvalue().encode("utf-8"),
-        filename=f"members_chat_{msg.chat.id}.txt"
+        file=data,
+        filename=f"members_chat_{msg.chat.id}.{fmt}"
     )
 
     await msg.answer_document(file, caption="📄 Экспортирован список участников.")
@@ -202,22 +360,18 @@ async def cmd_cleanup(msg: types.Message):
         ):
             updated_users += 1
             try:
-                await asyncio.to_thread(upsert_user, msg.chat.id, tg_user)
-                (
-                    supabase.table("members")
-                    .update({
-                        "username": new_username,
-                        "full_name": new_fullname
-                    })
-                    .eq("chat_id", msg.chat.id)
-                    .eq("user_id", uid)
-                    .execute()
-                )
+                # row прочитан без замка и решает только, писать ли; upsert_user перечитывает запись под замком
+                async with member_lock(msg.chat.id, uid):
+                    await asyncio.to_thread(upsert_user, msg.chat.id, tg_user)
             except Exception as e:
                 logger.error("Cleanup update error (%s): %s", uid, e)
 
     if left_users:
-        await asyncio.to_thread(clear_left_users, msg.chat.id, left_users)
+        async with member_locks(msg.chat.id, left_users):
+            await asyncio.to_thread(clear_left_users, msg.chat.id, left_users)
+
+    if left_users or updated_users:
+        schedule_roster_refresh(bot, msg.chat.id)
 
     await msg.answer(
         f"🧹 <b>Очистка завершена!</b>\n"
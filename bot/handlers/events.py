@@ -8,6 +8,9 @@ from core import bot, dp
 from logger import logger
 from db import upsert_user, delete_user
 from helpers import WELCOME_SENT, WELCOME_TTL
+from roster import schedule_roster_refresh
+from locks import member_lock
+from eventlog import record_event
 
 @dp.my_chat_member()
 async def on_bot_chat_member(event: types.ChatMemberUpdated):
@@ -110,7 +113,10 @@ async def chat_member_events(event: types.ChatMemberUpdated):
         if user.username == "GroupAnonymousBot" or user.is_bot:
             return
 
-        await asyncio.to_thread(upsert_user, chat_id, user)
+        async with member_lock(chat_id, user.id):
+            await asyncio.to_thread(upsert_user, chat_id, user)
+        schedule_roster_refresh(bot, chat_id)
+        record_event(chat_id, user.id, "join")
 
         logger.info(
             "Пользователь %s (%s) добавлен в список чата %s",
@@ -121,7 +127,10 @@ async def chat_member_events(event: types.ChatMemberUpdated):
         return
 
     if new in OUTSIDE_STATUSES:
-        await asyncio.to_thread(delete_user, chat_id, user.id)
+        async with member_lock(chat_id, user.id):
+            await asyncio.to_thread(delete_user, chat_id, user.id)
+        schedule_roster_refresh(bot, chat_id)
+        record_event(chat_id, user.id, "leave")
 
         logger.info(
             "Пользователь %s удалён из списка чата %s",
@@ -0,0 +1,327 @@
+import asyncio
+import csv
+import io
+import re
+import tempfile
+import time
+
+from aiogram import types
+from aiogram.filters import Command
+from contextlib import aclosing
+from itertools import islice
+from typing import Iterable, Iterator
+
+from config import IMPORT_MAX_SIZE
+from core import bot, dp
+from logger import logger
+from db import get_members, bulk_update_members
+from helpers import admin_check, auto_delete, answer_temp
+from locks import member_locks
+from roster import schedule_roster_refresh
+
+IMPORT_CHUNK = 500
+DOWNLOAD_CHUNK = 64 * 1024
+DOWNLOAD_TIMEOUT = 60
+TOO_BIG = f"❌ Файл больше {IMPORT_MAX_SIZE // (1024 * 1024)} МБ."
+PROGRESS_INTERVAL = 2.0
+MAX_LEN = 100
+
+# Строка /export: «N. Имя (@username) — внешнее имя — роль»
+TXT_LINE_RE = re.compile(
+    r"^\s*(?:\d+\.\s+)?.*?\(@(?P<username>[A-Za-z0-9_]{5,32})\)(?P<rest>(?: — .*)?)\s*$"
+)
+
+def iter_txt_rows(lines: Iterable[str]) -> Iterator[dict | None]:
+    """
+    Строки формата format_txt_line. Без (@username) строку не с кем сопоставить — None.
+    Поля после username отдаются как есть: что из них имя, а что роль, решает txt_values.
+    """
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip() or line.startswith("📋"):
+            continue
+
+        m = TXT_LINE_RE.match(line)
+        if not m:
+            yield None
+            continue
+
+        yield {
+            "username": m.group("username"),
+            "fields": [p.strip() for p in m.group("rest").split(" — ")[1:]],
+        }
+
+def txt_values(fields: list[str], member: dict) -> tuple[str, str] | None:
+    """
+    (внешнее имя, роль) из полей TXT-строки. Разделитель « — » может встретиться
+    и внутри значения, поэтому спорные строки сверяются с текущими значениями участника.
+    None — поля не разделить однозначно, такую строку нужно импортировать через CSV.
+    """
+    if not fields:
+        return "", ""
+
+    current = (member.get("external_name") or "", member.get("extra_role") or "")
+
+    if len(fields) == 1:
+        # Выгрузки до пустого поля писали роль без имени одним полем
+        if fields[0] == current[1] and fields[0] != current[0]:
+            return "", fields[0]
+        return fields[0], ""
+
+    # Пустое первое поле — явный пропуск имени, всё остальное — роль
+    if not fields[0]:
+        return "", " — ".join(fields[1:])
+
+    splits = [(" — ".join(fields[:k]), " — ".join(fields[k:])) for k in range(1, len(fields))]
+    splits.append((" — ".join(fields), ""))
+
+    if current in splits:
+        return current
+    known = [
+        split for split in splits
+        if (current[0] and split[0] == current[0]) or (current[1] and split[1] == current[1])
+    ]
+    if len(known) == 1:
+        return known[0]
+    if len(fields) == 2:
+        return splits[0]
+    return None
+
+def iter_csv_rows(lines: Iterable[str]) -> Iterator[dict | None]:
+    """CSV с заголовком: username и/или user_id, external_name, extra_role (регистр не важен)."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # лишние ячейки DictReader складывает списком под ключом None
+        row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k is not None}
+        if not row.get("username") and not row.get("user_id", "").lstrip("-").isdigit():
+            yield None
+            continue
+
+        yield {
+            "username": row.get("username", "").lstrip("@"),
+            "user_id": int(row["user_id"]) if row.get("user_id", "").lstrip("-").isdigit() else None,
+            "external_name": row.get("external_name", ""),
+            "extra_role": row.get("extra_role", ""),
+        }
+
+def import_document(msg: types.Message) -> types.Document | None:
+    if msg.document:
+        return msg.document
+    if msg.reply_to_message and msg.reply_to_message.document:
+        return msg.reply_to_message.document
+    return None
+
+@dp.message(Command("import"))
+@auto_delete()
+async def cmd_import(msg: types.Message):
+    if not await admin_check(bot, msg):
+        return
+
+    document = import_document(msg)
+    if not document:
+        await answer_temp(
+            msg,
+            "❌ Пришлите файл с подписью /import или ответьте командой на сообщение с файлом.\n\n"
+            "Поддерживаются:\n"
+            "• .txt в формате /export\n"
+            "• .csv с колонками <code>username</code> (или <code>user_id</code>), "
+            "<code>external_name</code>, <code>extra_role</code>",
+            parse_mode="HTML"
+        )
+        return
+
+    if document.file_size and document.file_size > IMPORT_MAX_SIZE:
+        await answer_temp(msg, TOO_BIG)
+        return
+
+    status = await msg.answer("⏳ Импорт: загружаю файл…")
+    await import_file(msg.chat.id, document, status)
+
+async def download_limited(document: types.Document, destination) -> bool:
+    """
+    Скачивает файл в destination по частям. False — файл больше IMPORT_MAX_SIZE:
+    загрузка обрывается, как только это стало ясно, даже если размер заранее не известен.
+    """
+    file = await bot.get_file(document.file_id)
+    if file.file_size and file.file_size > IMPORT_MAX_SIZE:
+        return False
+
+    size = 0
+    stream = bot.session.stream_content(
+        url=bot.session.api.file_url(bot.token, file.file_path),
+        timeout=DOWNLOAD_TIMEOUT,
+        chunk_size=DOWNLOAD_CHUNK,
+        raise_for_status=True,
+    )
+    async with aclosing(stream):
+        async for chunk in stream:
+            size += len(chunk)
+            if size > IMPORT_MAX_SIZE:
+                return False
+            destination.write(chunk)
+
+    destination.seek(0)
+    return True
+
+async def import_file(chat_id: int, document: types.Document, status: types.Message):
+    # Файл скачивается частями во временный файл на диске, а не собирается в памяти.
+    # Не SpooledTemporaryFile: до Python 3.11 его нельзя обернуть в TextIOWrapper
+    with tempfile.TemporaryFile() as buffer:
+        await import_buffer(chat_id, document, status, buffer)
+
+async def import_buffer(chat_id: int, document: types.Document, status: types.Message, buffer):
+    try:
+        complete = await download_limited(document, buffer)
+    except Exception as e:
+        logger.error("Import download error (chat %s): %s", chat_id, e)
+        await status.edit_text("⚠ Не удалось скачать файл.")
+        return
+
+    if not complete:
+        await status.edit_text(TOO_BIG)
+        return
+
+    is_csv = (document.file_name or "").lower().endswith(".csv") or document.mime_type == "text/csv"
+    lines = io.TextIOWrapper(buffer, encoding="utf-8-sig", errors="replace", newline="")
+    rows = iter_csv_rows(lines) if is_csv else iter_txt_rows(lines)
+
+    members = await asyncio.to_thread(get_members, chat_id)
+    by_id = {m["user_id"]: m for m in members}
+    by_username: dict[str, list[dict]] = {}
+    for m in members:
+        username = (m.get("username") or "").lower()
+        if username:
+            by_username.setdefault(username, []).append(m)
+
+    stats = {
+        "total": 0, "applied": 0, "unchanged": 0, "not_found": 0,
+        "ambiguous": 0, "unclear": 0, "invalid": 0,
+    }
+    # user_id -> (внешнее имя, роль) из файла; пустое значение — оставить текущее
+    pending: dict[int, tuple[str, str]] = {}
+    last_progress = time.monotonic()
+
+    async def flush():
+        if not pending:
+            return
+
+        # Итоговые строки собираются под замками по свежему списку: правки,
+        # сделанные во время импорта, не затираются, ушедшие не возвращаются
+        async with member_locks(chat_id, pending):
+            fresh = {m["user_id"]: m for m in await asyncio.to_thread(get_members, chat_id)}
+            batch = []
+            for user_id, (external_name, extra_role) in pending.items():
+                member = fresh.get(user_id)
+                if member is None:
+                    stats["not_found"] += 1
+                    continue
+
+                external_name = external_name or member.get("external_name") or ""
+                extra_role = extra_role or member.get("extra_role") or ""
+                if (
+                    external_name == (member.get("external_name") or "")
+                    and extra_role == (member.get("extra_role") or "")
+                ):
+                    stats["unchanged"] += 1
+                    continue
+
+                batch.append({
+                    "user_id": user_id,
+                    "username": member.get("username") or "",
+                    "external_name": external_name,
+                    "extra_role": extra_role,
+                })
+
+            if batch:
+                await asyncio.to_thread(bulk_update_members, chat_id, batch)
+
+        stats["applied"] += len(batch)
+        pending.clear()
+
+    async def next_batch() -> list:
+        # Чтение и разбор файла — в потоке и порциями: цикл событий не ждёт диск и регулярки
+        return await asyncio.to_thread(list, islice(rows, IMPORT_CHUNK))
+
+    try:
+        while batch := await next_batch():
+            for row in batch:
+                stats["total"] += 1
+
+                if row is None:
+                    stats["invalid"] += 1
+                    continue
+
+                member = by_id.get(row.get("user_id"))
+                if member is None:
+                    matches = by_username.get(row["username"].lower(), []) if row["username"] else []
+                    if len(matches) > 1:
+                        stats["ambiguous"] += 1
+                        continue
+                    member = matches[0] if matches else None
+
+                if member is None:
+                    stats["not_found"] += 1
+                    continue
+
+                if "fields" in row:
+                    values = txt_values(row["fields"], member)
+                    if values is None:
+                        stats["unclear"] += 1
+                        continue
+                else:
+                    values = row["external_name"], row["extra_role"]
+
+                # Пустые ячейки не стирают текущие значения
+                external_name, extra_role = values[0][:MAX_LEN], values[1][:MAX_LEN]
+
+                if (
+                    external_name in ("", member.get("external_name") or "")
+                    and extra_role in ("", member.get("extra_role") or "")
+                ):
+                    stats["unchanged"] += 1
+                    continue
+
+                pending[member["user_id"]] = (external_name, extra_role)
+
+                if len(pending) >= IMPORT_CHUNK:
+                    await flush()
+
+            if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                try:
+                    await status.edit_text(
+                        f"⏳ Импорт: обработано строк {stats['total']}, применено {stats['applied'] + len(pending)}"
+                    )
+                except Exception as e:
+                    logger.debug("Import progress edit failed: %s", e)
+
+        await flush()
+    except Exception as e:
+        logger.error("Import error (chat %s): %s", chat_id, e)
+        await status.edit_text(
+            f"⚠ Импорт прерван после {stats['applied']} применённых строк: ошибка сохранения."
+        )
+        if stats["applied"]:
+            schedule_roster_refresh(bot, chat_id)
+        return
+
+    if stats["applied"]:
+        schedule_roster_refresh(bot, chat_id)
+
+    unclear = (
+        f"\nПоля не разделить: <b>{stats['unclear']}</b> — для таких строк используйте CSV"
+        if stats["unclear"] else ""
+    )
+    await status.edit_text(
+        "✅ <b>Импорт завершён</b>\n"
+        f"Строк: <b>{stats['total']}</b>\n"
+        f"Применено: <b>{stats['applied']}</b>\n"
+        f"Без изменений: <b>{stats['unchanged']}</b>\n"
+        f"Не найдены в списке: <b>{stats['not_found']}</b>\n"
+        f"Неоднозначные: <b>{stats['ambiguous']}</b>\n"
+        f"Не разобраны: <b>{stats['invalid']}</b>"
+        f"{unclear}",
+        parse_mode="HTML"
+    )
+
+    logger.info("Import finished: %s chat=%s", stats, chat_id)
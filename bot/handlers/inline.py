@@ -0,0 +1,112 @@
+import asyncio
+import html
+import time
+
+from aiogram import types
+from aiogram.enums import ChatMemberStatus
+
+from budget import TELEGRAM_BUDGET
+from config import INLINE_ACCESS_TTL, INLINE_CACHE_TIME, INLINE_MAX_CHATS, INLINE_CHECK_CONCURRENCY
+from core import bot, dp
+from db import MEMBERS_CACHE, repo
+from helpers import CHAT_TITLES, format_member_inline
+from logger import logger
+from search import search_chats
+
+# Больше Telegram не принимает в одном ответе на inline-запрос
+INLINE_RESULTS = 50
+INLINE_MIN_QUERY = 2
+
+# user_id -> (время проверки, чаты, где он сейчас состоит)
+ACCESS_CACHE: dict[int, tuple[float, list[int]]] = {}
+
+# Один inline-запрос не должен выбирать весь бюджет Bot API: проверки идут по несколько сразу
+CHECK_SLOTS = asyncio.Semaphore(INLINE_CHECK_CONCURRENCY)
+
+PRESENT_STATUSES = {
+    ChatMemberStatus.CREATOR,
+    ChatMemberStatus.ADMINISTRATOR,
+    ChatMemberStatus.MEMBER,
+    ChatMemberStatus.RESTRICTED,
+}
+
+async def check_chat(chat_id: int, user_id: int) -> bool:
+    """Пользователь сейчас в чате. Любая ошибка — нет доступа."""
+    try:
+        async with CHECK_SLOTS:
+            await TELEGRAM_BUDGET.wait("inline")
+            member = await bot.get_chat_member(chat_id, user_id)
+            if member.status not in PRESENT_STATUSES:
+                return False
+            if member.status == ChatMemberStatus.RESTRICTED and not getattr(member, "is_member", True):
+                return False
+
+            # Обычно название уже известно из сообщений чата
+            if chat_id not in CHAT_TITLES:
+                await TELEGRAM_BUDGET.wait("inline")
+                chat = await bot.get_chat(chat_id)
+                CHAT_TITLES[chat_id] = chat.title or str(chat_id)
+        return True
+    except Exception as e:
+        logger.debug("Inline: нет доступа к чату %s для %s: %s", chat_id, user_id, e)
+        return False
+
+async def allowed_chats(user_id: int) -> list[int]:
+    """
+    Чаты, по спискам которых пользователю можно искать: есть в members
+    и Telegram подтверждает участие. Проверяется не больше INLINE_MAX_CHATS чатов,
+    сначала те, чьи списки уже в кэше. Результат кэшируется на INLINE_ACCESS_TTL.
+    """
+    cached = ACCESS_CACHE.get(user_id)
+    if cached and time.time() - cached[0] < INLINE_ACCESS_TTL:
+        return cached[1]
+
+    try:
+        candidates = await asyncio.to_thread(repo.member_chats, user_id)
+    except Exception as e:
+        # Без БД отвечаем пустым результатом и не кэшируем отказ
+        logger.warning("Inline: не удалось получить чаты пользователя %s: %s", user_id, e)
+        return []
+
+    candidates = sorted(candidates, key=lambda chat_id: chat_id not in MEMBERS_CACHE)[:INLINE_MAX_CHATS]
+    checks = await asyncio.gather(*(check_chat(chat_id, user_id) for chat_id in candidates))
+    chats = [chat_id for chat_id, ok in zip(candidates, checks) if ok]
+
+    ACCESS_CACHE[user_id] = (time.time(), chats)
+    return chats
+
+def make_article(chat_id: int, row) -> types.InlineQueryResultArticle:
+    fields = ("full_name", "username", "external_name", "extra_role")
+    safe = {field: html.escape(row.get(field) or "") for field in fields}
+    chat_title = CHAT_TITLES.get(chat_id, str(chat_id))
+
+    username = row.get("username") or ""
+    parts = (f"@{username}" if username else "", row.get("extra_role") or "", chat_title)
+    description = " · ".join(part for part in parts if part)
+
+    return types.InlineQueryResultArticle(
+        id=f"{chat_id}:{row['user_id']}",
+        title=row.get("external_name") or row.get("full_name") or "Без имени",
+        description=description,
+        input_message_content=types.InputTextMessageContent(
+            message_text=f"{format_member_inline(safe)}\n<i>{html.escape(chat_title)}</i>",
+            parse_mode="HTML",
+        ),
+    )
+
+@dp.inline_query()
+async def inline_search(query: types.InlineQuery):
+    """
+    Поиск участника по спискам своих чатов из любого чата: @бот запрос.
+    Ответ личный (is_personal) — у каждого свой набор чатов.
+    """
+    text = query.query.strip()
+    if len(text) < INLINE_MIN_QUERY:
+        await query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=True)
+        return
+
+    chat_ids = await allowed_chats(query.from_user.id)
+    matches = await asyncio.to_thread(search_chats, chat_ids, text, INLINE_RESULTS)
+    results = [make_article(chat_id, row) for _, chat_id, row in matches]
+
+    await query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
@@ -5,19 +5,24 @@ from aiogram.filters import Command
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from core import bot, dp
-from db import get_members, upsert_user
-from helpers import format_member_inline, auto_delete, answer_temp
+from db import get_members, members_stale, upsert_user
+from locks import member_lock
+from helpers import format_member_inline, send_long_message, auto_delete, answer_temp
 
 PAGE_SIZE = 30
 
 @dp.message(Command("list"))
 @auto_delete()
 async def cmd_list(msg: types.Message):
-    await asyncio.to_thread(upsert_user, msg.chat.id, msg.from_user)
+    async with member_lock(msg.chat.id, msg.from_user.id):
+        await asyncio.to_thread(upsert_user, msg.chat.id, msg.from_user)
     rows = await asyncio.to_thread(get_members, msg.chat.id)
 
     if not rows:
-        await msg.answer("Список пуст 🕳️")
+        if members_stale(msg.chat.id):
+            await answer_temp(msg, "⚠ База данных сейчас недоступна, попробуйте позже.")
+        else:
+            await msg.answer("Список пуст 🕳️")
         return
 
     total_pages = (len(rows) + PAGE_SIZE - 1) // PAGE_SIZE
@@ -25,11 +30,14 @@ async def cmd_list(msg: types.Message):
     text = render_page(rows, page)
 
     await msg.answer(
-        f"<b>📋 Список участников</b>\n\n{text}",
+        f"<b>📋 Список участников</b>\n\n{text}{stale_note(msg.chat.id)}",
         parse_mode="HTML",
         reply_markup=pagination_kb(page, total_pages)
     )
 
+def stale_note(chat_id: int) -> str:
+    return "\n\n⚠ <i>Данные могут быть устаревшими: база данных недоступна</i>" if members_stale(chat_id) else ""
+
 def pagination_kb(page: int, total_pages: int):
     kb = InlineKeyboardBuilder()
 
@@ -59,15 +67,16 @@ def render_page(rows: list, page: int):
 
 @dp.callback_query(lambda c: c.data.startswith("list_page:"))
 async def list_pagination(callback: types.CallbackQuery):
-    page = max(1, min(page, total_pages))
+    page = int(callback.data.split(":", 1)[1])
 
     rows = await asyncio.to_thread(get_members, callback.message.chat.id)
-    total_pages = (len(rows) + PAGE_SIZE - 1) // PAGE_SIZE
+    total_pages = max(1, (len(rows) + PAGE_SIZE - 1) // PAGE_SIZE)
+    page = max(1, min(page, total_pages))
 
     text = render_page(rows, page)
 
     await callback.message.edit_text(
-        f"<b>📋 Список участников</b>\n\n{text}",
+        f"<b>📋 Список участников</b>\n\n{text}{stale_note(callback.message.chat.id)}",
         parse_mode="HTML",
         reply_markup=pagination_kb(page, total_pages)
     )
@@ -118,16 +127,11 @@ async def cmd_find(msg: types.Message):
         )
         return
 
-    lines = [
-        format_member_inline(row, i + 1)
-        for i, row in enumerate(results)
-    ]
-    full_text = "\n".join(lines)
-
     safe_query = raw_query.replace("<", "&lt;").replace(">", "&gt;")
-    header = f"🔎 <b>Результаты поиска:</b> <i>{safe_query}</i>"
 
-    await msg.answer(
-        f"{header}\n\n{full_text}",
-        parse_mode="HTML"
+    await send_long_message(
+        bot,
+        msg,
+        f"🔎 Результаты поиска: <i>{safe_query}</i>",
+        (format_member_inline(row, i) for i, row in enumerate(results, start=1))
     )
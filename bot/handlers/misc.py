@@ -7,16 +7,21 @@ from datetime import datetime
 
 from core import bot, dp
 from logger import logger
-from db import supabase, upsert_user
+from db import repo, update_member, upsert_user
 from helpers import (
     is_user_admin, get_admin_ids, auto_delete,
-    LAST_UPDATE, UPDATE_TTL, PENDING_ACTIONS
+    CHAT_TITLES, LAST_UPDATE, UPDATE_TTL
 )
+from callbacks import CALLBACK_PREFIX, ActionExpired, decode_action
+from roster import schedule_roster_refresh
+from locks import member_lock
+from eventlog import record_activity
 
 @dp.message(Command("help"))
 @auto_delete()
 async def cmd_help(msg: types.Message):
-    await asyncio.to_thread(upsert_user, msg.chat.id, msg.from_user)
+    async with member_lock(msg.chat.id, msg.from_user.id):
+        await asyncio.to_thread(upsert_user, msg.chat.id, msg.from_user)
 
     role = "Админ" if await is_user_admin(bot, msg) else "Участник"
 
@@ -28,13 +33,22 @@ async def cmd_help(msg: types.Message):
             "/name [имя] — задать своё имя\n"
             "/find [имя/@] — поиск участника\n"
             "/setname [@] [имя] — назначить имя другому (админ)\n"
-            "/export — экспорт списка (админ)\n"
+            "/export [txt|csv|xlsx] — экспорт списка в файл (админ)\n"
+            "/import — имена и роли из файла .txt (как /export) или .csv (админ)\n"
             "/cleanup — очистить список ушедших (админ)\n"
             "/add [роль] — установить себе роль (участник)\n"
-            "/addrole [@] [роль] — назначить роль другому участнику (админ)\n\n"
+            "/addrole [@] [роль] — назначить роль другому участнику (админ)\n"
+            "/roster — закреплённый живой список, /roster off — отключить (админ)\n"
+            "/stats — пришли, ушли и активность за день, неделю и месяц (админ)\n"
+            "/call_role [роль] — позвать всех с ролью, текст — со второй строки (админ)\n"
+            "/tmplist_call [список] [текст] — позвать участников временного списка (админ)\n\n"
+            "🔎 <b>Поиск из любого чата:</b> <code>@имя_бота запрос</code> — "
+            "участники списков ваших чатов, без сообщений в группе\n\n"
             "📖 <b>Как добавить участника:</b>\n"
             "• Если есть username (@) в базе данных (автоматически при заходе):\n"
-            "  <code>/setname @username Имя</code>\n\n"
+            "  <code>/setname @username Имя</code>\n"
+            "  несколько сразу — по строке на участника (так же /addrole):\n"
+            "  <code>/setname\n@user1 Имя\n@user2 Имя</code>\n\n"
             "• Если <b>username нет</b>, его можно добавить <u>только</u> так:\n"
             "  1) он должен написать любое сообщение в чат\n"
             "  2) вы отвечаете на его сообщение командой:\n"
@@ -53,20 +67,21 @@ async def cmd_help(msg: types.Message):
         parse_mode="HTML"
     )
 
-@dp.callback_query(lambda c: c.data.startswith("select_user:"))
+# select_user: — кнопки, выданные до подписанного формата
+@dp.callback_query(lambda c: c.data.startswith((CALLBACK_PREFIX, "select_user:")))
 async def select_user_callback(callback: types.CallbackQuery):
-    task_id = callback.data.split(":", 1)[1]
+    chat_id = callback.message.chat.id
+    try:
+        action = decode_action(chat_id, callback.data)
+    except ActionExpired:
+        await callback.answer("⌛ Кнопка устарела — повторите команду", show_alert=True)
+        return
 
-    if task_id not in PENDING_ACTIONS:
+    if action is None:
         await callback.answer("Старый или неверный выбор", show_alert=True)
         return
 
-    data = PENDING_ACTIONS.pop(task_id)
-
-    chat_id = data["chat_id"]
-    user_id = data["user_id"]
-    value = data["value"]
-    operation = data["operation"]
+    operation, user_id, value = action
 
     admins = await get_admin_ids(bot, chat_id)
     if callback.from_user.id not in admins:
@@ -75,11 +90,8 @@ async def select_user_callback(callback: types.CallbackQuery):
 
     try:
         if operation == "name":
-            supabase.table("members") \
-                .update({"external_name": value}) \
-                .eq("chat_id", chat_id) \
-                .eq("user_id", user_id) \
-                .execute()
+            async with member_lock(chat_id, user_id):
+                await asyncio.to_thread(update_member, chat_id, user_id, {"external_name": value})
 
             await callback.message.edit_text(
                 f"✨ Имя участника обновлено на <b>{value}</b>",
@@ -87,11 +99,8 @@ async def select_user_callback(callback: types.CallbackQuery):
             )
 
         elif operation == "role":
-            supabase.table("members") \
-                .update({"extra_role": value}) \
-                .eq("chat_id", chat_id) \
-                .eq("user_id", user_id) \
-                .execute()
+            async with member_lock(chat_id, user_id):
+                await asyncio.to_thread(update_member, chat_id, user_id, {"extra_role": value})
 
             await callback.message.edit_text(
                 f"✨ Роль участника обновлена на <b>{value}</b>",
@@ -103,53 +112,42 @@ async def select_user_callback(callback: types.CallbackQuery):
         await callback.answer("Ошибка сохранения", show_alert=True)
         return
 
+    schedule_roster_refresh(bot, chat_id)
     await callback.answer()
 
 @dp.message(lambda m: m.text and not m.text.startswith("/"))
 async def auto_register(msg: types.Message):
-    user = msg.from_user
-    uid = user.id
-    chat_id = msg.chat.id
     now = time.time()
 
-    try:
-        res = (
-            supabase.table("members")
-            .select("user_id")
-            .eq("chat_id", chat_id)
-            .eq("user_id", uid)
-            .maybe_single()
-            .execute()
-        )
-        exists = bool(res.data)
-    except:
-        exists = False
+    if msg.chat.type != "private" and not msg.from_user.is_bot:
+        record_activity(msg.chat.id, msg.from_user.id)
+        if msg.chat.title:
+            CHAT_TITLES[msg.chat.id] = msg.chat.title
 
-    if exists:
-        last = LAST_UPDATE.get(uid, 0)
-        if now - last < UPDATE_TTL:
+    async with member_lock(msg.chat.id, msg.from_user.id) as waited:
+        # Пока ждали, этого же участника обработал другой апдейт — повторять запись незачем
+        if waited and now - LAST_UPDATE.get(msg.from_user.id, 0) < UPDATE_TTL:
             return
 
-    LAST_UPDATE[uid] = now
+        await register_member(msg, now)
 
-    try:
-        res = (
-            supabase.table("members")
-            .select("*")
-            .eq("chat_id", chat_id)
-            .eq("user_id", uid)
-            .execute()
-        )
-
-        if res and isinstance(res.data, list) and len(res.data) > 0:
-            row = res.data[0]
-        else:
-            row = None
+async def register_member(msg: types.Message, now: float):
+    user = msg.from_user
+    uid = user.id
+    chat_id = msg.chat.id
 
+    try:
+        row = await asyncio.to_thread(repo.get_member, chat_id, uid)
     except Exception as e:
         logger.error("Auto-register select error: %s", e)
         row = None
 
+    if row:
+        last = LAST_UPDATE.get(uid, 0)
+        if now - last < UPDATE_TTL:
+            return
+
+    LAST_UPDATE[uid] = now
 
     new_username = user.username or ""
     new_full_name = user.full_name or ""
@@ -169,15 +167,14 @@ async def auto_register(msg: types.Message):
         return
 
     try:
-        (
-            supabase.table("members")
-            .update({
+        await asyncio.to_thread(
+            update_member,
+            chat_id,
+            uid,
+            {
                 "username": new_username,
                 "full_name": new_full_name
-            })
-            .eq("chat_id", chat_id)
-            .eq("user_id", uid)
-            .execute()
+            }
         )
     except Exception as e:
         logger.error("Auto-register update error: %s", e)
@@ -189,29 +186,10 @@ async def cmd_web(msg: types.Message):
     user_id = msg.from_user.id
 
     try:
-        res = (
-            supabase.table("chat_links")
-            .select("id")
-            .eq("chat_id", chat_id)
-            .eq("is_active", True)
-            .limit(1)
-            .execute()
-        )
-
-        if res.data:
-            token = res.data[0]["id"]
-        else:
-            insert_res = (
-                supabase.table("chat_links")
-                .insert({
-                    "chat_id": chat_id,
-                    "created_by": user_id,
-                    "is_active": True,
-                })
-                .execute()
-            )
+        token = await asyncio.to_thread(repo.get_active_chat_link, chat_id)
 
-            token = insert_res.data[0]["id"]
+        if not token:
+            token = await asyncio.to_thread(repo.create_chat_link, chat_id, user_id)
 
         url = f"https://memlist.vercel.app/chat/{token}"
 
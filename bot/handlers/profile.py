@@ -3,13 +3,15 @@ import asyncio
 from aiogram import types
 from aiogram.filters import Command
 
-from core import dp
+from core import bot, dp
 from logger import logger
-from db import supabase, upsert_user
+from db import update_member, upsert_user
+from locks import member_lock
 from helpers import (
     auto_delete,
     answer_temp
 )
+from roster import schedule_roster_refresh
     
 MAX_LEN = 100
 
@@ -48,12 +50,14 @@ async def cmd_name(msg: types.Message):
         )
         return
 
-    await asyncio.to_thread(
-        upsert_user,
-        msg.chat.id,
-        msg.from_user,
-        external_name
-    )
+    async with member_lock(msg.chat.id, msg.from_user.id):
+        await asyncio.to_thread(
+            upsert_user,
+            msg.chat.id,
+            msg.from_user,
+            external_name
+        )
+    schedule_roster_refresh(bot, msg.chat.id)
 
     await msg.answer(
         f"✅ Имя установлено: <b>{external_name}</b>",
@@ -96,16 +100,18 @@ async def cmd_add(msg: types.Message):
         return
 
     try:
-        (
-            supabase.table("members")
-            .update({"extra_role": role})
-            .eq("chat_id", msg.chat.id)
-            .eq("user_id", msg.from_user.id)
-            .execute()
-        )
+        async with member_lock(msg.chat.id, msg.from_user.id):
+            await asyncio.to_thread(
+                update_member,
+                msg.chat.id,
+                msg.from_user.id,
+                {"extra_role": role}
+            )
     except Exception as e:
         logger.error("Supabase add (self) error: %s", e)
         await msg.answer("⚠ Ошибка при сохранении.")
         return
 
+    schedule_roster_refresh(bot, msg.chat.id)
+
     await msg.answer(f"✅ Роль установлена: <b>{role}</b>", parse_mode="HTML")
@@ -0,0 +1,74 @@
+import asyncio
+
+from aiogram import types
+from aiogram.filters import Command
+
+from core import bot, dp
+from logger import logger
+from db import get_members, save_roster_message, delete_roster_message
+from helpers import admin_check, auto_delete, answer_temp
+from roster import current_roster, render_roster, remember_roster
+
+@dp.message(Command("roster"))
+@auto_delete()
+async def cmd_roster(msg: types.Message):
+    if not await admin_check(bot, msg):
+        return
+
+    args = msg.text.split()
+    chat_id = msg.chat.id
+
+    if len(args) > 1 and args[1].lower() == "off":
+        roster = await current_roster(chat_id)
+        await asyncio.to_thread(delete_roster_message, chat_id)
+        remember_roster(chat_id, None)
+
+        if roster:
+            try:
+                await bot.unpin_chat_message(chat_id, message_id=roster["message_id"])
+            except Exception as e:
+                logger.debug("Failed to unpin roster message: %s", e)
+
+        await answer_temp(msg, "🗑 Живой список отключён.")
+        return
+
+    previous = await current_roster(chat_id)
+
+    rows = await asyncio.to_thread(get_members, chat_id)
+    text = render_roster(rows)
+
+    sent = await msg.answer(text, parse_mode="HTML")
+
+    try:
+        await bot.pin_chat_message(chat_id, sent.message_id, disable_notification=True)
+    except Exception as e:
+        logger.warning("Не удалось закрепить ростер в чате %s: %s", chat_id, e)
+
+    row = {
+        "chat_id": chat_id,
+        "message_id": sent.message_id,
+        "thread_id": msg.message_thread_id,
+    }
+    await asyncio.to_thread(
+        save_roster_message,
+        chat_id,
+        sent.message_id,
+        msg.message_thread_id,
+        msg.from_user.id
+    )
+    remember_roster(chat_id, row, text)
+
+    if previous and previous["message_id"] != sent.message_id:
+        await retire_roster(chat_id, previous["message_id"])
+
+async def retire_roster(chat_id: int, message_id: int):
+    """Старый ростер после замены: открепить и удалить, чтобы он не висел устаревшим."""
+    try:
+        await bot.unpin_chat_message(chat_id, message_id=message_id)
+    except Exception as e:
+        logger.debug("Failed to unpin old roster message: %s", e)
+
+    try:
+        await bot.delete_message(chat_id, message_id)
+    except Exception as e:
+        logger.debug("Failed to delete old roster message: %s", e)
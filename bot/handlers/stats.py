@@ -0,0 +1,70 @@
+import asyncio
+
+from datetime import datetime, timedelta, timezone
+
+from aiogram import types
+from aiogram.filters import Command
+
+from core import bot, dp
+from logger import logger
+from db import repo, get_members
+from eventlog import flush_events
+from helpers import admin_check, auto_delete, answer_temp
+
+# (дней, заголовок); самый длинный период задаёт окно запроса агрегатов
+STATS_PERIODS = ((1, "Сегодня"), (7, "7 дней"), (30, "30 дней"))
+
+def signed(value: int) -> str:
+    return f"+{value}" if value > 0 else str(value)
+
+def render_period(by_day: dict[str, dict], today, days: int, title: str) -> list[str]:
+    rows = [by_day.get((today - timedelta(days=i)).isoformat(), {}) for i in range(days)]
+    joins = sum(row.get("joins", 0) for row in rows)
+    leaves = sum(row.get("leaves", 0) for row in rows)
+    active = [row.get("active", 0) for row in rows]
+
+    lines = [
+        f"<b>{title}</b>",
+        f"➕ пришли: <b>{joins}</b> · ➖ ушли: <b>{leaves}</b> · итого: <b>{signed(joins - leaves)}</b>",
+    ]
+    if days == 1:
+        lines.append(f"💬 активных: <b>{active[0]}</b>")
+    else:
+        lines.append(f"💬 активных в день: в среднем <b>{round(sum(active) / days)}</b>, максимум <b>{max(active)}</b>")
+    return lines
+
+@dp.message(Command("stats"))
+@auto_delete()
+async def cmd_stats(msg: types.Message):
+    if not await admin_check(bot, msg):
+        return
+
+    chat_id = msg.chat.id
+    today = datetime.now(timezone.utc).date()
+    since = today - timedelta(days=max(days for days, _ in STATS_PERIODS) - 1)
+
+    # Свои ещё не записанные события тоже должны попасть в ответ
+    await flush_events()
+
+    try:
+        rows = await asyncio.to_thread(repo.member_daily_stats, chat_id, since)
+    except Exception as e:
+        logger.error("Stats read error (chat %s): %s", chat_id, e)
+        await answer_temp(msg, "⚠ Не удалось получить статистику, попробуйте позже.")
+        return
+
+    members = await asyncio.to_thread(get_members, chat_id)
+    by_day = {str(row["day"])[:10]: row for row in rows}
+
+    lines = [
+        "📊 <b>Статистика чата</b> (дни по UTC)",
+        f"Сейчас в списке: <b>{len(members)}</b>",
+    ]
+    for days, title in STATS_PERIODS:
+        lines.append("")
+        lines.extend(render_period(by_day, today, days, title))
+
+    if not rows:
+        lines += ["", "<i>Событий пока нет: статистика копится с момента её включения.</i>"]
+
+    await msg.answer("\n".join(lines), parse_mode="HTML")
@@ -1,11 +1,16 @@
-import asyncio, re
+import asyncio, re, time
 from aiogram import types
 from aiogram.filters import Command
 
 from datetime import datetime, timedelta, timezone
-from db import supabase
+from db import repo, parse_timestamp
+from bus import BUS
+from config import BUS_CACHE_TTL
+from metrics import cache_hit
+from records import LIST_COLUMNS, SEARCH_COLUMNS
 
 from core import bot, dp
+from caller import call_report, run_call
 from helpers import (
     admin_check,
     extract_users_from_message,
@@ -19,6 +24,20 @@ from helpers import (
 MAX_USERS = 50
 NAME_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{1,31}$", re.I)
 
+# chat_id -> (время загрузки, {name: строка активного списка}).
+# Держится только при подключённой шине: без неё правки других процессов не видны
+TMPLIST_CACHE: dict[int, tuple[float, dict[str, dict]]] = {}
+
+def invalidate_tmplists(chat_id: int):
+    TMPLIST_CACHE.pop(chat_id, None)
+
+def _on_bus_event(event: dict):
+    if event["table"] == "tmplists":
+        invalidate_tmplists(event["chat_id"])
+
+BUS.subscribe(_on_bus_event)
+BUS.on_state(lambda connected: TMPLIST_CACHE.clear())
+
 @dp.message(Command(commands=["tmplist", "tmlist"], ignore_case=True))
 @auto_delete()
 async def cmd_tmplist(msg: types.Message):
@@ -47,24 +66,13 @@ async def cmd_tmplist(msg: types.Message):
 
     chat_id = msg.chat.id
 
-    deactivate_expired_tmplists(chat_id)
-
-    res = (
-        supabase
-        .table("tmplists")
-        .select("id")
-        .eq("chat_id", chat_id)
-        .eq("name", list_name)
-        .eq("is_active", True)
-        .limit(1)
-        .execute()
-    )
+    active = await deactivate_expired_tmplists(chat_id)
 
-    tmplist_id = res.data[0]["id"] if res.data else None
+    tmplist_id = active[list_name]["id"] if list_name in active else None
     is_new_list = tmplist_id is None
 
     if is_new_list:
-        if count_active_tmplists(chat_id) >= 3:
+        if len(active) >= 3:
             await answer_temp(
                 msg,
                 "❌ <b>Достигнут лимит временных списков.</b>\n\n"
@@ -74,7 +82,7 @@ async def cmd_tmplist(msg: types.Message):
             )
             return
 
-    users = extract_users_from_message(msg)
+    users = await extract_users_from_message(msg)
 
     if not users:
         await answer_temp(
@@ -95,6 +103,7 @@ async def cmd_tmplist(msg: types.Message):
 
     if len(users) > MAX_USERS:
         await answer_temp(
+            msg,
             f"❌ Слишком много участников.\n"
             f"Максимум: {MAX_USERS}",
         )
@@ -108,13 +117,17 @@ async def cmd_tmplist(msg: types.Message):
         lines.append(f"{i}. {name}")
 
     if is_new_list:
-        tmplist_id = create_tmplist(
+        tmplist_id = await create_tmplist(
             chat_id=msg.chat.id,
             created_by=msg.from_user.id,
             name=list_name,
         )
 
-    added_count = insert_tmplist_items(tmplist_id, [u.id for u in users])
+    added_count = await asyncio.to_thread(
+        repo.add_tmplist_items,
+        tmplist_id,
+        [u.id for u in users]
+    )
 
     if added_count == 0:
         footer = "ℹ️ Все указанные пользователи уже были в списке"
@@ -134,7 +147,7 @@ async def cmd_tmplist(msg: types.Message):
         parse_mode="HTML",
     )
 
-def create_tmplist(
+async def create_tmplist(
     chat_id: int,
     created_by: int,
     name: str,
@@ -142,52 +155,48 @@ def create_tmplist(
 ) -> str:
     expires_at = datetime.now(timezone.utc) + timedelta(hours=24)
 
-    res = (
-        supabase
-        .table("tmplists")
-        .insert({
-            "chat_id": chat_id,
-            "created_by": created_by,
-            "expires_at": expires_at.isoformat(),
-            "message_id": message_id,
-            "name": name,
-        })
-        .execute()
-    )
-
-    return res.data[0]["id"]
+    try:
+        return await asyncio.to_thread(
+            repo.create_tmplist,
+            chat_id,
+            created_by,
+            name,
+            expires_at,
+            message_id
+        )
+    finally:
+        invalidate_tmplists(chat_id)
+
+async def active_tmplists(chat_id: int) -> dict[str, dict]:
+    """Активные списки чата: name -> строка (id, name, expires_at, created_by)."""
+    cached = TMPLIST_CACHE.get(chat_id)
+    hit = BUS.connected and cached is not None and time.time() - cached[0] < BUS_CACHE_TTL
+    cache_hit("tmplists", hit)
+    if hit:
+        return cached[1]
+
+    rows = await asyncio.to_thread(repo.list_active_tmplists, chat_id)
+    state = {row["name"]: row for row in rows}
+
+    if BUS.connected:
+        TMPLIST_CACHE[chat_id] = (time.time(), state)
+    return state
+
+async def deactivate_expired_tmplists(chat_id: int) -> dict[str, dict]:
+    """Снимает истёкшие списки (только если такие есть) и возвращает оставшиеся активные."""
+    now = datetime.now(timezone.utc)
+    state = await active_tmplists(chat_id)
 
-def insert_tmplist_items(tmplist_id: str, user_ids: list[int]) -> int:
-    rows = [{"tmplist_id": tmplist_id, "user_id": uid} for uid in user_ids]
-    if not rows:
-        return 0
-
-    res = supabase.table("tmplist_items").insert(rows).execute()
-    return len(res.data or [])
-
-def deactivate_expired_tmplists(chat_id: int) -> None:
-    now = datetime.now(timezone.utc).isoformat()
-    (
-        supabase.table("tmplists")
-        .update({"is_active": False})
-        .eq("chat_id", chat_id)
-        .eq("is_active", True)
-        .lte("expires_at", now)
-        .execute()
-    )
+    expired = {
+        name for name, row in state.items()
+        if parse_timestamp(row["expires_at"]) <= now.timestamp()
+    }
+    if not expired:
+        return state
 
-def count_active_tmplists(chat_id: int) -> int:
-    now = datetime.now(timezone.utc).isoformat()
-    res = (
-        supabase
-        .table("tmplists")
-        .select("id", count="exact")
-        .eq("chat_id", chat_id)
-        .eq("is_active", True)
-        .gt("expires_at", now)
-        .execute()
-    )
-    return res.count or 0
+    await asyncio.to_thread(repo.deactivate_expired_tmplists, chat_id, now)
+    invalidate_tmplists(chat_id)
+    return {name: row for name, row in state.items() if name not in expired}
 
 @dp.message(Command(commands=["tmplists"], ignore_case=True))
 @auto_delete()
@@ -197,29 +206,19 @@ async def cmd_tmplists(msg: types.Message):
 
     chat_id = msg.chat.id
 
-    deactivate_expired_tmplists(chat_id)
-
-    res = (
-        supabase
-        .table("tmplists")
-        .select("name, expires_at, created_by")
-        .eq("chat_id", chat_id)
-        .eq("is_active", True)
-        .order("expires_at")
-        .execute()
-    )
+    active = await deactivate_expired_tmplists(chat_id)
+    rows = sorted(active.values(), key=lambda row: parse_timestamp(row["expires_at"]))
 
-    if not res.data:
+    if not rows:
         await msg.answer("ℹ️ Активных временных списков нет.")
         return
 
     lines = ["📋 <b>Активные временные списки:</b>\n"]
     now = datetime.now(timezone.utc)
 
-    for row in res.data:
-        expires = datetime.fromisoformat(row["expires_at"])
-        remaining = expires - now
-        hours = int(remaining.total_seconds() // 3600)
+    for row in rows:
+        remaining = parse_timestamp(row["expires_at"]) - now.timestamp()
+        hours = int(remaining // 3600)
 
         lines.append(
             f"• <b>{row['name']}</b> — ⏱ {hours}ч осталось"
@@ -244,67 +243,86 @@ async def cmd_tmplist_show(msg: types.Message):
     list_name = args[1].lower()
     chat_id = msg.chat.id
 
-    deactivate_expired_tmplists(chat_id)
-
-    res = (
-        supabase
-        .table("tmplists")
-        .select("id")
-        .eq("chat_id", chat_id)
-        .eq("name", list_name)
-        .eq("is_active", True)
-        .limit(1)
-        .execute()
-    )
+    active = await deactivate_expired_tmplists(chat_id)
+    tmplist_id = active[list_name]["id"] if list_name in active else None
 
-    if not res.data:
+    if not tmplist_id:
         await answer_temp(
             msg,
             "❌ Активный список не найден."
         )
         return
 
-    tmplist_id = res.data[0]["id"]
-
-    items = (
-        supabase
-        .table("tmplist_items")
-        .select("user_id")
-        .eq("tmplist_id", tmplist_id)
-        .execute()
-        .data
-    )
+    user_ids = await asyncio.to_thread(repo.tmplist_user_ids, tmplist_id)
 
-    if not items:
+    if not user_ids:
         await msg.answer(
             f"📄 <b>{list_name}</b>\nℹ️ Список пуст.",
             parse_mode="HTML"
         )
         return
 
-    user_ids = [row["user_id"] for row in items]
-
-    members = (
-        supabase
-        .table("members")
-        .select("full_name, username, external_name, extra_role")
-        .eq("chat_id", chat_id)
-        .in_("user_id", user_ids)
-        .execute()
-        .data
+    members = await asyncio.to_thread(
+        repo.members_by_ids,
+        chat_id,
+        user_ids,
+        LIST_COLUMNS
     )
 
-    lines = [
-        format_member_inline(row, i)
-        for i, row in enumerate(members, start=1)
-    ]
-
     await send_long_message(
         bot,
         msg,
         f"📄 Список {list_name}",
-        "\n".join(lines)
+        (format_member_inline(row, i) for i, row in enumerate(members, start=1))
+    )
+
+@dp.message(Command(commands=["tmplist_call"], ignore_case=True))
+@auto_delete()
+async def cmd_tmplist_call(msg: types.Message):
+    if not await admin_check(bot, msg):
+        return
+
+    args = msg.text.split(maxsplit=2)
+    if len(args) < 2:
+        await answer_temp(
+            msg,
+            "❌ Укажи имя списка.\nПример: /tmplist_call raid1 Сбор в 20:00"
+        )
+        return
+
+    list_name = args[1].lower()
+    text = args[2].strip() if len(args) > 2 else ""
+    chat_id = msg.chat.id
+
+    active = await deactivate_expired_tmplists(chat_id)
+    tmplist_id = active[list_name]["id"] if list_name in active else None
+
+    if not tmplist_id:
+        await answer_temp(
+            msg,
+            "❌ Активный список не найден."
+        )
+        return
+
+    user_ids = await asyncio.to_thread(repo.tmplist_user_ids, tmplist_id)
+
+    if not user_ids:
+        await answer_temp(msg, "ℹ️ Список пуст, звать некого.")
+        return
+
+    rows = await asyncio.to_thread(
+        repo.members_by_ids,
+        chat_id,
+        user_ids,
+        SEARCH_COLUMNS
     )
+    # Кого уже нет в members, всё равно зовём — упоминание по id работает и без строки
+    by_id = {row["user_id"]: row for row in rows}
+    members = [by_id.get(user_id, {"user_id": user_id}) for user_id in user_ids]
+
+    sent, failed = await run_call(bot, msg, list_name, text, members)
+    if failed:
+        await answer_temp(msg, call_report(sent, failed))
 
 @dp.message(Command(commands=["tmplist_delete"], ignore_case=True))
 @auto_delete()
@@ -323,19 +341,12 @@ async def cmd_tmplist_delete(msg: types.Message):
     list_name = args[1].lower()
     chat_id = msg.chat.id
 
-    deactivate_expired_tmplists(chat_id)
+    await deactivate_expired_tmplists(chat_id)
 
-    res = (
-        supabase
-        .table("tmplists")
-        .update({"is_active": False})
-        .eq("chat_id", chat_id)
-        .eq("name", list_name)
-        .eq("is_active", True)
-        .execute()
-    )
+    deleted = await asyncio.to_thread(repo.deactivate_tmplist, chat_id, list_name)
+    invalidate_tmplists(chat_id)
 
-    if not res.data:
+    if not deleted:
         await answer_temp(
             msg,
             "❌ Активный список не найден."
@@ -366,29 +377,17 @@ async def cmd_tmplist_remove(msg: types.Message):
     list_name = args[1].lower()
     chat_id = msg.chat.id
 
-    deactivate_expired_tmplists(chat_id)
-
-    res = (
-        supabase
-        .table("tmplists")
-        .select("id")
-        .eq("chat_id", chat_id)
-        .eq("name", list_name)
-        .eq("is_active", True)
-        .limit(1)
-        .execute()
-    )
+    active = await deactivate_expired_tmplists(chat_id)
+    tmplist_id = active[list_name]["id"] if list_name in active else None
 
-    if not res.data:
+    if not tmplist_id:
         await answer_temp(
             msg,
             "❌ Активный список не найден."
         )
         return
 
-    tmplist_id = res.data[0]["id"]
-
-    users = extract_users_from_message(msg)
+    users = await extract_users_from_message(msg)
     if not users:
         await answer_temp(
             msg,
@@ -398,14 +397,7 @@ async def cmd_tmplist_remove(msg: types.Message):
 
     user_ids = list({u.id for u in users})
 
-    (
-        supabase
-        .table("tmplist_items")
-        .delete()
-        .eq("tmplist_id", tmplist_id)
-        .in_("user_id", user_ids)
-        .execute()
-    )
+    await asyncio.to_thread(repo.remove_tmplist_items, tmplist_id, user_ids)
 
     await msg.answer(
         f"🧹 Удалено пользователей: {len(user_ids)} из списка <b>{list_name}</b>",
@@ -0,0 +1,116 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+
+from aiohttp import web
+
+from config import LOOP_LAG_INTERVAL, LOOP_STALL_THRESHOLD, POLL_STALE_AFTER, HEALTH_DB_PROBE_INTERVAL
+from db import repo
+from logger import logger
+from metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+STARTED = time.monotonic()
+
+# Последний такт монитора цикла событий и измеренная на нём задержка планирования
+LAST_TICK = STARTED
+LAST_LAG = 0.0
+
+# Последний успешный getUpdates (отмечает TelegramMetricsMiddleware); None — ещё не было
+LAST_POLL: float | None = None
+
+# (время проверки, БД ответила) — пробный запрос не чаще HEALTH_DB_PROBE_INTERVAL
+DB_PROBE: tuple[float, bool] = (0.0, False)
+
+def polled():
+    global LAST_POLL
+    LAST_POLL = time.monotonic()
+
+def loop_lag() -> float:
+    """Задержка цикла: измеренная на последнем такте или, если такта давно нет, время без него."""
+    overdue = time.monotonic() - LAST_TICK - LOOP_LAG_INTERVAL
+    return max(LAST_LAG, overdue, 0.0)
+
+def _watch_loop(loop_thread: int):
+    """
+    Поток-сторож: если такт монитора не приходит дольше LOOP_STALL_THRESHOLD,
+    цикл событий чем-то занят — пишем в лог стек его потока (один раз на зависание).
+    """
+    reported = None
+
+    while True:
+        time.sleep(LOOP_LAG_INTERVAL)
+
+        tick = LAST_TICK
+        stalled = time.monotonic() - tick - LOOP_LAG_INTERVAL
+        if stalled < LOOP_STALL_THRESHOLD or reported == tick:
+            continue
+
+        reported = tick
+        frame = sys._current_frames().get(loop_thread)
+        stack = "".join(traceback.format_stack(frame)) if frame else "стек недоступен\n"
+        LOOP_STALLS.inc()
+        logger.warning("Цикл событий заблокирован уже %.2f с, сейчас выполняется:\n%s", stalled, stack.rstrip())
+
+async def loop_lag_loop():
+    """Меряет, насколько позже положенного просыпается sleep: это и есть задержка цикла событий."""
+    global LAST_TICK, LAST_LAG
+
+    threading.Thread(
+        target=_watch_loop, args=(threading.get_ident(),), name="loop-watchdog", daemon=True
+    ).start()
+
+    while True:
+        expected = time.monotonic() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+
+        now = time.monotonic()
+        LAST_LAG = max(now - expected, 0.0)
+        LAST_TICK = now
+        LOOP_LAG_SECONDS.observe(LAST_LAG)
+
+def _probe_db() -> bool:
+    # Идёт через предохранитель и повторы, поэтому ограничено DB_DEADLINE
+    try:
+        repo.chat_versions([0])
+        return True
+    except Exception as e:
+        logger.debug("Health: БД не ответила: %s", e)
+        return False
+
+async def db_reachable() -> bool:
+    global DB_PROBE
+
+    if repo.breaker.is_open:
+        return False
+
+    checked_at, ok = DB_PROBE
+    if time.monotonic() - checked_at >= HEALTH_DB_PROBE_INTERVAL:
+        ok = await asyncio.to_thread(_probe_db)
+        DB_PROBE = (time.monotonic(), ok)
+    return ok
+
+def _liveness() -> tuple[bool, dict]:
+    lag = loop_lag()
+    # До первого getUpdates отсчёт идёт от старта процесса
+    poll_age = time.monotonic() - (LAST_POLL if LAST_POLL is not None else STARTED)
+    ok = lag < LOOP_STALL_THRESHOLD and poll_age < POLL_STALE_AFTER
+    return ok, {"loop_lag": round(lag, 3), "poll_age": round(poll_age, 1), "polling": LAST_POLL is not None}
+
+async def _healthz(request: web.Request) -> web.Response:
+    """Liveness: цикл событий не завис и polling живой. 503 — инстанс пора перезапустить."""
+    ok, status = _liveness()
+    return web.json_response({"ok": ok, **status}, status=200 if ok else 503)
+
+async def _readyz(request: web.Request) -> web.Response:
+    """Readiness: вдобавок к liveness — первый getUpdates уже прошёл и БД отвечает."""
+    ok, status = _liveness()
+    status["db"] = await db_reachable()
+    ok = ok and status["polling"] and status["db"]
+    return web.json_response({"ok": ok, **status}, status=200 if ok else 503)
+
+ROUTES = [
+    web.get("/healthz", _healthz),
+    web.get("/readyz", _readyz),
+]
@@ -5,8 +5,11 @@ import re
 from aiogram import types
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from logger import logger
-from db import get_members, supabase
+from metrics import cache_hit
+from callbacks import encode_action
+from db import get_members, members_by_usernames
 from functools import wraps
+from typing import Iterable, Iterator
 
 LAST_UPDATE: dict[int, float] = {}
 UPDATE_TTL = 10
@@ -14,40 +17,119 @@ UPDATE_TTL = 10
 ADMIN_CACHE: dict[int, tuple[float, set[int]]] = {}
 ADMIN_CACHE_TTL = 10.0
 
-PENDING_ACTIONS: dict[str, dict] = {}
-
 WELCOME_SENT: dict[int, float] = {}
 WELCOME_TTL = 3600
 
+# chat_id -> название: запоминается из входящих сообщений, нужно для подписи результатов inline-поиска
+CHAT_TITLES: dict[int, str] = {}
+
 ZERO_WIDTH_SPACE = "\u200B"
 
 USERNAME_RE = re.compile(r'@([a-zA-Z0-9_]{5,32})')
+BULK_LINE_RE = re.compile(r'^\s*@([a-zA-Z0-9_]{5,32})\s+(.+?)\s*$')
+
+MESSAGE_LIMIT = 4096
+HTML_TAG_RE = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9-]*)[^>]*>")
+HTML_TOKEN_RE = re.compile(r"<[^>]*>|&#?[a-zA-Z0-9]+;|.", re.S)
+
+def utf16_len(text: str) -> int:
+    """Длина строки так, как её считает Telegram (в UTF-16 code units)."""
+    return len(text.encode("utf-16-le")) // 2
+
+def _apply_tags(stack: list[tuple[str, str]], text: str):
+    for m in HTML_TAG_RE.finditer(text):
+        name = m.group(2).lower()
+        if m.group(1):
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i][0] == name:
+                    del stack[i:]
+                    break
+        else:
+            stack.append((name, m.group(0)))
+
+def _closing_tags(stack: list[tuple[str, str]]) -> str:
+    return "".join(f"</{name}>" for name, _ in reversed(stack))
+
+def iter_message_parts(lines: Iterable[str], limit: int = MESSAGE_LIMIT) -> Iterator[str]:
+    """
+    Собирает строки в части не длиннее limit (в UTF-16) за один проход.
+    Режет по границам строк, а слишком длинную строку — между тегами/сущностями.
+    Открытые HTML-теги закрываются в конце части и открываются заново в следующей.
+    """
+    stack: list[tuple[str, str]] = []
+    buf: list[str] = []
+    size = 0
+    has_text = False
+
+    def flush() -> str:
+        nonlocal buf, size, has_text
+        part = "".join(buf) + _closing_tags(stack)
+        prefix = "".join(tag for _, tag in stack)
+        buf = [prefix] if prefix else []
+        size = utf16_len(prefix)
+        has_text = False
+        return part
+
+    for line in lines:
+        line_stack = list(stack)
+        _apply_tags(line_stack, line)
+        line_len = utf16_len(line) + (1 if has_text else 0)
+
+        if has_text and size + line_len + utf16_len(_closing_tags(line_stack)) > limit:
+            yield flush()
+            line_len -= 1
+
+        if size + line_len + utf16_len(_closing_tags(line_stack)) <= limit:
+            if has_text:
+                buf.append("\n")
+            buf.append(line)
+            size += line_len
+            stack = line_stack
+            has_text = True
+            continue
 
-async def send_long_message(bot, msg: types.Message, header: str, text: str):
+        # Строка не помещается даже в пустую часть — режем по токенам
+        for token in HTML_TOKEN_RE.findall(line):
+            token_stack = list(stack)
+            if token.startswith("<"):
+                _apply_tags(token_stack, token)
+            token_len = utf16_len(token)
+
+            if has_text and size + token_len + utf16_len(_closing_tags(token_stack)) > limit:
+                yield flush()
+
+            buf.append(token)
+            size += token_len
+            stack = token_stack
+            has_text = True
+
+    if has_text:
+        yield "".join(buf) + _closing_tags(stack)
+
+async def send_long_message(bot, msg: types.Message, header: str, text: str | Iterable[str]):
     chat_id = msg.chat.id
     thread_id = msg.message_thread_id
 
-    MAX_LEN = 4096
-
-    parts = []
-    while len(text) > MAX_LEN:
-        split_pos = text.rfind("\n", 0, MAX_LEN)
-        if split_pos == -1:
-            split_pos = MAX_LEN
-        parts.append(text[:split_pos])
-        text = text[split_pos:].lstrip()
-    parts.append(text)
+    lines = text.split("\n") if isinstance(text, str) else text
+    reserve = utf16_len(f"<b>{header} (0000/0000)</b>\n\n")
 
-    total = len(parts)
+    parts = iter_message_parts(lines, MESSAGE_LIMIT - reserve)
+    part = next(parts, "")
+    i = 1
 
-    for i, part in enumerate(parts, start=1):
-        title = f"{header} ({i}/{total})"
+    # Части не собираются в список: следующая готовится, пока текущая ещё не отправлена,
+    # и в памяти их не больше двух. Общее число заранее не известно, поэтому
+    # промежуточные части подписаны «(i)», а последняя — «(n/n)»
+    while part is not None:
+        following = next(parts, None)
+        counter = f"{i}/{i}" if following is None else str(i)
         await bot.send_message(
             chat_id,
-            f"<b>{title}</b>\n\n{part}",
+            f"<b>{header} ({counter})</b>\n\n{part}",
             parse_mode="HTML",
             message_thread_id=thread_id
         )
+        part, i = following, i + 1
 
 async def get_admin_ids(bot, chat_id: int) -> set[int]:
     """Возвращает множество ID админов с кэшем на несколько секунд."""
@@ -55,8 +137,11 @@ async def get_admin_ids(bot, chat_id: int) -> set[int]:
     cached = ADMIN_CACHE.get(chat_id)
 
     if cached and now - cached[0] < ADMIN_CACHE_TTL:
+        cache_hit("admins", True)
         return cached[1]
 
+    cache_hit("admins", False)
+
     try:
         admins = await bot.get_chat_administrators(chat_id)
         admin_ids = {a.user.id for a in admins}
@@ -124,20 +209,6 @@ def format_member_inline(row: dict, index: int | None = None) -> str:
         return f"{index}. {full_name}{username_part}{external_part}{role_part}"
     return f"{full_name}{username_part}{external_part}{role_part}"
 
-def format_member_txt(row: dict, index: int | None = None) -> str:
-    full_name = row.get("full_name") or "Без имени"
-    username = row.get("username") or ""
-    external = row.get("external_name") or ""
-    role = row.get("extra_role") or ""
-
-    username_part = f" (@{username})" if username else ""
-    external_part = f" — {external}" if external else ""
-    role_part = f" — {role}" if role else ""
-
-    if index is not None:
-        return f"{index}. {full_name}{username_part}{external_part}{role_part}"
-    return f"{full_name}{username_part}{external_part}{role_part}"
-
 async def find_user_by_target(chat_id: int, target: str):
     """
     Улучшенный поиск:
@@ -203,18 +274,9 @@ async def show_user_selection(msg: types.Message, matches: list, operation: str,
 
         text_lines.append(f"• {display}")
 
-        task_id = f"{msg.chat.id}_{uid}_{operation}_{int(time.time())}"
-
-        PENDING_ACTIONS[task_id] = {
-            "chat_id": msg.chat.id,
-            "user_id": uid,
-            "value": value,
-            "operation": operation
-        }
-
         kb.button(
             text=full[:20],
-            callback_data=f"select_user:{task_id}"
+            callback_data=encode_action(msg.chat.id, operation, uid, value)
         )
 
     kb.adjust(2)
@@ -224,6 +286,29 @@ async def show_user_selection(msg: types.Message, matches: list, operation: str,
         reply_markup=kb.as_markup()
     )
 
+def parse_bulk_pairs(text: str) -> tuple[list[tuple[str, str]], list[str]]:
+    """
+    Строки вида «@username значение» после команды (можно и в первой строке).
+    Возвращает пары (username в нижнем регистре, значение) и строки, которые не разобрались.
+    """
+    parts = (text or "").split(maxsplit=1)
+    body = parts[1] if len(parts) > 1 else ""
+
+    pairs = []
+    invalid = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+
+        m = BULK_LINE_RE.match(line)
+        if not m:
+            invalid.append(line.strip())
+            continue
+
+        pairs.append((m.group(1).lower(), m.group(2)))
+
+    return pairs, invalid
+
 def get_target_user_from_reply(msg: types.Message):
     reply = msg.reply_to_message
     if not reply:
@@ -269,7 +354,7 @@ async def answer_temp(
     asyncio.create_task(delete_command_later(reply, delay))
     return reply
 
-def extract_users_from_message(msg: types.Message) -> list[types.User]:
+async def extract_users_from_message(msg: types.Message) -> list[types.User]:
     users: dict[int, types.User] = {}
 
     if msg.entities:
@@ -280,22 +365,9 @@ def extract_users_from_message(msg: types.Message) -> list[types.User]:
     text = msg.text or ""
     usernames = {m.group(1).lower() for m in USERNAME_RE.finditer(text)}
 
-    for username in usernames:
-        res = (
-            supabase
-            .table("members")
-            .select("user_id, username, full_name, external_name")
-            .eq("chat_id", msg.chat.id)
-            .eq("username", username)
-            .limit(1)
-            .execute()
-        )
-
-        if not res.data:
-            continue
-
-        row = res.data[0]
+    rows = await asyncio.to_thread(members_by_usernames, msg.chat.id, sorted(usernames))
 
+    for row in rows:
         users[row["user_id"]] = types.User(
             id=row["user_id"],
             is_bot=False,
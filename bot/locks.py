@@ -0,0 +1,53 @@
+import asyncio
+import time
+import weakref
+
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from metrics import LOCK_ACQUIRES, LOCK_WAIT_SECONDS, LOCKS_ACTIVE
+
+class KeyedLocks:
+    """
+    asyncio.Lock на ключ, создаётся по требованию. Словарь держит замки
+    слабыми ссылками: пока замок кто-то держит или ждёт, он жив, потом
+    освобождается сам, и словарь не растёт вместе с числом ключей.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        LOCKS_ACTIVE.set_function(lambda: len(self._locks), lock=name)
+
+    @asynccontextmanager
+    async def hold(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[key] = lock
+
+        contended = lock.locked()
+        LOCK_ACQUIRES.inc(lock=self.name, contended="yes" if contended else "no")
+
+        started = time.perf_counter()
+        async with lock:
+            if contended:
+                LOCK_WAIT_SECONDS.observe(time.perf_counter() - started, lock=self.name)
+            yield contended
+
+# Записи одного участника (select → insert/update) выполняются по очереди
+MEMBER_LOCKS = KeyedLocks("member")
+
+def member_lock(chat_id: int, user_id: int):
+    return MEMBER_LOCKS.hold((chat_id, user_id))
+
+@asynccontextmanager
+async def member_locks(chat_id: int, user_ids):
+    """
+    Замки сразу нескольких участников — для пакетных записей. Берутся по
+    возрастанию user_id: два пакета с общими участниками не ждут друг друга
+    по кругу. Внутри нельзя брать member_lock тех же участников — замки не реентерабельны.
+    """
+    async with AsyncExitStack() as stack:
+        for user_id in sorted(set(user_ids)):
+            await stack.enter_async_context(member_lock(chat_id, user_id))
+        yield
@@ -1,5 +1,13 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+import time
+
+from config import LOG_FORMAT, LOG_QUEUE_SIZE, LOG_RATE_WINDOW, LOG_RATE_BURST
 
 class ColorFormatter(logging.Formatter):
     COLORS = {
@@ -16,14 +24,151 @@ class ColorFormatter(logging.Formatter):
         message = super().format(record)
         return f"{color}{message}{self.RESET}"
 
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись — для сборщиков логов."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        # Стек уже отрендерен в prepare() при постановке в очередь, exc_info к этому времени нет
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        return json.dumps(entry, ensure_ascii=False)
+
+class RateLimitFilter(logging.Filter):
+    """
+    Не больше burst записей за window секунд на один ключ — шаблон сообщения
+    (record.msg) или extra={"log_key": ...}. Лишние отбрасываются до постановки
+    в очередь; их число дописывается к первой записи следующего окна, а если её
+    не было — выходит сводкой из flush(). Точный счёт — suppressed_total
+    (метрика memlist_log_records_dropped{reason="rate_limited"}).
+    ERROR и выше не ограничиваются.
+    """
+
+    def __init__(self, window: float, burst: int):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.suppressed_total = 0
+        # ключ -> [начало окна, записей в окне, отброшено в окне]
+        self._keys: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.ERROR:
+            return True
+
+        key = (record.name, getattr(record, "log_key", None) or record.msg)
+        now = time.monotonic()
+
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                self._keys[key] = [now, 1, 0]
+                if len(self._keys) > 10_000:
+                    self._evict(now)
+                if suppressed:
+                    record.suppressed = suppressed
+                    record.msg = f"{record.msg} [ещё {suppressed} таких же подавлено]"
+                return True
+
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+
+            state[2] += 1
+            self.suppressed_total += 1
+            return False
+
+    def flush(self) -> list[tuple[str, str, int]]:
+        """Закрывает истёкшие окна. Возвращает те, где что-то подавили: (логгер, ключ, сколько)."""
+        now = time.monotonic()
+        flushed = []
+        with self._lock:
+            for key, state in list(self._keys.items()):
+                if now - state[0] >= self.window:
+                    if state[2]:
+                        flushed.append((key[0], str(key[1]), state[2]))
+                    del self._keys[key]
+        return flushed
+
+    def _evict(self, now: float):
+        for key, state in list(self._keys.items()):
+            if now - state[0] >= self.window:
+                del self._keys[key]
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Вызывающий поток (чаще всего цикл событий) только кладёт запись в очередь:
+    форматирование и запись в stdout — в потоке QueueListener.
+    Аргументы сообщения форматируются там же, поэтому их не стоит менять после вызова логгера.
+    Переполненная очередь отбрасывает запись, а не блокирует.
+    """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Стек исключения рендерим сразу: к моменту записи кадры уже будут другими
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        # Форматтеры берут готовый exc_text, а трейсбек держал бы кадры живыми, пока запись в очереди
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+FORMATTERS = {
+    "json": lambda: JsonFormatter(),
+    "plain": lambda: logging.Formatter("[%(levelname)s] %(message)s"),
+    "color": lambda: ColorFormatter("[%(levelname)s] %(message)s"),
+}
+
 handler = logging.StreamHandler(sys.stdout)
 handler.setLevel(logging.INFO)
-handler.setFormatter(ColorFormatter("[%(levelname)s] %(message)s"))
+handler.setFormatter(FORMATTERS.get(LOG_FORMAT, FORMATTERS["color"])())
+
+rate_limit = RateLimitFilter(LOG_RATE_WINDOW, LOG_RATE_BURST)
+queue_handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+queue_handler.addFilter(rate_limit)
+
+listener = logging.handlers.QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+listener.start()
+# При выходе дописываем всё, что осталось в очереди
+atexit.register(listener.stop)
+
+def _report_suppressed():
+    # Всплеск, после которого шаблон больше не писали, иначе остался бы без отметки в логе
+    while True:
+        time.sleep(rate_limit.window)
+        for name, key, count in rate_limit.flush():
+            logging.getLogger(name).warning(
+                "Подавлено %s записей «%s» за %s с", count, key, rate_limit.window,
+                extra={"log_key": "rate_limit_summary", "suppressed": count},
+            )
+
+if LOG_RATE_BURST > 0 and LOG_RATE_WINDOW > 0:
+    threading.Thread(target=_report_suppressed, name="log-rate-limit", daemon=True).start()
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 logger.handlers.clear()
-logger.addHandler(handler)
+logger.addHandler(queue_handler)
 
 # 🔕 Убираем шум от библиотек
 logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -1,26 +1,105 @@
+import startup
+
 import asyncio
+import hashlib
+import json
+
 from aiogram import types
 
 from core import bot, dp
+from config import (
+    METRICS_HOST, METRICS_PORT, SNAPSHOT_PATH, COMMANDS_HASH_PATH, MEMBERS_REFRESH_INTERVAL,
+    RECONCILE_INTERVAL,
+)
+from logger import logger
+from metrics import start_http_server
+from middlewares import setup_middlewares
+from snapshot import load_snapshot, save_snapshot, snapshot_loop
+from refresher import members_refresh_loop
+from bus import BUS
+from pool import shutdown_pool
+from eventlog import event_writer_loop, flush_events
+from reconciler import reconcile_loop
+from health import ROUTES as HEALTH_ROUTES, loop_lag_loop
+
+startup.mark("import_core")
 
 import handlers
 
+startup.mark("import_handlers")
+
+BOT_COMMANDS = [
+    types.BotCommand(command="help", description="Помощь / команды"),
+    types.BotCommand(command="list", description="Показать список участников"),
+    types.BotCommand(command="name", description="Установить своё имя"),
+    types.BotCommand(command="add", description="Установить себе роль"),
+    types.BotCommand(command="find", description="Поиск участника"),
+    types.BotCommand(command="setname", description="Установить имя другому (админ)"),
+    types.BotCommand(command="addrole", description="Назначить роль участнику (админ)"),
+    types.BotCommand(command="export", description="Экспорт списка (админ)"),
+    types.BotCommand(command="import", description="Импорт имён и ролей из файла (админ)"),
+    types.BotCommand(command="cleanup", description="Очистка списка (админ)"),
+    types.BotCommand(command="roster", description="Живой список в закрепе (админ)"),
+    types.BotCommand(command="stats", description="Статистика участников (админ)"),
+    types.BotCommand(command="tmplist", description="Временный список (админ)"),
+    types.BotCommand(command="tmplist_call", description="Позвать участников временного списка (админ)"),
+    types.BotCommand(command="call_role", description="Позвать участников с ролью (админ)")
+]
+
+async def register_commands():
+    """set_my_commands только если список команд изменился с прошлого запуска."""
+    payload = json.dumps(
+        [bot.id, [(c.command, c.description) for c in BOT_COMMANDS]],
+        ensure_ascii=False,
+    )
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    try:
+        with open(COMMANDS_HASH_PATH, encoding="utf-8") as f:
+            if f.read().strip() == digest:
+                logger.info("Команды бота не изменились, set_my_commands пропущен")
+                return
+    except FileNotFoundError:
+        pass
+
+    try:
+        await bot.set_my_commands(BOT_COMMANDS)
+        with open(COMMANDS_HASH_PATH, "w", encoding="utf-8") as f:
+            f.write(digest)
+    except Exception as e:
+        logger.error("Не удалось зарегистрировать команды: %s", e)
+
 async def main():
     print("BOT STARTED OK")
 
-    await bot.set_my_commands([
-        types.BotCommand(command="help", description="Помощь / команды"),
-        types.BotCommand(command="list", description="Показать список участников"),
-        types.BotCommand(command="name", description="Установить своё имя"),
-        types.BotCommand(command="add", description="Установить себе роль"),
-        types.BotCommand(command="find", description="Поиск участника"),
-        types.BotCommand(command="setname", description="Установить имя другому (админ)"),
-        types.BotCommand(command="addrole", description="Назначить роль участнику (админ)"),
-        types.BotCommand(command="export", description="Экспорт списка (админ)"),
-        types.BotCommand(command="cleanup", description="Очистка списка (админ)"),
-        types.BotCommand(command="tmplist", description="Временный список (админ)")
-    ])
+    setup_middlewares(dp, bot)
+    dp.update.outer_middleware(startup.FirstUpdateMiddleware())
+
+    if METRICS_PORT:
+        await start_http_server(METRICS_HOST, METRICS_PORT, HEALTH_ROUTES)
+
+    background = [
+        asyncio.create_task(register_commands()),
+        asyncio.create_task(BUS.run()),
+        asyncio.create_task(event_writer_loop()),
+        asyncio.create_task(loop_lag_loop()),
+    ]
+
+    if SNAPSHOT_PATH:
+        background.append(asyncio.create_task(asyncio.to_thread(load_snapshot)))
+        background.append(asyncio.create_task(snapshot_loop()))
+        dp.shutdown.register(save_snapshot)
+
+    if MEMBERS_REFRESH_INTERVAL > 0:
+        background.append(asyncio.create_task(members_refresh_loop()))
+
+    if RECONCILE_INTERVAL > 0:
+        background.append(asyncio.create_task(reconcile_loop()))
+
+    dp.shutdown.register(shutdown_pool)
+    dp.shutdown.register(flush_events)
 
+    startup.polling_started()
     await dp.start_polling(bot)
 
 
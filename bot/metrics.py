@@ -0,0 +1,247 @@
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Callable
+
+from aiohttp import web
+
+from logger import logger, queue_handler, rate_limit
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_LOCK = threading.Lock()
+REGISTRY: list["_Metric"] = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _LOCK:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self) -> float:
+        with _LOCK:
+            return sum(self._values.values())
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with _LOCK:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks: dict[tuple, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        with _LOCK:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        """Значение считается в момент отдачи метрик (например, длина очереди)."""
+        with _LOCK:
+            self._callbacks[self._key(labels)] = fn
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with _LOCK:
+            items = dict(self._values)
+            callbacks = list(self._callbacks.items())
+        for key, fn in callbacks:
+            try:
+                items[key] = fn()
+            except Exception as e:
+                logger.debug("Gauge callback %s failed: %s", self.name, e)
+        for key, value in items.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _LOCK:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        with _LOCK:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        for key, (counts, count, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+HANDLER_SECONDS = Histogram(
+    "memlist_handler_seconds", "Handler latency", ("handler", "event")
+)
+HANDLER_ERRORS = Counter(
+    "memlist_handler_errors_total", "Handler exceptions", ("handler", "event")
+)
+DB_SECONDS = Histogram(
+    "memlist_db_request_seconds", "Supabase request latency", ("table", "op")
+)
+DB_REQUESTS = Counter(
+    "memlist_db_requests_total", "Supabase requests", ("table", "op", "status")
+)
+TELEGRAM_SECONDS = Histogram(
+    "memlist_telegram_request_seconds", "Telegram Bot API latency", ("method",)
+)
+TELEGRAM_ERRORS = Counter(
+    "memlist_telegram_errors_total", "Telegram Bot API errors", ("method", "error")
+)
+TELEGRAM_RETRY_AFTER = Counter(
+    "memlist_telegram_retry_after_total", "Telegram 429 (flood control) responses", ("method",)
+)
+CACHE_REQUESTS = Counter(
+    "memlist_cache_requests_total", "Cache lookups", ("cache", "result")
+)
+QUEUE_DEPTH = Gauge(
+    "memlist_queue_depth", "Background queue depth", ("queue",)
+)
+BUS_EVENTS = Counter(
+    "memlist_bus_events_total", "Cache invalidation bus events", ("table", "source")
+)
+LOCK_ACQUIRES = Counter(
+    "memlist_lock_acquires_total", "Keyed lock acquisitions", ("lock", "contended")
+)
+LOCK_WAIT_SECONDS = Histogram(
+    "memlist_lock_wait_seconds", "Time spent waiting for a contended keyed lock", ("lock",)
+)
+LOCKS_ACTIVE = Gauge(
+    "memlist_locks_active", "Keyed locks currently alive", ("lock",)
+)
+DB_BREAKER_STATE = Gauge(
+    "memlist_db_breaker_state", "Circuit breaker state (0 closed, 1 open, 2 half-open)", ("breaker",)
+)
+DB_RETRIES = Counter(
+    "memlist_db_retries_total", "Retried database reads", ("op",)
+)
+DB_REJECTED = Counter(
+    "memlist_db_rejected_total", "Database calls rejected by an open circuit breaker", ("op",)
+)
+STALE_SERVED = Counter(
+    "memlist_stale_served_total", "Cached data served because the database was unavailable", ("cache",)
+)
+CPU_TASK_SECONDS = Histogram(
+    "memlist_cpu_task_seconds", "Process pool task latency including queueing", ("task",)
+)
+MEMBER_EVENTS = Counter(
+    "memlist_member_events_total", "Membership events queued for the event log", ("kind",)
+)
+TELEGRAM_BUDGET_WAIT = Histogram(
+    "memlist_telegram_budget_wait_seconds", "Time background tasks waited for the Bot API request budget", ("task",)
+)
+RECONCILE_MEMBERS = Counter(
+    "memlist_reconcile_members_total", "Members checked by the background reconciler", ("result",)
+)
+
+CALL_MESSAGES = Counter(
+    "memlist_call_messages_total", "Mention messages of /tmplist_call and /call_role by outcome", ("result",)
+)
+
+LOOP_LAG_SECONDS = Histogram(
+    "memlist_loop_lag_seconds", "Event loop scheduling delay",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+LOOP_STALLS = Counter(
+    "memlist_loop_stalls_total", "Event loop blocks longer than LOOP_STALL_THRESHOLD (stack logged)"
+)
+
+LOG_RECORDS_DROPPED = Gauge(
+    "memlist_log_records_dropped", "Log records dropped since start", ("reason",)
+)
+LOG_RECORDS_DROPPED.set_function(lambda: queue_handler.dropped, reason="queue_full")
+LOG_RECORDS_DROPPED.set_function(lambda: rate_limit.suppressed_total, reason="rate_limited")
+QUEUE_DEPTH.set_function(lambda: queue_handler.queue.qsize(), queue="log")
+
+def cache_hit(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+def render() -> str:
+    lines = []
+    for metric in list(REGISTRY):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+async def _metrics_view(request: web.Request) -> web.Response:
+    return web.Response(
+        text=render(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+def make_app(routes: list[web.RouteDef] = ()) -> web.Application:
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_view)
+    app.router.add_routes(routes)
+    return app
+
+async def start_http_server(host: str, port: int, routes: list[web.RouteDef] = ()) -> web.AppRunner:
+    runner = web.AppRunner(make_app(routes), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics: http://%s:%s/metrics", host, port)
+    return runner
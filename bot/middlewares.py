@@ -0,0 +1,90 @@
+import time
+
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetUpdates
+from aiogram.types import TelegramObject
+
+from budget import TELEGRAM_BUDGET
+from health import polled
+from config import RECORD_UPDATES_PATH
+from metrics import (
+    HANDLER_SECONDS,
+    HANDLER_ERRORS,
+    TELEGRAM_SECONDS,
+    TELEGRAM_ERRORS,
+    TELEGRAM_RETRY_AFTER,
+)
+from recorder import UpdateRecorder
+from tracing import TracingMiddleware, span
+
+def handler_name(data: dict) -> str:
+    handler = data.get("handler")
+    callback = getattr(handler, "callback", None)
+    return getattr(callback, "__name__", "unknown")
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner-middleware: время и ошибки каждого хендлера."""
+
+    def __init__(self, event: str):
+        self.event = event
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        name = handler_name(data)
+        start = time.perf_counter()
+
+        try:
+            with span("handler", handler=name, event=self.event):
+                return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name, event=self.event)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - start, handler=name, event=self.event)
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время каждого вызова Bot API, 429, общий бюджет запросов и свежесть polling."""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        start = time.perf_counter()
+        TELEGRAM_BUDGET.spend()
+
+        try:
+            with span("telegram", method=name):
+                response = await make_request(bot, method)
+            if isinstance(method, GetUpdates):
+                polled()
+            return response
+        except TelegramRetryAfter as e:
+            TELEGRAM_RETRY_AFTER.inc(method=name)
+            TELEGRAM_BUDGET.pause(e.retry_after)
+            raise
+        except Exception as e:
+            TELEGRAM_ERRORS.inc(method=name, error=type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - start, method=name)
+
+def setup_middlewares(dp, bot):
+    if RECORD_UPDATES_PATH:
+        dp.update.outer_middleware(UpdateRecorder(RECORD_UPDATES_PATH))
+
+    dp.update.outer_middleware(TracingMiddleware())
+
+    for event in ("message", "callback_query", "chat_member", "my_chat_member", "inline_query"):
+        dp.observers[event].middleware(HandlerMetricsMiddleware(event))
+
+    setup_session_middlewares(bot.session)
+
+def setup_session_middlewares(session):
+    """Отдельно от dp: сессию бота можно заменить, и новой нужны свои middleware."""
+    session.middleware(TelegramMetricsMiddleware())
@@ -0,0 +1,66 @@
+import asyncio
+import multiprocessing
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, TypeVar
+
+from config import CPU_WORKERS
+from logger import logger
+from metrics import QUEUE_DEPTH, CPU_TASK_SECONDS
+
+T = TypeVar("T")
+
+# Задач в пуле (выполняются + ждут воркера) — сверх этого вызывающие ждут
+# снаружи, и аргументы не копятся в очереди пула
+CPU_QUEUE_LIMIT = CPU_WORKERS * 2
+
+# Воркеры не форкаются от процесса бота: fork скопировал бы его потоки (логгер, метрики),
+# замки и открытые соединения. Сервер forkserver импортирует только модули задач —
+# функции для run_cpu должны лежать в них на верхнем уровне
+CPU_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+CPU_PRELOAD = ["export"]
+
+CPU_POOL: ProcessPoolExecutor | None = None
+CPU_SLOTS: asyncio.Semaphore | None = None
+CPU_PENDING = 0
+
+QUEUE_DEPTH.set_function(lambda: CPU_PENDING, queue="cpu_pool")
+
+def _pool() -> tuple[ProcessPoolExecutor, asyncio.Semaphore]:
+    global CPU_POOL, CPU_SLOTS
+    if CPU_POOL is None:
+        context = multiprocessing.get_context(CPU_START_METHOD)
+        if CPU_START_METHOD == "forkserver":
+            context.set_forkserver_preload(CPU_PRELOAD)
+        CPU_POOL = ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=context)
+        CPU_SLOTS = asyncio.Semaphore(CPU_QUEUE_LIMIT)
+    return CPU_POOL, CPU_SLOTS
+
+async def run_cpu(task: str, fn: Callable[..., T], *args) -> T:
+    """
+    Тяжёлая по CPU функция в пуле процессов: event loop и GIL основного
+    процесса остаются свободны. fn и аргументы должны сериализоваться pickle,
+    поэтому передавайте функции верхнего уровня модулей без зависимостей бота
+    (см. CPU_PRELOAD) и плоские данные.
+    """
+    global CPU_PENDING
+    pool, slots = _pool()
+
+    CPU_PENDING += 1
+    try:
+        async with slots:
+            started = time.perf_counter()
+            result = await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+            CPU_TASK_SECONDS.observe(time.perf_counter() - started, task=task)
+            return result
+    finally:
+        CPU_PENDING -= 1
+
+def shutdown_pool():
+    global CPU_POOL, CPU_SLOTS
+    if CPU_POOL is not None:
+        logger.info("Останавливаю пул процессов")
+        CPU_POOL.shutdown(wait=False, cancel_futures=True)
+        CPU_POOL = None
+        CPU_SLOTS = None
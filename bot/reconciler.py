@@ -0,0 +1,139 @@
+import asyncio
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from budget import TELEGRAM_BUDGET
+from config import RECONCILE_INTERVAL, RECONCILE_SLICE
+from core import bot
+from db import repo, bulk_update_members, clear_left_users, get_members
+from eventlog import record_event
+from locks import member_locks
+from logger import logger
+from metrics import RECONCILE_MEMBERS
+from roster import schedule_roster_refresh
+
+CURSOR_NAME = "roster"
+
+# Ответы getChatMember, после которых участника точно нет (удалённый аккаунт и т.п.)
+GONE_ERRORS = ("user not found", "participant_id_invalid")
+
+class ChatUnavailable(Exception):
+    """Бот не видит чат (удалён из него, чат удалён) — сверять его участников нельзя."""
+
+async def check_member(chat_id: int, row: dict) -> dict | None:
+    """
+    Сверка одного участника. None — ничего менять не нужно,
+    {"left": True} — ушёл, иначе строка для пакетного upsert.
+    """
+    await TELEGRAM_BUDGET.wait("reconcile")
+
+    try:
+        member = await bot.get_chat_member(chat_id, row["user_id"])
+    except TelegramForbiddenError as e:
+        raise ChatUnavailable(str(e))
+    except TelegramBadRequest as e:
+        message = str(e).lower()
+        if "chat not found" in message:
+            raise ChatUnavailable(str(e))
+        if any(error in message for error in GONE_ERRORS):
+            return {"left": True}
+        # Прочие отказы не повод удалять участника — посмотрим на следующем круге
+        logger.debug("Reconcile: getChatMember %s/%s: %s", chat_id, row["user_id"], e)
+        return None
+
+    if member.status in ("left", "kicked"):
+        return {"left": True}
+
+    username = member.user.username or ""
+    full_name = member.user.full_name or ""
+    if row.get("username") == username and row.get("full_name") == full_name:
+        return None
+    return {"user_id": row["user_id"], "username": username, "full_name": full_name}
+
+async def reconcile_slice(chat_id: int, after_id: int) -> tuple[int, bool]:
+    """
+    Проверяет до RECONCILE_SLICE участников чата после members.id = after_id
+    и одним пакетом применяет изменения. Возвращает (id последнего проверенного, чат пройден до конца).
+    """
+    rows = await asyncio.to_thread(
+        repo.members_page, chat_id, after_id, RECONCILE_SLICE, "id, user_id, username, full_name"
+    )
+
+    left: list[int] = []
+    updates: list[dict] = []
+    last_id = after_id
+    finished = len(rows) < RECONCILE_SLICE
+
+    for row in rows:
+        try:
+            result = await check_member(chat_id, row)
+        except TelegramRetryAfter as e:
+            # Бюджет уже заморожен middleware; остаток среза — в следующем такте
+            logger.warning("Reconcile: flood control в чате %s, пауза %s с", chat_id, e.retry_after)
+            finished = False
+            break
+
+        last_id = row["id"]
+        if result is None:
+            RECONCILE_MEMBERS.inc(result="ok")
+        elif result.get("left"):
+            RECONCILE_MEMBERS.inc(result="left")
+            left.append(row["user_id"])
+        else:
+            RECONCILE_MEMBERS.inc(result="updated")
+            updates.append(result)
+
+    if left or updates:
+        async with member_locks(chat_id, left + [row["user_id"] for row in updates]):
+            if left:
+                await asyncio.to_thread(clear_left_users, chat_id, left)
+            if updates:
+                # Пока шла сверка, участник мог уйти — upsert вернул бы его в список
+                present = {row["user_id"] for row in await asyncio.to_thread(get_members, chat_id)}
+                updates = [row for row in updates if row["user_id"] in present]
+            if updates:
+                await asyncio.to_thread(bulk_update_members, chat_id, updates)
+        for user_id in left:
+            record_event(chat_id, user_id, "leave")
+    if left or updates:
+        schedule_roster_refresh(bot, chat_id)
+        logger.info("Reconcile: чат %s — удалено %s, обновлено %s", chat_id, len(left), len(updates))
+
+    return last_id, finished
+
+async def reconcile_tick(cursor: tuple[int | None, int]) -> tuple[int | None, int]:
+    chat_id, after_id = cursor
+    if chat_id is None:
+        # Круг по всем чатам завершён — начинаем сначала
+        chat_id, after_id = await asyncio.to_thread(repo.next_chat_id, None), 0
+        if chat_id is None:
+            return None, 0
+
+    try:
+        last_id, finished = await reconcile_slice(chat_id, after_id)
+    except ChatUnavailable as e:
+        logger.info("Reconcile: чат %s пропущен: %s", chat_id, e)
+        finished, last_id = True, after_id
+
+    if not finished:
+        return chat_id, last_id
+    return await asyncio.to_thread(repo.next_chat_id, chat_id), 0
+
+async def reconcile_loop():
+    """
+    Фоновая сверка списков всех чатов с Telegram небольшими срезами.
+    Курсор (чат, members.id) хранится в БД: после перезапуска обход продолжается с того же места.
+    """
+    cursor = None
+
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL)
+
+        try:
+            if cursor is None:
+                cursor = await asyncio.to_thread(repo.get_reconcile_cursor, CURSOR_NAME)
+
+            cursor = await reconcile_tick(cursor)
+            await asyncio.to_thread(repo.save_reconcile_cursor, CURSOR_NAME, *cursor)
+        except Exception as e:
+            logger.error("Ошибка фоновой сверки списков: %s", e)
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from logger import logger
+
+CHAT_TYPES = {"private", "group", "supergroup", "channel"}
+WORD_RE = re.compile(r"(/[a-zA-Z0-9_@]+|@[a-zA-Z0-9_]{5,32}|\w+)")
+
+class Anonymizer:
+    """
+    Стабильная в пределах одной записи замена id, имён и текста.
+    Длины строк сохраняются, поэтому offset/length у entities остаются валидными.
+    """
+
+    def __init__(self, salt: bytes | None = None):
+        self.salt = salt or os.urandom(16)
+
+    def _digest(self, value) -> str:
+        return hashlib.blake2b(str(value).encode(), key=self.salt, digest_size=16).hexdigest()
+
+    def user_id(self, value: int) -> int:
+        return int(self._digest(value)[:10], 16) % 10**10 + 1
+
+    def chat_id(self, value: int) -> int:
+        anon = self.user_id(value)
+        return -(10**12 + anon) if value < 0 else anon
+
+    def username(self, value: str) -> str:
+        digest = self._digest(value.lower())
+        return ("u" + digest * 3)[:max(len(value), 5)]
+
+    def text(self, value: str) -> str:
+        def replace(m: re.Match) -> str:
+            token = m.group(0)
+            if token.startswith("/"):
+                return token
+            if token.startswith("@"):
+                return "@" + self.username(token[1:])
+            return "x" * len(token)
+        return WORD_RE.sub(replace, value)
+
+    def update(self, data):
+        if isinstance(data, list):
+            return [self.update(item) for item in data]
+        if not isinstance(data, dict):
+            return data
+
+        result = {}
+        is_user = "is_bot" in data
+        is_chat = data.get("type") in CHAT_TYPES and "id" in data
+
+        for key, value in data.items():
+            if is_user and key == "id":
+                result[key] = self.user_id(value)
+            elif is_chat and key == "id":
+                result[key] = self.chat_id(value)
+            elif key in ("user_id", "sender_chat_id") and isinstance(value, int):
+                result[key] = self.user_id(value)
+            elif key == "username" and isinstance(value, str):
+                result[key] = self.username(value)
+            elif key in ("first_name", "last_name", "title", "name") and isinstance(value, str):
+                result[key] = "x" * len(value)
+            elif key in ("text", "caption", "query") and isinstance(value, str):
+                result[key] = self.text(value)
+            elif key in ("url", "invite_link") and isinstance(value, str):
+                result[key] = "https://example.invalid"
+            else:
+                result[key] = self.update(value)
+
+        return result
+
+class UpdateRecorder(BaseMiddleware):
+    """Outer-middleware: пишет входящие апдейты (анонимизированными) в JSONL для bench/replay.py."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.anonymizer = Anonymizer()
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        logger.info("Запись апдейтов в %s", path)
+
+    def _write(self, line: str):
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except Exception as e:
+            logger.error("Не удалось записать апдейт в %s: %s", self.path, e)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        try:
+            raw = event.model_dump(mode="json", exclude_none=True, by_alias=True)
+            line = json.dumps(
+                {"t": round(time.monotonic() - self.started, 4), "update": self.anonymizer.update(raw)},
+                ensure_ascii=False,
+            )
+            asyncio.get_running_loop().run_in_executor(None, self._write, line)
+        except Exception as e:
+            logger.error("Ошибка записи апдейта: %s", e)
+
+        return await handler(event, data)
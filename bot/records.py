@@ -0,0 +1,74 @@
+"""
+Компактные записи участников для кэша списков.
+
+Member — запись на __slots__ вместо dict из JSON: без словаря атрибутов на
+каждую строку, повторяющиеся роли интернируются. Интерфейс чтения совпадает
+с dict (row["user_id"], row.get("username")), поэтому хендлерам всё равно,
+пришла строка из кэша или прямым запросом.
+"""
+import sys
+
+from typing import Iterable
+
+MEMBER_FIELDS = ("id", "user_id", "username", "full_name", "external_name", "extra_role", "created_at", "updated_at")
+
+# Проекции колонок под сценарии. Кэш обслуживает все команды и дельта-синхронизацию
+# (нужны id и updated_at), поэтому читает MEMBER_FIELDS, но не chat_id и прочее из «*»
+CACHE_COLUMNS = ", ".join(MEMBER_FIELDS)
+LIST_COLUMNS = "user_id, username, full_name, external_name, extra_role"
+SEARCH_COLUMNS = "user_id, username, full_name, external_name"
+
+class Member:
+    __slots__ = MEMBER_FIELDS
+
+    def __init__(
+        self,
+        id: int = 0,
+        user_id: int = 0,
+        username: str = "",
+        full_name: str = "",
+        external_name: str = "",
+        extra_role: str = "",
+        created_at: str | None = None,
+        updated_at: str | None = None,
+    ):
+        self.id = id
+        self.user_id = user_id
+        self.username = username or ""
+        self.full_name = full_name or ""
+        self.external_name = external_name or ""
+        # Ролей в чате обычно несколько на сотни участников
+        self.extra_role = sys.intern(extra_role) if extra_role else ""
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_row(cls, row: dict) -> "Member":
+        return cls(**{field: row[field] for field in MEMBER_FIELDS if field in row})
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in MEMBER_FIELDS else default
+
+    def __getitem__(self, key: str):
+        if key not in MEMBER_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in MEMBER_FIELDS
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in MEMBER_FIELDS}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Member) and all(
+            getattr(self, field) == getattr(other, field) for field in MEMBER_FIELDS
+        )
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Member(user_id={self.user_id}, username={self.username!r}, full_name={self.full_name!r})"
+
+def to_members(rows: Iterable[dict]) -> list[Member]:
+    return [Member.from_row(row) for row in rows]
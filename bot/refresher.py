@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from datetime import datetime, timedelta, timezone
+
+from bus import BUS
+from config import MEMBERS_REFRESH_INTERVAL, MEMBERS_HOT_WINDOW, TOMBSTONE_RETENTION
+from logger import logger
+from db import repo, refresh_hot_chats
+
+# Как часто чистить member_tombstones старше TOMBSTONE_RETENTION и старые отметки активности
+PURGE_INTERVAL = 3600.0
+# Отметки «был активен» нужны только пока в день могут прийти события; с запасом на опоздавшие пакеты
+ACTIVITY_RETENTION_DAYS = 2
+
+def purge_tombstones():
+    before = datetime.fromtimestamp(time.time() - TOMBSTONE_RETENTION, timezone.utc)
+    repo.purge_member_tombstones(before)
+    repo.purge_member_activity(datetime.now(timezone.utc).date() - timedelta(days=ACTIVITY_RETENTION_DAYS))
+
+async def members_refresh_loop():
+    """Держит кэш горячих чатов актуальным: правки других реплик и прямые правки в БД видны через секунды."""
+    last_purge = 0.0
+
+    while True:
+        await asyncio.sleep(MEMBERS_REFRESH_INTERVAL)
+
+        try:
+            # С подключённой шиной изменения приходят уведомлениями, опрос не нужен
+            if not BUS.connected:
+                refreshed = await asyncio.to_thread(refresh_hot_chats, MEMBERS_HOT_WINDOW)
+                if refreshed:
+                    logger.debug("Дельта-синхронизация: обновлено чатов %s", refreshed)
+
+            if time.time() - last_purge > PURGE_INTERVAL:
+                last_purge = time.time()
+                await asyncio.to_thread(purge_tombstones)
+        except Exception as e:
+            logger.error("Ошибка фонового обновления кэша участников: %s", e)
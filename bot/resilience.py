@@ -0,0 +1,154 @@
+import random
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Callable, TypeVar
+
+from config import DB_DEADLINE, DB_TIMEOUT, DB_RETRY_BASE, DB_RETRY_MAX
+from logger import logger
+from metrics import DB_BREAKER_STATE, DB_RETRIES, DB_REJECTED
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+STATE_NAMES = {CLOSED: "closed", OPEN: "open", HALF_OPEN: "half_open"}
+
+# Общий срок для цепочки вызовов в текущем потоке (см. deadline())
+_scope = threading.local()
+
+class CircuitOpenError(Exception):
+    """Цепь разомкнута: БД подряд отвечала ошибками, запрос не отправлялся."""
+
+class DeadlineExceeded(TimeoutError):
+    """Бюджет времени исчерпан: следующая попытка не успела бы до срока, запрос не отправлялся."""
+
+@contextmanager
+def deadline(seconds: float):
+    """
+    Один бюджет на несколько вызовов БД подряд (например, проверка версии,
+    дельта и полный перечит в get_members). Действует в пределах потока —
+    то есть одного вызова через asyncio.to_thread. Вложенный срок не продлевает внешний.
+    """
+    previous = getattr(_scope, "deadline", None)
+    until = time.monotonic() + seconds
+    _scope.deadline = until if previous is None else min(previous, until)
+    try:
+        yield
+    finally:
+        _scope.deadline = previous
+
+class CircuitBreaker:
+    """
+    closed → failures ошибок подряд → open: запросы сразу отклоняются.
+    Через reset_timeout пропускается один пробный запрос (half_open):
+    успех замыкает цепь, ошибка снова размыкает её.
+    Вызывается из потоков asyncio.to_thread, поэтому под threading.Lock.
+    """
+
+    def __init__(self, name: str, failures: int, reset_timeout: float):
+        self.name = name
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self._failed = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        DB_BREAKER_STATE.set_function(lambda: self.state, breaker=name)
+
+    @property
+    def is_open(self) -> bool:
+        """Запрос сейчас был бы отклонён. Состояние не меняет — для быстрых проверок перед вызовом."""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at < self.reset_timeout
+            return self.state == HALF_OPEN and self._probing
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failed = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failed += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failed >= self.failures):
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def _set_state(self, state: int):
+        log = logger.warning if state == OPEN else logger.info
+        log("Circuit breaker %s: %s → %s", self.name, STATE_NAMES[self.state], STATE_NAMES[state])
+        self.state = state
+
+def backoff(attempt: int) -> float:
+    """Full jitter: равномерно от 0 до экспоненты, чтобы реплики не повторяли запросы хором."""
+    return random.uniform(0, min(DB_RETRY_MAX, DB_RETRY_BASE * 2 ** attempt))
+
+def guarded_call(
+    breaker: CircuitBreaker,
+    op: str,
+    fn: Callable[[], T],
+    is_transient: Callable[[Exception], bool],
+    retries: int = 0,
+) -> T:
+    """
+    Вызов БД через предохранитель. Временные ошибки повторяются до retries раз.
+    Попытка ограничена таймаутом клиента (DB_TIMEOUT) и начинается, только если
+    целиком укладывается в срок: DB_DEADLINE на вызов или общий срок deadline().
+    Ошибки, на которые БД ответила по существу (ключи, валидация), цепь не размыкают.
+    """
+    until = time.monotonic() + DB_DEADLINE
+    scoped = getattr(_scope, "deadline", None)
+    if scoped is not None:
+        until = min(until, scoped)
+
+    attempt = 0
+
+    while True:
+        if time.monotonic() + DB_TIMEOUT > until:
+            raise DeadlineExceeded(f"{op}: deadline exceeded")
+
+        if not breaker.allow():
+            DB_REJECTED.inc(op=op)
+            raise CircuitOpenError(f"{breaker.name}: circuit open")
+
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_transient(e):
+                breaker.record_success()
+                raise
+
+            breaker.record_failure()
+            delay = backoff(attempt)
+            if attempt >= retries or time.monotonic() + delay + DB_TIMEOUT > until:
+                raise
+
+            attempt += 1
+            DB_RETRIES.inc(op=op)
+            logger.debug("Повтор %s (%s) через %.2fs: %s", op, attempt, delay, e)
+            time.sleep(delay)
+            continue
+
+        breaker.record_success()
+        return result
@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+
+from aiogram.exceptions import TelegramBadRequest
+
+from logger import logger
+from metrics import QUEUE_DEPTH
+from db import get_members, get_roster_message, delete_roster_message
+from helpers import MESSAGE_LIMIT, format_member_inline, iter_message_parts, utf16_len
+
+ROSTER_DEBOUNCE = 5.0
+
+# chat_id -> строка roster_messages или None (ростера в чате нет)
+ROSTER_MESSAGES: dict[int, dict | None] = {}
+ROSTER_HASHES: dict[int, str] = {}
+ROSTER_PENDING: dict[int, asyncio.Task] = {}
+
+QUEUE_DEPTH.set_function(lambda: len(ROSTER_PENDING), queue="roster_refresh")
+
+ROSTER_HEADER = "<b>📋 Список участников</b>"
+
+def render_roster(rows: list) -> str:
+    footer = f"👥 Всего: <b>{len(rows)}</b> • полный список — /list"
+    if not rows:
+        return f"{ROSTER_HEADER}\n\nСписок пуст 🕳️\n\n{footer}"
+
+    reserve = utf16_len(f"{ROSTER_HEADER}\n\n\n\n{footer}\n…")
+    lines = (format_member_inline(row, i) for i, row in enumerate(rows, start=1))
+    body = next(iter_message_parts(lines, MESSAGE_LIMIT - reserve))
+
+    if body.count("\n") + 1 < len(rows):
+        body += "\n…"
+
+    return f"{ROSTER_HEADER}\n\n{body}\n\n{footer}"
+
+def remember_roster(chat_id: int, row: dict | None, text: str | None = None):
+    ROSTER_MESSAGES[chat_id] = row
+    if text is None:
+        ROSTER_HASHES.pop(chat_id, None)
+    else:
+        ROSTER_HASHES[chat_id] = hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+async def current_roster(chat_id: int) -> dict | None:
+    """Ростер чата из кэша или БД; None — его нет или узнать не удалось."""
+    if chat_id in ROSTER_MESSAGES:
+        return ROSTER_MESSAGES[chat_id]
+
+    try:
+        roster = await asyncio.to_thread(get_roster_message, chat_id)
+    except Exception as e:
+        logger.error("Не удалось получить ростер чата %s: %s", chat_id, e)
+        return None
+
+    ROSTER_MESSAGES[chat_id] = roster
+    return roster
+
+def schedule_roster_refresh(bot, chat_id: int):
+    """
+    Отложенное обновление закреплённого списка.
+    Все изменения за ROSTER_DEBOUNCE секунд сливаются в одно редактирование.
+    """
+    if ROSTER_MESSAGES.get(chat_id, True) is None:
+        return
+
+    task = ROSTER_PENDING.get(chat_id)
+    if task and not task.done():
+        return
+
+    ROSTER_PENDING[chat_id] = asyncio.create_task(_refresh_later(bot, chat_id))
+
+async def _refresh_later(bot, chat_id: int):
+    try:
+        await asyncio.sleep(ROSTER_DEBOUNCE)
+    finally:
+        ROSTER_PENDING.pop(chat_id, None)
+
+    try:
+        await refresh_roster(bot, chat_id)
+    except Exception as e:
+        logger.error("Ошибка обновления ростера в чате %s: %s", chat_id, e)
+
+async def refresh_roster(bot, chat_id: int):
+    if chat_id not in ROSTER_MESSAGES:
+        # При ошибке БД в кэш ничего не пишется — следующее обновление спросит снова
+        ROSTER_MESSAGES[chat_id] = await asyncio.to_thread(get_roster_message, chat_id)
+
+    roster = ROSTER_MESSAGES[chat_id]
+    if not roster:
+        return
+
+    rows = await asyncio.to_thread(get_members, chat_id)
+    text = render_roster(rows)
+
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    if ROSTER_HASHES.get(chat_id) == digest:
+        return
+
+    try:
+        await bot.edit_message_text(
+            text,
+            chat_id=chat_id,
+            message_id=roster["message_id"],
+            parse_mode="HTML"
+        )
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e):
+            ROSTER_HASHES[chat_id] = digest
+            return
+
+        if "message to edit not found" in str(e) or "message can't be edited" in str(e):
+            logger.warning("Ростер в чате %s больше недоступен: %s", chat_id, e)
+            await asyncio.to_thread(delete_roster_message, chat_id)
+            remember_roster(chat_id, None)
+            return
+
+        raise
+
+    ROSTER_HASHES[chat_id] = digest
@@ -0,0 +1,77 @@
+import time
+
+from db import MEMBERS_CACHE, get_members, members_ttl, refresh_chats
+from records import Member
+
+# chat_id -> (строки из MEMBERS_CACHE, [(текст для поиска, username, запись)]).
+# Перестраивается, только когда кэш участников заменил список строк
+SEARCH_INDEX: dict[int, tuple[list, list[tuple[str, str, Member]]]] = {}
+
+def normalize(text: str) -> str:
+    return text.casefold().replace("ё", "е")
+
+def _entry(row: Member) -> tuple[str, str, Member]:
+    fields = (row.full_name, row.username, row.external_name, row.extra_role)
+    return normalize(" ".join(field for field in fields if field)), normalize(row.username), row
+
+def member_index(chat_id: int, refresh: bool = True) -> list[tuple[str, str, Member]]:
+    # get_members догоняет кэш (версия, дельта), индекс строится по тому же списку строк.
+    # refresh=False — кэш уже сверен вызывающим, берём как есть
+    if refresh or chat_id not in MEMBERS_CACHE:
+        get_members(chat_id)
+
+    cached = MEMBERS_CACHE.get(chat_id)
+    if not cached:
+        return []
+
+    rows = cached[1]
+    index = SEARCH_INDEX.get(chat_id)
+    if not index or index[0] is not rows:
+        index = (rows, [_entry(row) for row in rows])
+        SEARCH_INDEX[chat_id] = index
+    return index[1]
+
+def search_members(chat_id: int, query: str, limit: int, refresh: bool = True) -> list[tuple[int, Member]]:
+    """
+    Совпадения по имени, @username, внешнему имени и роли — как /find.
+    Ранг: 0 — точный username, 1 — начало слова, 2 — подстрока.
+    """
+    query = normalize(query.strip().lstrip("@"))
+    if not query:
+        return []
+
+    found = []
+    for text, username, row in member_index(chat_id, refresh):
+        if query not in text:
+            continue
+        if username == query:
+            rank = 0
+        elif text.startswith(query) or f" {query}" in text:
+            rank = 1
+        else:
+            rank = 2
+        found.append((rank, row))
+
+    found.sort(key=lambda item: item[0])
+    return found[:limit]
+
+def search_chats(chat_ids: list[int], query: str, limit: int) -> list[tuple[int, int, Member]]:
+    """
+    search_members по нескольким чатам: (ранг, chat_id, запись), лучшие limit.
+    Версии устаревших кэшей сверяются одним запросом на все чаты,
+    полностью загружаются только чаты, которых в кэше нет.
+    """
+    now = time.time()
+    ttl = members_ttl()
+    refresh_chats([
+        chat_id for chat_id in chat_ids
+        if chat_id in MEMBERS_CACHE and now - MEMBERS_CACHE[chat_id][0] >= ttl
+    ])
+
+    found = [
+        (rank, chat_id, row)
+        for chat_id in chat_ids
+        for rank, row in search_members(chat_id, query, limit, refresh=False)
+    ]
+    found.sort(key=lambda item: item[0])
+    return found[:limit]
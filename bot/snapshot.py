@@ -0,0 +1,138 @@
+import asyncio
+import marshal
+import mmap
+import os
+import time
+
+from config import SNAPSHOT_PATH, SNAPSHOT_INTERVAL, SNAPSHOT_MAX_AGE
+from logger import logger
+from db import MEMBERS_CACHE, MEMBERS_SYNC, repo
+from helpers import ADMIN_CACHE, LAST_UPDATE
+from records import MEMBER_FIELDS, Member
+
+SNAPSHOT_MAGIC = b"MLSNAP2\n"
+
+def build_snapshot() -> bytes:
+    """
+    Снимок кэшей в marshal: участники хранятся кортежами в порядке MEMBER_FIELDS,
+    для каждого чата — версия из chat_versions, по которой при загрузке проверяется свежесть.
+    """
+    members = {}
+    versions = {}
+    for chat_id, (_, rows, version) in list(MEMBERS_CACHE.items()):
+        members[chat_id] = [tuple(getattr(row, f) for f in MEMBER_FIELDS) for row in rows]
+        versions[chat_id] = version
+
+    payload = {
+        "created_at": time.time(),
+        "fields": MEMBER_FIELDS,
+        "members": members,
+        "versions": versions,
+        "sync": dict(MEMBERS_SYNC),
+        "admins": {chat_id: (ts, list(ids)) for chat_id, (ts, ids) in list(ADMIN_CACHE.items())},
+        "last_update": dict(LAST_UPDATE),
+    }
+    return SNAPSHOT_MAGIC + marshal.dumps(payload)
+
+def write_snapshot(path: str = SNAPSHOT_PATH) -> int:
+    data = build_snapshot()
+    tmp = f"{path}.tmp"
+
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return len(data)
+
+def read_snapshot(path: str = SNAPSHOT_PATH) -> dict | None:
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                logger.warning("Снимок кэша %s в неизвестном формате", path)
+                return None
+            view = memoryview(mm)[len(SNAPSHOT_MAGIC):]
+            try:
+                return marshal.loads(view)
+            finally:
+                view.release()
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, EOFError, TypeError) as e:
+        logger.warning("Не удалось прочитать снимок кэша %s: %s", path, e)
+        return None
+
+def is_chat_fresh(version: int | None, current: int | None, age: float) -> bool:
+    """
+    Чат из снимка можно брать, если его версия совпадает с версией в БД.
+    Если версии сверить не удалось, остаётся только ограничение по возрасту.
+    """
+    if version is not None and current is not None:
+        return version == current
+    return age <= SNAPSHOT_MAX_AGE
+
+def current_versions(chat_ids: list[int]) -> dict[int, int] | None:
+    try:
+        versions = repo.chat_versions(chat_ids)
+    except Exception as e:
+        logger.warning("Снимок кэша: не удалось сверить версии чатов: %s", e)
+        return None
+    return {chat_id: versions.get(chat_id, 0) for chat_id in chat_ids}
+
+def load_snapshot(path: str = SNAPSHOT_PATH) -> int:
+    """Восстанавливает кэши из снимка. Возвращает число загруженных чатов."""
+    payload = read_snapshot(path)
+    if not payload:
+        return 0
+
+    now = time.time()
+    age = now - payload["created_at"]
+    fields = payload["fields"]
+
+    # Одним запросом сверяем версии всех чатов снимка
+    current = current_versions(list(payload["members"])) if payload["members"] else {}
+
+    sync = payload.get("sync", {})
+
+    loaded = stale = 0
+    for chat_id, rows in payload["members"].items():
+        if chat_id in MEMBERS_CACHE:
+            continue
+
+        version = payload["versions"].get(chat_id)
+        fresh = is_chat_fresh(version, current.get(chat_id) if current else None, age)
+        if not fresh and chat_id not in sync:
+            continue
+
+        # Устаревший чат с курсором берём помеченным: первое чтение догонит его дельтой
+        if fresh:
+            MEMBERS_CACHE[chat_id] = (now, [Member.from_row(dict(zip(fields, row))) for row in rows], version)
+            loaded += 1
+        else:
+            MEMBERS_CACHE[chat_id] = (0.0, [Member.from_row(dict(zip(fields, row))) for row in rows], None)
+            stale += 1
+
+        if chat_id in sync:
+            MEMBERS_SYNC.setdefault(chat_id, tuple(sync[chat_id]))
+
+    for chat_id, (ts, ids) in payload["admins"].items():
+        ADMIN_CACHE.setdefault(chat_id, (ts, set(ids)))
+
+    for uid, ts in payload["last_update"].items():
+        LAST_UPDATE.setdefault(uid, ts)
+
+    logger.info(
+        "Снимок кэша: загружено чатов %s, к дельта-синхронизации %s (возраст %.0f с)",
+        loaded, stale, age
+    )
+    return loaded + stale
+
+async def save_snapshot():
+    try:
+        size = await asyncio.to_thread(write_snapshot)
+        logger.info("Снимок кэша сохранён: %s байт", size)
+    except Exception as e:
+        logger.error("Не удалось сохранить снимок кэша: %s", e)
+
+async def snapshot_loop():
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        await save_snapshot()
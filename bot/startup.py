@@ -0,0 +1,63 @@
+import time
+
+# Засекаем до остальных импортов: main.py импортирует этот модуль первым
+PROCESS_STARTED = time.perf_counter()
+
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from logger import logger
+
+# фаза -> длительность в секундах, в порядке записи
+PHASES: dict[str, float] = {}
+
+_last_mark = PROCESS_STARTED
+_polling_started: float | None = None
+
+def mark(name: str):
+    """Фиксирует фазу: время с предыдущей отметки."""
+    global _last_mark
+    now = time.perf_counter()
+    PHASES[name] = now - _last_mark
+    _last_mark = now
+
+def record(name: str, seconds: float):
+    PHASES[name] = seconds
+
+def polling_started():
+    global _polling_started
+    mark("init")
+    _polling_started = time.perf_counter()
+
+def report() -> str:
+    lines = [f"  {name:<20} {seconds * 1000:9.1f} ms" for name, seconds in PHASES.items()]
+    total = (time.perf_counter() - PROCESS_STARTED) * 1000
+    return "Startup timings:\n" + "\n".join(lines) + f"\n  {'since process start':<20} {total:9.1f} ms"
+
+class FirstUpdateMiddleware(BaseMiddleware):
+    """Outer-middleware: записывает задержку первого апдейта и печатает отчёт о старте."""
+
+    def __init__(self):
+        self.done = False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if self.done:
+            return await handler(event, data)
+
+        self.done = True
+        received = time.perf_counter()
+        if _polling_started is not None:
+            record("first_update_wait", received - _polling_started)
+
+        try:
+            return await handler(event, data)
+        finally:
+            record("first_update", time.perf_counter() - received)
+            logger.info(report())
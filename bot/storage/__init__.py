@@ -0,0 +1,87 @@
+import threading
+import time
+
+from typing import Callable
+
+import startup
+from config import (
+    STORAGE_BACKEND, SQLITE_PATH, SUPABASE_URL, SUPABASE_KEY,
+    DB_READ_RETRIES, DB_BREAKER_FAILURES, DB_BREAKER_RESET,
+)
+from resilience import CircuitBreaker, guarded_call
+from storage.base import Repository
+
+# Идемпотентные чтения: после временного сбоя их можно повторить
+READ_METHODS = frozenset({
+    "get_member",
+    "list_members",
+    "members_by_ids",
+    "members_by_usernames",
+    "members_changed_since",
+    "member_tombstones_since",
+    "member_chats",
+    "chat_versions",
+    "member_daily_stats",
+    "members_page",
+    "next_chat_id",
+    "get_reconcile_cursor",
+    "tmplist_user_ids",
+    "list_active_tmplists",
+    "get_active_chat_link",
+    "get_roster_message",
+})
+
+def create_repository() -> Repository:
+    if STORAGE_BACKEND == "sqlite":
+        from storage.sqlite_backend import SqliteRepository
+        return SqliteRepository(SQLITE_PATH)
+
+    from storage.supabase_backend import SupabaseRepository
+    return SupabaseRepository(SUPABASE_URL, SUPABASE_KEY)
+
+class RepositoryHandle:
+    """
+    Общая точка доступа к текущему бэкенду (from db import repo).
+    Бэкенд создаётся лениво при первом обращении; use() подменяет его (бенчмарки).
+    Методы вызываются через общий предохранитель, чтения повторяются (resilience.guarded_call).
+    """
+
+    def __init__(self, factory: Callable[[], Repository]):
+        self._factory = factory
+        self._backend: Repository | None = None
+        self._lock = threading.Lock()
+        self.breaker = CircuitBreaker("db", DB_BREAKER_FAILURES, DB_BREAKER_RESET)
+
+    def use(self, backend: Repository):
+        self._backend = backend
+        # Отказы прежнего бэкенда к новому отношения не имеют
+        self.breaker.record_success()
+
+    @property
+    def backend(self) -> Repository:
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    started = time.perf_counter()
+                    self._backend = self._factory()
+                    startup.record("db_client", time.perf_counter() - started)
+        return self._backend
+
+    def __getattr__(self, name: str):
+        backend = self.backend
+        attr = getattr(backend, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        retries = DB_READ_RETRIES if name in READ_METHODS else 0
+
+        def call(*args, **kwargs):
+            return guarded_call(
+                self.breaker,
+                name,
+                lambda: attr(*args, **kwargs),
+                backend.is_transient,
+                retries,
+            )
+
+        return call
@@ -0,0 +1,135 @@
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+
+class Repository(ABC):
+    """
+    Доступ к members, tmplists и chat_links.
+    Методы синхронные: хендлеры вызывают их через asyncio.to_thread.
+    Ошибки бэкенда не глотаются — это решает вызывающий код.
+    """
+
+    def is_transient(self, error: Exception) -> bool:
+        """Временный сбой (сеть, таймаут, перегрузка): запрос можно повторить, предохранитель считает отказ."""
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+    # --- members ---
+
+    @abstractmethod
+    def get_member(self, chat_id: int, user_id: int) -> dict | None: ...
+
+    @abstractmethod
+    def list_members(self, chat_id: int, columns: str = "*") -> list[dict]:
+        """Участники чата в порядке добавления (по id)."""
+
+    @abstractmethod
+    def members_by_ids(self, chat_id: int, user_ids: list[int], columns: str = "*") -> list[dict]: ...
+
+    @abstractmethod
+    def members_by_usernames(self, chat_id: int, usernames: list[str], columns: str = "*") -> list[dict]: ...
+
+    @abstractmethod
+    def insert_member(self, row: dict) -> None: ...
+
+    @abstractmethod
+    def update_member(self, chat_id: int, user_id: int, fields: dict) -> None: ...
+
+    @abstractmethod
+    def upsert_members(self, rows: list[dict]) -> None:
+        """Пакетная запись по (chat_id, user_id); у существующих строк меняются только переданные поля."""
+
+    @abstractmethod
+    def delete_members(self, chat_id: int, user_ids: list[int]) -> None: ...
+
+    @abstractmethod
+    def members_changed_since(self, chat_id: int, since: datetime, columns: str = "*") -> list[dict]:
+        """Строки, добавленные или изменённые после since (по updated_at)."""
+
+    @abstractmethod
+    def member_tombstones_since(self, chat_id: int, since: datetime) -> list[dict]:
+        """Удалённые после since строки: member_id (members.id) и deleted_at."""
+
+    @abstractmethod
+    def purge_member_tombstones(self, before: datetime) -> None: ...
+
+    @abstractmethod
+    def member_chats(self, user_id: int) -> list[int]:
+        """Чаты, в списках которых есть пользователь."""
+
+    @abstractmethod
+    def chat_versions(self, chat_ids: list[int]) -> dict[int, int]:
+        """Версии списков участников. Чата без изменений нет в ответе (версия 0)."""
+
+    # --- сверка с Telegram ---
+
+    @abstractmethod
+    def members_page(self, chat_id: int, after_id: int, limit: int, columns: str = "*") -> list[dict]:
+        """Следующие limit участников чата с members.id больше after_id, по id."""
+
+    @abstractmethod
+    def next_chat_id(self, after: int | None) -> int | None:
+        """Следующий по порядку чат из chat_versions после after (None — первый); None, если дальше чатов нет."""
+
+    @abstractmethod
+    def get_reconcile_cursor(self, name: str) -> tuple[int | None, int]:
+        """(chat_id, members.id) последнего проверенного участника; (None, 0) — сверка ещё не шла."""
+
+    @abstractmethod
+    def save_reconcile_cursor(self, name: str, chat_id: int | None, member_id: int) -> None: ...
+
+    # --- member_events ---
+
+    @abstractmethod
+    def insert_member_events(self, rows: list[dict]) -> None:
+        """Пакет событий (chat_id, user_id, kind: join/leave/active, created_at); дневные агрегаты обновляет БД."""
+
+    @abstractmethod
+    def member_daily_stats(self, chat_id: int, since: date) -> list[dict]:
+        """Дневные агрегаты чата с since включительно: day, joins, leaves, active — по дням."""
+
+    @abstractmethod
+    def purge_member_activity(self, before: date) -> None:
+        """Удаляет отметки «был активен» за дни раньше before; агрегаты остаются."""
+
+    # --- tmplists ---
+
+    @abstractmethod
+    def create_tmplist(self, chat_id: int, created_by: int, name: str, expires_at: datetime, message_id: int | None = None) -> str: ...
+
+    @abstractmethod
+    def add_tmplist_items(self, tmplist_id: str, user_ids: list[int]) -> int:
+        """Добавляет участников, уже присутствующих пропускает. Возвращает число добавленных."""
+
+    @abstractmethod
+    def remove_tmplist_items(self, tmplist_id: str, user_ids: list[int]) -> None: ...
+
+    @abstractmethod
+    def tmplist_user_ids(self, tmplist_id: str) -> list[int]: ...
+
+    @abstractmethod
+    def deactivate_expired_tmplists(self, chat_id: int, now: datetime) -> None: ...
+
+    @abstractmethod
+    def list_active_tmplists(self, chat_id: int) -> list[dict]:
+        """id, name, expires_at, created_by активных списков, по сроку истечения."""
+
+    @abstractmethod
+    def deactivate_tmplist(self, chat_id: int, name: str) -> bool: ...
+
+    # --- chat_links ---
+
+    @abstractmethod
+    def get_active_chat_link(self, chat_id: int) -> str | None: ...
+
+    @abstractmethod
+    def create_chat_link(self, chat_id: int, created_by: int) -> str: ...
+
+    # --- roster_messages ---
+
+    @abstractmethod
+    def get_roster_message(self, chat_id: int) -> dict | None: ...
+
+    @abstractmethod
+    def save_roster_message(self, chat_id: int, message_id: int, thread_id: int | None, created_by: int) -> None: ...
+
+    @abstractmethod
+    def delete_roster_message(self, chat_id: int) -> None: ...
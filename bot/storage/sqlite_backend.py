@@ -0,0 +1,550 @@
+import sqlite3
+import threading
+import time
+import uuid
+
+from datetime import date, datetime, timezone
+
+from metrics import DB_SECONDS, DB_REQUESTS
+from tracing import start_span
+from storage.base import Repository
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER,
+    user_id INTEGER,
+    username TEXT NOT NULL DEFAULT '',
+    full_name TEXT,
+    external_name TEXT,
+    extra_role TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+    CONSTRAINT members_chat_user_unique UNIQUE (chat_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS members_chat_username ON members (chat_id, username);
+
+CREATE TABLE IF NOT EXISTS tmplists (
+    id TEXT PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    created_by INTEGER NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TEXT NOT NULL,
+    message_id INTEGER,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tmplists_chat_active ON tmplists (chat_id, is_active, name);
+
+CREATE TABLE IF NOT EXISTS tmplist_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tmplist_id TEXT REFERENCES tmplists (id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tmplist_items_unique ON tmplist_items (tmplist_id, user_id);
+
+CREATE TABLE IF NOT EXISTS chat_links (
+    id TEXT PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    created_by INTEGER,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    expires_at TEXT,
+    is_active INTEGER DEFAULT 1,
+    message_id INTEGER,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS chat_links_chat_active ON chat_links (chat_id, is_active);
+
+CREATE TABLE IF NOT EXISTS roster_messages (
+    chat_id INTEGER PRIMARY KEY,
+    message_id INTEGER NOT NULL,
+    thread_id INTEGER,
+    created_by INTEGER,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS member_tombstones (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    member_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER,
+    deleted_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+CREATE INDEX IF NOT EXISTS member_tombstones_chat_deleted_at ON member_tombstones (chat_id, deleted_at);
+
+CREATE TABLE IF NOT EXISTS chat_versions (
+    chat_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS member_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    kind TEXT NOT NULL CHECK (kind IN ('join', 'leave', 'active')),
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+CREATE INDEX IF NOT EXISTS member_events_chat_created_at ON member_events (chat_id, created_at);
+
+CREATE TABLE IF NOT EXISTS member_daily_stats (
+    chat_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    joins INTEGER NOT NULL DEFAULT 0,
+    leaves INTEGER NOT NULL DEFAULT 0,
+    active INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chat_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS member_active_days (
+    chat_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, day, user_id)
+);
+CREATE INDEX IF NOT EXISTS member_active_days_day ON member_active_days (day);
+
+CREATE TABLE IF NOT EXISTS reconciler_state (
+    name TEXT PRIMARY KEY,
+    chat_id INTEGER,
+    member_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+);
+"""
+
+# Те же правила, что у триггеров в Postgres: любое изменение members
+# поднимает версию чата, UPDATE ещё и проставляет updated_at.
+TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS members_version_insert
+AFTER INSERT ON members WHEN NEW.chat_id IS NOT NULL
+BEGIN
+    INSERT INTO chat_versions (chat_id, version) VALUES (NEW.chat_id, 1)
+    ON CONFLICT (chat_id) DO UPDATE SET version = version + 1,
+        updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now');
+END;
+
+CREATE TRIGGER IF NOT EXISTS members_version_update
+AFTER UPDATE OF chat_id, user_id, username, full_name, external_name, extra_role ON members
+BEGIN
+    UPDATE members SET updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now') WHERE id = NEW.id;
+    INSERT INTO chat_versions (chat_id, version)
+    SELECT NEW.chat_id, 1 WHERE NEW.chat_id IS NOT NULL
+    ON CONFLICT (chat_id) DO UPDATE SET version = version + 1,
+        updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now');
+    INSERT INTO chat_versions (chat_id, version)
+    SELECT OLD.chat_id, 1 WHERE OLD.chat_id IS NOT NULL AND OLD.chat_id IS NOT NEW.chat_id
+    ON CONFLICT (chat_id) DO UPDATE SET version = version + 1,
+        updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now');
+END;
+
+CREATE TRIGGER IF NOT EXISTS members_version_delete
+AFTER DELETE ON members WHEN OLD.chat_id IS NOT NULL
+BEGIN
+    INSERT INTO member_tombstones (member_id, chat_id, user_id) VALUES (OLD.id, OLD.chat_id, OLD.user_id);
+    INSERT INTO chat_versions (chat_id, version) VALUES (OLD.chat_id, 1)
+    ON CONFLICT (chat_id) DO UPDATE SET version = version + 1,
+        updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now');
+END;
+
+CREATE TRIGGER IF NOT EXISTS member_events_aggregate
+AFTER INSERT ON member_events WHEN NEW.kind IN ('join', 'leave')
+BEGIN
+    INSERT INTO member_daily_stats (chat_id, day, joins, leaves)
+    VALUES (NEW.chat_id, substr(NEW.created_at, 1, 10), NEW.kind = 'join', NEW.kind = 'leave')
+    ON CONFLICT (chat_id, day) DO UPDATE SET joins = joins + excluded.joins,
+        leaves = leaves + excluded.leaves;
+END;
+
+CREATE TRIGGER IF NOT EXISTS member_events_active
+AFTER INSERT ON member_events WHEN NEW.kind = 'active'
+BEGIN
+    INSERT OR IGNORE INTO member_active_days (chat_id, day, user_id)
+    VALUES (NEW.chat_id, substr(NEW.created_at, 1, 10), NEW.user_id);
+END;
+
+-- Срабатывает только на новую отметку: повтор за тот же день отбрасывает INSERT OR IGNORE
+CREATE TRIGGER IF NOT EXISTS member_active_days_count
+AFTER INSERT ON member_active_days
+BEGIN
+    INSERT INTO member_daily_stats (chat_id, day, active) VALUES (NEW.chat_id, NEW.day, 1)
+    ON CONFLICT (chat_id, day) DO UPDATE SET active = active + 1;
+END;
+"""
+
+# Старые сборки SQLite принимают не больше 999 параметров в запросе
+MAX_PARAMS = 900
+
+def _timestamp(value: datetime) -> str:
+    """datetime в формате, в котором SQLite хранит updated_at/deleted_at."""
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+def _placeholders(values: list) -> str:
+    return ",".join("?" * len(values))
+
+def _chunks(values: list, per_item: int = 1, reserved: int = 0):
+    """Части списка, каждая из которых вместе с reserved параметрами укладывается в MAX_PARAMS."""
+    size = max(1, (MAX_PARAMS - reserved) // per_item)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+class SqliteRepository(Repository):
+    """
+    Встроенная SQLite (WAL) с той же схемой, что и в Supabase.
+    Одно соединение на процесс, запросы сериализуются блокировкой.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            self.conn.executescript(SCHEMA)
+            self._migrate()
+            self.conn.execute("CREATE INDEX IF NOT EXISTS members_chat_updated_at ON members (chat_id, updated_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS members_chat_id ON members (chat_id, id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS members_user_id ON members (user_id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS members_chat_username_lower ON members (chat_id, lower(username))")
+            self.conn.executescript(TRIGGERS)
+
+    def _migrate(self):
+        """Докатывает колонки и данные, появившиеся после создания файла базы."""
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(members)")}
+        if "updated_at" not in columns:
+            # ALTER TABLE не принимает выражение в DEFAULT — заполняем отдельно
+            self.conn.execute("ALTER TABLE members ADD COLUMN updated_at TEXT")
+            self.conn.execute("UPDATE members SET updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')")
+
+        # Чаты из файлов до chat_versions: по этой таблице сверка обходит все чаты
+        self.conn.execute(
+            "INSERT OR IGNORE INTO chat_versions (chat_id) "
+            "SELECT DISTINCT chat_id FROM members WHERE chat_id IS NOT NULL"
+        )
+
+    def is_transient(self, error: Exception) -> bool:
+        # Файл занят другим процессом (database is locked / busy) — повтор поможет
+        if isinstance(error, sqlite3.OperationalError) and "locked" in str(error):
+            return True
+        return super().is_transient(error)
+
+    def _run(self, table: str, op: str, sql: str, params: tuple | list = ()) -> tuple[list, int]:
+        """Выполняет запрос с метриками и span'ом. Возвращает (строки, rowcount)."""
+        db_span = start_span("db", table=table, op=op)
+        started = time.perf_counter()
+        status = "ok"
+
+        try:
+            with self._lock:
+                cur = self.conn.execute(sql, params)
+                return cur.fetchall(), cur.rowcount
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            DB_SECONDS.observe(time.perf_counter() - started, table=table, op=op)
+            DB_REQUESTS.inc(table=table, op=op, status=status)
+            if db_span is not None:
+                db_span.attrs["status"] = status
+                db_span.finish()
+
+    def _select(self, table: str, sql: str, params: tuple | list = ()) -> list[dict]:
+        rows, _ = self._run(table, "select", sql, params)
+        return [dict(row) for row in rows]
+
+    # --- members ---
+
+    def get_member(self, chat_id: int, user_id: int) -> dict | None:
+        rows = self._select(
+            "members",
+            "SELECT * FROM members WHERE chat_id = ? AND user_id = ? LIMIT 1",
+            (chat_id, user_id),
+        )
+        return rows[0] if rows else None
+
+    def list_members(self, chat_id: int, columns: str = "*") -> list[dict]:
+        return self._select(
+            "members",
+            f"SELECT {columns} FROM members WHERE chat_id = ? ORDER BY id",
+            (chat_id,),
+        )
+
+    def members_by_ids(self, chat_id: int, user_ids: list[int], columns: str = "*") -> list[dict]:
+        rows = []
+        for chunk in _chunks(user_ids, reserved=1):
+            rows.extend(self._select(
+                "members",
+                f"SELECT id AS _order, {columns} FROM members WHERE chat_id = ? AND user_id IN ({_placeholders(chunk)})",
+                (chat_id, *chunk),
+            ))
+        rows.sort(key=lambda row: row.pop("_order"))
+        return rows
+
+    def members_by_usernames(self, chat_id: int, usernames: list[str], columns: str = "*") -> list[dict]:
+        # Без учёта регистра, как и поиск по кэшу участников
+        rows = []
+        for chunk in _chunks([u.lower() for u in usernames], reserved=1):
+            rows.extend(self._select(
+                "members",
+                f"SELECT {columns} FROM members WHERE chat_id = ? AND lower(username) IN ({_placeholders(chunk)})",
+                (chat_id, *chunk),
+            ))
+        return rows
+
+    def insert_member(self, row: dict) -> None:
+        columns = list(row)
+        self._run(
+            "members", "insert",
+            f"INSERT INTO members ({','.join(columns)}) VALUES ({_placeholders(columns)})",
+            [row[c] for c in columns],
+        )
+
+    def update_member(self, chat_id: int, user_id: int, fields: dict) -> None:
+        if not fields:
+            return
+        assignments = ",".join(f"{column} = ?" for column in fields)
+        self._run(
+            "members", "update",
+            f"UPDATE members SET {assignments} WHERE chat_id = ? AND user_id = ?",
+            (*fields.values(), chat_id, user_id),
+        )
+
+    def upsert_members(self, rows: list[dict]) -> None:
+        if not rows:
+            return
+
+        columns = list(rows[0])
+        updates = ",".join(f"{c} = excluded.{c}" for c in columns if c not in ("chat_id", "user_id"))
+        conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+
+        for chunk in _chunks(rows, len(columns)):
+            values = ",".join(f"({_placeholders(columns)})" for _ in chunk)
+            self._run(
+                "members", "upsert",
+                f"INSERT INTO members ({','.join(columns)}) VALUES {values} "
+                f"ON CONFLICT (chat_id, user_id) {conflict}",
+                [row[c] for row in chunk for c in columns],
+            )
+
+    def delete_members(self, chat_id: int, user_ids: list[int]) -> None:
+        for chunk in _chunks(user_ids, reserved=1):
+            self._run(
+                "members", "delete",
+                f"DELETE FROM members WHERE chat_id = ? AND user_id IN ({_placeholders(chunk)})",
+                (chat_id, *chunk),
+            )
+
+    def members_changed_since(self, chat_id: int, since: datetime, columns: str = "*") -> list[dict]:
+        return self._select(
+            "members",
+            f"SELECT {columns} FROM members WHERE chat_id = ? AND updated_at > ?",
+            (chat_id, _timestamp(since)),
+        )
+
+    def member_tombstones_since(self, chat_id: int, since: datetime) -> list[dict]:
+        return self._select(
+            "member_tombstones",
+            "SELECT member_id, deleted_at FROM member_tombstones WHERE chat_id = ? AND deleted_at > ?",
+            (chat_id, _timestamp(since)),
+        )
+
+    def purge_member_tombstones(self, before: datetime) -> None:
+        self._run(
+            "member_tombstones", "delete",
+            "DELETE FROM member_tombstones WHERE deleted_at < ?",
+            (_timestamp(before),),
+        )
+
+    def chat_versions(self, chat_ids: list[int]) -> dict[int, int]:
+        versions = {}
+        for chunk in _chunks(chat_ids):
+            rows = self._select(
+                "chat_versions",
+                f"SELECT chat_id, version FROM chat_versions WHERE chat_id IN ({_placeholders(chunk)})",
+                chunk,
+            )
+            versions.update((row["chat_id"], row["version"]) for row in rows)
+        return versions
+
+    # --- сверка с Telegram ---
+
+    def member_chats(self, user_id: int) -> list[int]:
+        rows = self._select("members", "SELECT chat_id FROM members WHERE user_id = ?", (user_id,))
+        return [row["chat_id"] for row in rows]
+
+    def members_page(self, chat_id: int, after_id: int, limit: int, columns: str = "*") -> list[dict]:
+        return self._select(
+            "members",
+            f"SELECT {columns} FROM members WHERE chat_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (chat_id, after_id, limit),
+        )
+
+    def next_chat_id(self, after: int | None) -> int | None:
+        rows = self._select(
+            "chat_versions",
+            "SELECT chat_id FROM chat_versions WHERE chat_id > ? ORDER BY chat_id LIMIT 1",
+            (after if after is not None else -(2 ** 63),),
+        )
+        return rows[0]["chat_id"] if rows else None
+
+    def get_reconcile_cursor(self, name: str) -> tuple[int | None, int]:
+        rows = self._select(
+            "reconciler_state",
+            "SELECT chat_id, member_id FROM reconciler_state WHERE name = ?",
+            (name,),
+        )
+        if not rows:
+            return None, 0
+        return rows[0]["chat_id"], rows[0]["member_id"]
+
+    def save_reconcile_cursor(self, name: str, chat_id: int | None, member_id: int) -> None:
+        self._run(
+            "reconciler_state", "upsert",
+            "INSERT INTO reconciler_state (name, chat_id, member_id) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET chat_id = excluded.chat_id, member_id = excluded.member_id, "
+            "updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')",
+            (name, chat_id, member_id),
+        )
+
+    # --- member_events ---
+
+    def insert_member_events(self, rows: list[dict]) -> None:
+        columns = ("chat_id", "user_id", "kind", "created_at")
+        for chunk in _chunks(rows, len(columns)):
+            values = ",".join(f"({_placeholders(columns)})" for _ in chunk)
+            self._run(
+                "member_events", "insert",
+                f"INSERT INTO member_events ({','.join(columns)}) VALUES {values}",
+                [row[c] for row in chunk for c in columns],
+            )
+
+    def member_daily_stats(self, chat_id: int, since: date) -> list[dict]:
+        return self._select(
+            "member_daily_stats",
+            "SELECT day, joins, leaves, active FROM member_daily_stats "
+            "WHERE chat_id = ? AND day >= ? ORDER BY day",
+            (chat_id, since.isoformat()),
+        )
+
+    def purge_member_activity(self, before: date) -> None:
+        self._run(
+            "member_active_days", "delete",
+            "DELETE FROM member_active_days WHERE day < ?",
+            (before.isoformat(),),
+        )
+
+    # --- tmplists ---
+
+    def create_tmplist(self, chat_id: int, created_by: int, name: str, expires_at: datetime, message_id: int | None = None) -> str:
+        tmplist_id = str(uuid.uuid4())
+        self._run(
+            "tmplists", "insert",
+            "INSERT INTO tmplists (id, chat_id, created_by, created_at, expires_at, message_id, name) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                tmplist_id, chat_id, created_by,
+                datetime.now(timezone.utc).isoformat(), expires_at.isoformat(),
+                message_id, name,
+            ),
+        )
+        return tmplist_id
+
+    def add_tmplist_items(self, tmplist_id: str, user_ids: list[int]) -> int:
+        added = 0
+        for chunk in _chunks(user_ids, 2):
+            values = ",".join("(?, ?)" for _ in chunk)
+            params = [p for uid in chunk for p in (tmplist_id, uid)]
+            _, count = self._run(
+                "tmplist_items", "insert",
+                f"INSERT OR IGNORE INTO tmplist_items (tmplist_id, user_id) VALUES {values}",
+                params,
+            )
+            added += count
+        return added
+
+    def remove_tmplist_items(self, tmplist_id: str, user_ids: list[int]) -> None:
+        for chunk in _chunks(user_ids, reserved=1):
+            self._run(
+                "tmplist_items", "delete",
+                f"DELETE FROM tmplist_items WHERE tmplist_id = ? AND user_id IN ({_placeholders(chunk)})",
+                (tmplist_id, *chunk),
+            )
+
+    def tmplist_user_ids(self, tmplist_id: str) -> list[int]:
+        rows = self._select(
+            "tmplist_items",
+            "SELECT user_id FROM tmplist_items WHERE tmplist_id = ? ORDER BY id",
+            (tmplist_id,),
+        )
+        return [row["user_id"] for row in rows]
+
+    def deactivate_expired_tmplists(self, chat_id: int, now: datetime) -> None:
+        self._run(
+            "tmplists", "update",
+            "UPDATE tmplists SET is_active = 0 WHERE chat_id = ? AND is_active = 1 AND expires_at <= ?",
+            (chat_id, now.isoformat()),
+        )
+
+    def list_active_tmplists(self, chat_id: int) -> list[dict]:
+        return self._select(
+            "tmplists",
+            "SELECT id, name, expires_at, created_by FROM tmplists "
+            "WHERE chat_id = ? AND is_active = 1 ORDER BY expires_at",
+            (chat_id,),
+        )
+
+    def deactivate_tmplist(self, chat_id: int, name: str) -> bool:
+        _, updated = self._run(
+            "tmplists", "update",
+            "UPDATE tmplists SET is_active = 0 WHERE chat_id = ? AND name = ? AND is_active = 1",
+            (chat_id, name),
+        )
+        return updated > 0
+
+    # --- chat_links ---
+
+    def get_active_chat_link(self, chat_id: int) -> str | None:
+        rows = self._select(
+            "chat_links",
+            "SELECT id FROM chat_links WHERE chat_id = ? AND is_active = 1 LIMIT 1",
+            (chat_id,),
+        )
+        return rows[0]["id"] if rows else None
+
+    def create_chat_link(self, chat_id: int, created_by: int) -> str:
+        link_id = str(uuid.uuid4())
+        self._run(
+            "chat_links", "insert",
+            "INSERT INTO chat_links (id, chat_id, created_by, is_active) VALUES (?, ?, ?, 1)",
+            (link_id, chat_id, created_by),
+        )
+        return link_id
+
+    # --- roster_messages ---
+
+    def get_roster_message(self, chat_id: int) -> dict | None:
+        rows = self._select(
+            "roster_messages",
+            "SELECT chat_id, message_id, thread_id FROM roster_messages WHERE chat_id = ?",
+            (chat_id,),
+        )
+        return rows[0] if rows else None
+
+    def save_roster_message(self, chat_id: int, message_id: int, thread_id: int | None, created_by: int) -> None:
+        self._run(
+            "roster_messages", "upsert",
+            "INSERT INTO roster_messages (chat_id, message_id, thread_id, created_by) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (chat_id) DO UPDATE SET message_id = excluded.message_id, "
+            "thread_id = excluded.thread_id, created_by = excluded.created_by",
+            (chat_id, message_id, thread_id, created_by),
+        )
+
+    def delete_roster_message(self, chat_id: int) -> None:
+        self._run(
+            "roster_messages", "delete",
+            "DELETE FROM roster_messages WHERE chat_id = ?",
+            (chat_id,),
+        )
@@ -0,0 +1,421 @@
+import time
+
+from datetime import date, datetime, timezone
+from typing import Callable
+
+import httpx
+
+from postgrest import ReturnMethod
+from postgrest.exceptions import APIError
+from supabase import create_client, Client
+
+try:
+    from supabase.lib.client_options import SyncClientOptions as ClientOptions
+except ImportError:  # supabase < 2.10
+    from supabase.lib.client_options import ClientOptions
+
+from config import DB_TIMEOUT
+
+from metrics import DB_SECONDS, DB_REQUESTS
+from tracing import start_span
+from storage.base import Repository
+
+# Сколько значений отправлять в одном in.(...) — иначе URL запроса разрастается
+IN_CHUNK = 200
+# Строк в одном пакетном upsert — ограничивает размер тела запроса
+UPSERT_CHUNK = 500
+# Строк на страницу чтения. Не больше max_rows PostgREST (supabase/config.toml):
+# страница короче SELECT_PAGE считается последней
+SELECT_PAGE = 1000
+
+DB_OPERATIONS = {
+    "GET": "select",
+    "HEAD": "select",
+    "POST": "insert",
+    "PATCH": "update",
+    "DELETE": "delete",
+}
+
+def db_request_labels(request) -> tuple[str, str]:
+    """(table, op) для HTTP-запроса к PostgREST."""
+    path = request.url.path.split("/rest/v1/", 1)[-1]
+    if path.startswith("rpc/"):
+        return path[4:], "rpc"
+
+    op = DB_OPERATIONS.get(request.method, request.method.lower())
+    if op == "insert" and "resolution=" in request.headers.get("prefer", ""):
+        op = "upsert"
+    return path, op
+
+# Коды Postgres/PostgREST, после которых запрос имеет смысл повторить:
+# нет соединения, перегрузка, statement_timeout, конфликты сериализации
+TRANSIENT_CODES = ("08", "53", "57014", "40001", "40P01", "PGRST000", "PGRST001", "PGRST002")
+
+def chunked(values: list, size: int = IN_CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def _on_db_request(request):
+    request.extensions["memlist_started"] = time.perf_counter()
+
+    table, op = db_request_labels(request)
+    request.extensions["memlist_span"] = start_span("db", table=table, op=op)
+
+def _on_db_response(response):
+    request = response.request
+    table, op = db_request_labels(request)
+    started = request.extensions.get("memlist_started")
+
+    if started is not None:
+        DB_SECONDS.observe(time.perf_counter() - started, table=table, op=op)
+    DB_REQUESTS.inc(table=table, op=op, status=response.status_code)
+
+    db_span = request.extensions.get("memlist_span")
+    if db_span is not None:
+        db_span.attrs["status"] = response.status_code
+        db_span.finish()
+
+class SupabaseRepository(Repository):
+    def __init__(self, url: str, key: str):
+        # По умолчанию PostgREST-клиент ждёт ответа до 120 секунд
+        self.client: Client = create_client(url, key, ClientOptions(postgrest_client_timeout=DB_TIMEOUT))
+
+        # Все запросы идут через одну httpx-сессию PostgREST
+        self.client.postgrest.session.event_hooks = {
+            "request": [_on_db_request],
+            "response": [_on_db_response],
+        }
+
+    def is_transient(self, error: Exception) -> bool:
+        if isinstance(error, httpx.TransportError):
+            return True
+        if isinstance(error, APIError):
+            # Ответ без JSON (502/503 от балансировщика) — в code HTTP-статус
+            code = str(error.code or "")
+            if len(code) == 3 and code.startswith("5"):
+                return True
+            return code.startswith(TRANSIENT_CODES)
+        return super().is_transient(error)
+
+    def table(self, name: str):
+        return self.client.table(name)
+
+    def select_all(self, table: str, columns: str, filters: Callable) -> list[dict]:
+        """
+        Все строки выборки, страницами по id: за один запрос PostgREST отдаёт
+        не больше max_rows. filters(query) добавляет условия к select.
+        """
+        names = {name.strip() for name in columns.split(",")}
+        add_id = columns != "*" and "id" not in names
+        select = f"id, {columns}" if add_id else columns
+
+        rows: list[dict] = []
+        last_id = None
+        while True:
+            query = filters(self.table(table).select(select))
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            page = query.order("id").limit(SELECT_PAGE).execute().data or []
+            rows.extend(page)
+            if len(page) < SELECT_PAGE:
+                break
+            last_id = page[-1]["id"]
+
+        if add_id:
+            for row in rows:
+                del row["id"]
+        return rows
+
+    # --- members ---
+
+    def get_member(self, chat_id: int, user_id: int) -> dict | None:
+        res = (
+            self.table("members")
+            .select("*")
+            .eq("chat_id", chat_id)
+            .eq("user_id", user_id)
+            .limit(1)
+            .execute()
+        )
+        return res.data[0] if res.data else None
+
+    def list_members(self, chat_id: int, columns: str = "*") -> list[dict]:
+        return self.select_all("members", columns, lambda query: query.eq("chat_id", chat_id))
+
+    def members_by_ids(self, chat_id: int, user_ids: list[int], columns: str = "*") -> list[dict]:
+        rows = []
+        for chunk in chunked(user_ids):
+            res = (
+                self.table("members")
+                .select(columns)
+                .eq("chat_id", chat_id)
+                .in_("user_id", chunk)
+                .order("id")
+                .execute()
+            )
+            rows.extend(res.data or [])
+        return rows
+
+    def members_by_usernames(self, chat_id: int, usernames: list[str], columns: str = "*") -> list[dict]:
+        # username_lower — генерируемая колонка lower(username): без учёта регистра, как поиск по кэшу
+        rows = []
+        for chunk in chunked([u.lower() for u in usernames]):
+            res = (
+                self.table("members")
+                .select(columns)
+                .eq("chat_id", chat_id)
+                .in_("username_lower", chunk)
+                .execute()
+            )
+            rows.extend(res.data or [])
+        return rows
+
+    def insert_member(self, row: dict) -> None:
+        self.table("members").insert(row).execute()
+
+    def update_member(self, chat_id: int, user_id: int, fields: dict) -> None:
+        (
+            self.table("members")
+            .update(fields)
+            .eq("chat_id", chat_id)
+            .eq("user_id", user_id)
+            .execute()
+        )
+
+    def upsert_members(self, rows: list[dict]) -> None:
+        # PostgREST берёт набор колонок из первой строки — у всех строк он одинаковый
+        for chunk in chunked(rows, UPSERT_CHUNK):
+            (
+                self.table("members")
+                .upsert(chunk, on_conflict="chat_id,user_id")
+                .execute()
+            )
+
+    def delete_members(self, chat_id: int, user_ids: list[int]) -> None:
+        for chunk in chunked(user_ids):
+            (
+                self.table("members")
+                .delete()
+                .eq("chat_id", chat_id)
+                .in_("user_id", chunk)
+                .execute()
+            )
+
+    def members_changed_since(self, chat_id: int, since: datetime, columns: str = "*") -> list[dict]:
+        return self.select_all(
+            "members",
+            columns,
+            lambda query: query.eq("chat_id", chat_id).gt("updated_at", since.isoformat(timespec="microseconds")),
+        )
+
+    def member_tombstones_since(self, chat_id: int, since: datetime) -> list[dict]:
+        return self.select_all(
+            "member_tombstones",
+            "member_id, deleted_at",
+            lambda query: query.eq("chat_id", chat_id).gt("deleted_at", since.isoformat(timespec="microseconds")),
+        )
+
+    def purge_member_tombstones(self, before: datetime) -> None:
+        self.table("member_tombstones").delete().lt("deleted_at", before.isoformat()).execute()
+
+    def member_chats(self, user_id: int) -> list[int]:
+        res = self.table("members").select("chat_id").eq("user_id", user_id).execute()
+        return [row["chat_id"] for row in res.data or []]
+
+    def members_page(self, chat_id: int, after_id: int, limit: int, columns: str = "*") -> list[dict]:
+        res = (
+            self.table("members")
+            .select(columns)
+            .eq("chat_id", chat_id)
+            .gt("id", after_id)
+            .order("id")
+            .limit(limit)
+            .execute()
+        )
+        return res.data or []
+
+    def next_chat_id(self, after: int | None) -> int | None:
+        query = self.table("chat_versions").select("chat_id")
+        if after is not None:
+            query = query.gt("chat_id", after)
+        res = query.order("chat_id").limit(1).execute()
+        return res.data[0]["chat_id"] if res.data else None
+
+    def get_reconcile_cursor(self, name: str) -> tuple[int | None, int]:
+        res = (
+            self.table("reconciler_state")
+            .select("chat_id, member_id")
+            .eq("name", name)
+            .limit(1)
+            .execute()
+        )
+        if not res.data:
+            return None, 0
+        return res.data[0]["chat_id"], res.data[0]["member_id"]
+
+    def save_reconcile_cursor(self, name: str, chat_id: int | None, member_id: int) -> None:
+        (
+            self.table("reconciler_state")
+            .upsert({
+                "name": name,
+                "chat_id": chat_id,
+                "member_id": member_id,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }, on_conflict="name", returning=ReturnMethod.minimal)
+            .execute()
+        )
+
+    def insert_member_events(self, rows: list[dict]) -> None:
+        for chunk in chunked(rows, UPSERT_CHUNK):
+            self.table("member_events").insert(chunk, returning=ReturnMethod.minimal).execute()
+
+    def member_daily_stats(self, chat_id: int, since: date) -> list[dict]:
+        res = (
+            self.table("member_daily_stats")
+            .select("day, joins, leaves, active")
+            .eq("chat_id", chat_id)
+            .gte("day", since.isoformat())
+            .order("day")
+            .execute()
+        )
+        return res.data or []
+
+    def purge_member_activity(self, before: date) -> None:
+        self.table("member_active_days").delete().lt("day", before.isoformat()).execute()
+
+    def chat_versions(self, chat_ids: list[int]) -> dict[int, int]:
+        if not chat_ids:
+            return {}
+        res = self.client.rpc("get_chat_versions", {"p_chat_ids": chat_ids}).execute()
+        return {row["chat_id"]: row["version"] for row in res.data or []}
+
+    # --- tmplists ---
+
+    def create_tmplist(self, chat_id: int, created_by: int, name: str, expires_at: datetime, message_id: int | None = None) -> str:
+        res = (
+            self.table("tmplists")
+            .insert({
+                "chat_id": chat_id,
+                "created_by": created_by,
+                "expires_at": expires_at.isoformat(),
+                "message_id": message_id,
+                "name": name,
+            })
+            .execute()
+        )
+        return res.data[0]["id"]
+
+    def add_tmplist_items(self, tmplist_id: str, user_ids: list[int]) -> int:
+        rows = [{"tmplist_id": tmplist_id, "user_id": uid} for uid in user_ids]
+        if not rows:
+            return 0
+
+        res = (
+            self.table("tmplist_items")
+            .upsert(rows, on_conflict="tmplist_id,user_id", ignore_duplicates=True)
+            .execute()
+        )
+        return len(res.data or [])
+
+    def remove_tmplist_items(self, tmplist_id: str, user_ids: list[int]) -> None:
+        for chunk in chunked(user_ids):
+            (
+                self.table("tmplist_items")
+                .delete()
+                .eq("tmplist_id", tmplist_id)
+                .in_("user_id", chunk)
+                .execute()
+            )
+
+    def tmplist_user_ids(self, tmplist_id: str) -> list[int]:
+        rows = self.select_all("tmplist_items", "user_id", lambda query: query.eq("tmplist_id", tmplist_id))
+        return [row["user_id"] for row in rows]
+
+    def deactivate_expired_tmplists(self, chat_id: int, now: datetime) -> None:
+        (
+            self.table("tmplists")
+            .update({"is_active": False})
+            .eq("chat_id", chat_id)
+            .eq("is_active", True)
+            .lte("expires_at", now.isoformat())
+            .execute()
+        )
+
+    def list_active_tmplists(self, chat_id: int) -> list[dict]:
+        res = (
+            self.table("tmplists")
+            .select("id, name, expires_at, created_by")
+            .eq("chat_id", chat_id)
+            .eq("is_active", True)
+            .order("expires_at")
+            .execute()
+        )
+        return res.data or []
+
+    def deactivate_tmplist(self, chat_id: int, name: str) -> bool:
+        res = (
+            self.table("tmplists")
+            .update({"is_active": False})
+            .eq("chat_id", chat_id)
+            .eq("name", name)
+            .eq("is_active", True)
+            .execute()
+        )
+        return bool(res.data)
+
+    # --- chat_links ---
+
+    def get_active_chat_link(self, chat_id: int) -> str | None:
+        res = (
+            self.table("chat_links")
+            .select("id")
+            .eq("chat_id", chat_id)
+            .eq("is_active", True)
+            .limit(1)
+            .execute()
+        )
+        return res.data[0]["id"] if res.data else None
+
+    def create_chat_link(self, chat_id: int, created_by: int) -> str:
+        res = (
+            self.table("chat_links")
+            .insert({
+                "chat_id": chat_id,
+                "created_by": created_by,
+                "is_active": True,
+            })
+            .execute()
+        )
+        return res.data[0]["id"]
+
+    # --- roster_messages ---
+
+    def get_roster_message(self, chat_id: int) -> dict | None:
+        res = (
+            self.table("roster_messages")
+            .select("chat_id, message_id, thread_id")
+            .eq("chat_id", chat_id)
+            .limit(1)
+            .execute()
+        )
+        return res.data[0] if res.data else None
+
+    def save_roster_message(self, chat_id: int, message_id: int, thread_id: int | None, created_by: int) -> None:
+        (
+            self.table("roster_messages")
+            .upsert({
+                "chat_id": chat_id,
+                "message_id": message_id,
+                "thread_id": thread_id,
+                "created_by": created_by,
+            })
+            .execute()
+        )
+
+    def delete_roster_message(self, chat_id: int) -> None:
+        (
+            self.table("roster_messages")
+            .delete()
+            .eq("chat_id", chat_id)
+            .execute()
+        )
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config import TRACE_SAMPLE_RATE, TRACE_SLOW_MS, TRACE_LOG_PATH
+from logger import logger
+
+CURRENT_SPAN: ContextVar["Span | None"] = ContextVar("memlist_span", default=None)
+
+_WRITE_LOCK = threading.Lock()
+
+class Span:
+    __slots__ = ("name", "attrs", "started", "finished", "children")
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+        self.children: list[Span] = []
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return (end - self.started) * 1000
+
+    def to_dict(self, origin: float | None = None) -> dict:
+        origin = self.started if origin is None else origin
+        return {
+            "name": self.name,
+            "start_ms": round((self.started - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            **({"attrs": self.attrs} if self.attrs else {}),
+            **({"children": [c.to_dict(origin) for c in list(self.children)]} if self.children else {}),
+        }
+
+def start_span(name: str, **attrs) -> Span | None:
+    """
+    Дочерний span текущего апдейта без смены контекста.
+    Для колбэков вида «начало/конец» (httpx hooks), где with-блок неудобен.
+    """
+    parent = CURRENT_SPAN.get()
+    if parent is None:
+        return None
+
+    child = Span(name, **attrs)
+    parent.children.append(child)
+    return child
+
+@contextmanager
+def span(name: str, **attrs):
+    child = start_span(name, **attrs)
+    if child is None:
+        yield None
+        return
+
+    token = CURRENT_SPAN.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        child.finish()
+        CURRENT_SPAN.reset(token)
+
+def _write_trace(line: str):
+    try:
+        with _WRITE_LOCK, open(TRACE_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except Exception as e:
+        logger.error("Не удалось записать трейс в %s: %s", TRACE_LOG_PATH, e)
+
+def record_trace(root: Span):
+    slow = root.duration_ms >= TRACE_SLOW_MS
+    if not slow and random.random() >= TRACE_SAMPLE_RATE:
+        return
+
+    line = json.dumps(
+        {"ts": time.time(), "slow": slow, **root.to_dict()},
+        ensure_ascii=False,
+        default=str,
+    )
+    asyncio.get_running_loop().run_in_executor(None, _write_trace, line)
+
+class TracingMiddleware(BaseMiddleware):
+    """Outer-middleware на dp.update: дерево span'ов для каждого апдейта."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        root = Span("update", update_id=event.update_id, type=event.event_type)
+        token = CURRENT_SPAN.set(root)
+
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            root.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            root.finish()
+            CURRENT_SPAN.reset(token)
+            record_trace(root)
@@ -0,0 +1,22 @@
+CREATE TABLE IF NOT EXISTS "public"."roster_messages" (
+    "chat_id" bigint NOT NULL,
+    "message_id" bigint NOT NULL,
+    "thread_id" bigint,
+    "created_by" bigint,
+    "created_at" timestamp with time zone DEFAULT "now"() NOT NULL
+);
+
+
+ALTER TABLE "public"."roster_messages" OWNER TO "postgres";
+
+
+ALTER TABLE ONLY "public"."roster_messages"
+    ADD CONSTRAINT "roster_messages_pkey" PRIMARY KEY ("chat_id");
+
+
+ALTER TABLE "public"."roster_messages" ENABLE ROW LEVEL SECURITY;
+
+
+GRANT ALL ON TABLE "public"."roster_messages" TO "anon";
+GRANT ALL ON TABLE "public"."roster_messages" TO "authenticated";
+GRANT ALL ON TABLE "public"."roster_messages" TO "service_role";
@@ -0,0 +1,142 @@
+ALTER TABLE "public"."members"
+    ADD COLUMN IF NOT EXISTS "updated_at" timestamp with time zone DEFAULT "now"() NOT NULL;
+
+
+CREATE TABLE IF NOT EXISTS "public"."chat_versions" (
+    "chat_id" bigint NOT NULL,
+    "version" bigint DEFAULT 0 NOT NULL,
+    "updated_at" timestamp with time zone DEFAULT "now"() NOT NULL
+);
+
+
+ALTER TABLE "public"."chat_versions" OWNER TO "postgres";
+
+
+ALTER TABLE ONLY "public"."chat_versions"
+    ADD CONSTRAINT "chat_versions_pkey" PRIMARY KEY ("chat_id");
+
+
+ALTER TABLE "public"."chat_versions" ENABLE ROW LEVEL SECURITY;
+
+
+INSERT INTO "public"."chat_versions" ("chat_id", "version")
+SELECT DISTINCT "chat_id", 1
+FROM "public"."members"
+WHERE "chat_id" IS NOT NULL
+ON CONFLICT ("chat_id") DO NOTHING;
+
+
+CREATE OR REPLACE FUNCTION "public"."members_touch_updated_at"() RETURNS "trigger"
+    LANGUAGE "plpgsql"
+    AS $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$;
+
+
+ALTER FUNCTION "public"."members_touch_updated_at"() OWNER TO "postgres";
+
+
+-- Одна строка chat_versions на чат; statement-триггеры, чтобы пакетные
+-- insert/delete поднимали версию один раз на чат, а не на каждую строку.
+CREATE OR REPLACE FUNCTION "public"."members_bump_chat_versions"() RETURNS "trigger"
+    LANGUAGE "plpgsql"
+    SET "search_path" TO 'public'
+    AS $$
+begin
+  if tg_op = 'INSERT' then
+    insert into chat_versions (chat_id, version, updated_at)
+    select distinct n.chat_id, 1, now() from new_rows n where n.chat_id is not null
+    on conflict (chat_id) do update
+      set version = chat_versions.version + 1, updated_at = now();
+  elsif tg_op = 'DELETE' then
+    insert into chat_versions (chat_id, version, updated_at)
+    select distinct o.chat_id, 1, now() from old_rows o where o.chat_id is not null
+    on conflict (chat_id) do update
+      set version = chat_versions.version + 1, updated_at = now();
+  else
+    insert into chat_versions (chat_id, version, updated_at)
+    select distinct c.chat_id, 1, now()
+    from (
+      select n.chat_id from new_rows n
+      union
+      select o.chat_id from old_rows o
+    ) c
+    where c.chat_id is not null
+    on conflict (chat_id) do update
+      set version = chat_versions.version + 1, updated_at = now();
+  end if;
+  return null;
+end;
+$$;
+
+
+ALTER FUNCTION "public"."members_bump_chat_versions"() OWNER TO "postgres";
+
+
+CREATE OR REPLACE TRIGGER "members_touch_updated_at"
+    BEFORE UPDATE ON "public"."members"
+    FOR EACH ROW EXECUTE FUNCTION "public"."members_touch_updated_at"();
+
+
+CREATE OR REPLACE TRIGGER "members_version_insert"
+    AFTER INSERT ON "public"."members"
+    REFERENCING NEW TABLE AS "new_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."members_bump_chat_versions"();
+
+
+CREATE OR REPLACE TRIGGER "members_version_update"
+    AFTER UPDATE ON "public"."members"
+    REFERENCING OLD TABLE AS "old_rows" NEW TABLE AS "new_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."members_bump_chat_versions"();
+
+
+CREATE OR REPLACE TRIGGER "members_version_delete"
+    AFTER DELETE ON "public"."members"
+    REFERENCING OLD TABLE AS "old_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."members_bump_chat_versions"();
+
+
+CREATE OR REPLACE FUNCTION "public"."get_chat_versions"("p_chat_ids" bigint[]) RETURNS TABLE("chat_id" bigint, "version" bigint, "updated_at" timestamp with time zone)
+    LANGUAGE "sql" STABLE
+    SET "search_path" TO 'public'
+    AS $$
+  select cv.chat_id, cv.version, cv.updated_at
+  from chat_versions cv
+  where cv.chat_id = any(p_chat_ids);
+$$;
+
+
+ALTER FUNCTION "public"."get_chat_versions"("p_chat_ids" bigint[]) OWNER TO "postgres";
+
+
+CREATE OR REPLACE FUNCTION "public"."chat_version_for_token"("p_token" "uuid") RETURNS bigint
+    LANGUAGE "sql" STABLE SECURITY DEFINER
+    SET "search_path" TO 'public'
+    AS $$
+  select coalesce(cv.version, 0)
+  from chat_links cl
+  left join chat_versions cv on cv.chat_id = cl.chat_id
+  where cl.id = p_token
+    and cl.is_active = true
+    and (cl.expires_at is null or cl.expires_at > now())
+  limit 1;
+$$;
+
+
+ALTER FUNCTION "public"."chat_version_for_token"("p_token" "uuid") OWNER TO "postgres";
+
+
+GRANT ALL ON TABLE "public"."chat_versions" TO "anon";
+GRANT ALL ON TABLE "public"."chat_versions" TO "authenticated";
+GRANT ALL ON TABLE "public"."chat_versions" TO "service_role";
+
+GRANT ALL ON FUNCTION "public"."get_chat_versions"("p_chat_ids" bigint[]) TO "anon";
+GRANT ALL ON FUNCTION "public"."get_chat_versions"("p_chat_ids" bigint[]) TO "authenticated";
+GRANT ALL ON FUNCTION "public"."get_chat_versions"("p_chat_ids" bigint[]) TO "service_role";
+
+GRANT ALL ON FUNCTION "public"."chat_version_for_token"("p_token" "uuid") TO "anon";
+GRANT ALL ON FUNCTION "public"."chat_version_for_token"("p_token" "uuid") TO "authenticated";
+GRANT ALL ON FUNCTION "public"."chat_version_for_token"("p_token" "uuid") TO "service_role";
@@ -0,0 +1,64 @@
+CREATE INDEX IF NOT EXISTS "members_chat_updated_at_idx" ON "public"."members" USING "btree" ("chat_id", "updated_at");
+
+
+CREATE TABLE IF NOT EXISTS "public"."member_tombstones" (
+    "id" bigint NOT NULL,
+    "member_id" bigint NOT NULL,
+    "chat_id" bigint NOT NULL,
+    "user_id" bigint,
+    "deleted_at" timestamp with time zone DEFAULT "now"() NOT NULL
+);
+
+
+ALTER TABLE "public"."member_tombstones" OWNER TO "postgres";
+
+
+ALTER TABLE "public"."member_tombstones" ALTER COLUMN "id" ADD GENERATED BY DEFAULT AS IDENTITY (
+    SEQUENCE NAME "public"."member_tombstones_id_seq"
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1
+);
+
+
+ALTER TABLE ONLY "public"."member_tombstones"
+    ADD CONSTRAINT "member_tombstones_pkey" PRIMARY KEY ("id");
+
+
+CREATE INDEX IF NOT EXISTS "member_tombstones_chat_deleted_at_idx" ON "public"."member_tombstones" USING "btree" ("chat_id", "deleted_at");
+
+
+ALTER TABLE "public"."member_tombstones" ENABLE ROW LEVEL SECURITY;
+
+
+-- Удалённые строки members: по ним кэши бота убирают участников при дельта-синхронизации
+CREATE OR REPLACE FUNCTION "public"."members_write_tombstones"() RETURNS "trigger"
+    LANGUAGE "plpgsql"
+    SET "search_path" TO 'public'
+    AS $$
+begin
+  insert into member_tombstones (member_id, chat_id, user_id)
+  select o.id, o.chat_id, o.user_id from old_rows o where o.chat_id is not null;
+  return null;
+end;
+$$;
+
+
+ALTER FUNCTION "public"."members_write_tombstones"() OWNER TO "postgres";
+
+
+CREATE OR REPLACE TRIGGER "members_tombstones_delete"
+    AFTER DELETE ON "public"."members"
+    REFERENCING OLD TABLE AS "old_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."members_write_tombstones"();
+
+
+GRANT ALL ON TABLE "public"."member_tombstones" TO "anon";
+GRANT ALL ON TABLE "public"."member_tombstones" TO "authenticated";
+GRANT ALL ON TABLE "public"."member_tombstones" TO "service_role";
+
+GRANT ALL ON SEQUENCE "public"."member_tombstones_id_seq" TO "anon";
+GRANT ALL ON SEQUENCE "public"."member_tombstones_id_seq" TO "authenticated";
+GRANT ALL ON SEQUENCE "public"."member_tombstones_id_seq" TO "service_role";
@@ -0,0 +1,74 @@
+-- Уведомления об изменениях members и tmplists для шины инвалидации бота.
+-- Одно событие на чат за оператор; одинаковые уведомления в транзакции Postgres схлопывает сам.
+CREATE OR REPLACE FUNCTION "public"."notify_chat_invalidation"() RETURNS "trigger"
+    LANGUAGE "plpgsql"
+    SET "search_path" TO 'public'
+    AS $$
+declare
+  v_chat_ids bigint[];
+  v_chat_id bigint;
+begin
+  if tg_op = 'INSERT' then
+    select array_agg(distinct n.chat_id) into v_chat_ids from new_rows n;
+  elsif tg_op = 'DELETE' then
+    select array_agg(distinct o.chat_id) into v_chat_ids from old_rows o;
+  else
+    select array_agg(distinct c.chat_id) into v_chat_ids
+    from (
+      select n.chat_id from new_rows n
+      union
+      select o.chat_id from old_rows o
+    ) c;
+  end if;
+
+  foreach v_chat_id in array coalesce(v_chat_ids, '{}') loop
+    if v_chat_id is not null then
+      perform pg_notify(
+        'memlist_invalidate',
+        json_build_object('table', tg_table_name, 'chat_id', v_chat_id)::text
+      );
+    end if;
+  end loop;
+
+  return null;
+end;
+$$;
+
+
+ALTER FUNCTION "public"."notify_chat_invalidation"() OWNER TO "postgres";
+
+
+CREATE OR REPLACE TRIGGER "members_notify_insert"
+    AFTER INSERT ON "public"."members"
+    REFERENCING NEW TABLE AS "new_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."notify_chat_invalidation"();
+
+
+CREATE OR REPLACE TRIGGER "members_notify_update"
+    AFTER UPDATE ON "public"."members"
+    REFERENCING OLD TABLE AS "old_rows" NEW TABLE AS "new_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."notify_chat_invalidation"();
+
+
+CREATE OR REPLACE TRIGGER "members_notify_delete"
+    AFTER DELETE ON "public"."members"
+    REFERENCING OLD TABLE AS "old_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."notify_chat_invalidation"();
+
+
+CREATE OR REPLACE TRIGGER "tmplists_notify_insert"
+    AFTER INSERT ON "public"."tmplists"
+    REFERENCING NEW TABLE AS "new_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."notify_chat_invalidation"();
+
+
+CREATE OR REPLACE TRIGGER "tmplists_notify_update"
+    AFTER UPDATE ON "public"."tmplists"
+    REFERENCING OLD TABLE AS "old_rows" NEW TABLE AS "new_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."notify_chat_invalidation"();
+
+
+CREATE OR REPLACE TRIGGER "tmplists_notify_delete"
+    AFTER DELETE ON "public"."tmplists"
+    REFERENCING OLD TABLE AS "old_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."notify_chat_invalidation"();
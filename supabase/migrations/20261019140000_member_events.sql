@@ -0,0 +1,133 @@
+CREATE TABLE IF NOT EXISTS "public"."member_events" (
+    "id" bigint NOT NULL,
+    "chat_id" bigint NOT NULL,
+    "user_id" bigint NOT NULL,
+    "kind" "text" NOT NULL,
+    "created_at" timestamp with time zone DEFAULT "now"() NOT NULL,
+    CONSTRAINT "member_events_kind_check" CHECK (("kind" = ANY (ARRAY['join'::"text", 'leave'::"text", 'active'::"text"])))
+);
+
+
+ALTER TABLE "public"."member_events" OWNER TO "postgres";
+
+
+ALTER TABLE "public"."member_events" ALTER COLUMN "id" ADD GENERATED BY DEFAULT AS IDENTITY (
+    SEQUENCE NAME "public"."member_events_id_seq"
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1
+);
+
+
+ALTER TABLE ONLY "public"."member_events"
+    ADD CONSTRAINT "member_events_pkey" PRIMARY KEY ("id");
+
+
+CREATE INDEX IF NOT EXISTS "member_events_chat_created_at_idx" ON "public"."member_events" USING "btree" ("chat_id", "created_at");
+
+
+ALTER TABLE "public"."member_events" ENABLE ROW LEVEL SECURITY;
+
+
+-- Дневные агрегаты по чату (день — по UTC); их ведёт триггер на member_events, /stats читает только их
+CREATE TABLE IF NOT EXISTS "public"."member_daily_stats" (
+    "chat_id" bigint NOT NULL,
+    "day" "date" NOT NULL,
+    "joins" integer DEFAULT 0 NOT NULL,
+    "leaves" integer DEFAULT 0 NOT NULL,
+    "active" integer DEFAULT 0 NOT NULL
+);
+
+
+ALTER TABLE "public"."member_daily_stats" OWNER TO "postgres";
+
+
+ALTER TABLE ONLY "public"."member_daily_stats"
+    ADD CONSTRAINT "member_daily_stats_pkey" PRIMARY KEY ("chat_id", "day");
+
+
+ALTER TABLE "public"."member_daily_stats" ENABLE ROW LEVEL SECURITY;
+
+
+-- Кто уже засчитан активным за день: active в агрегате считает различных участников
+CREATE TABLE IF NOT EXISTS "public"."member_active_days" (
+    "chat_id" bigint NOT NULL,
+    "day" "date" NOT NULL,
+    "user_id" bigint NOT NULL
+);
+
+
+ALTER TABLE "public"."member_active_days" OWNER TO "postgres";
+
+
+ALTER TABLE ONLY "public"."member_active_days"
+    ADD CONSTRAINT "member_active_days_pkey" PRIMARY KEY ("chat_id", "day", "user_id");
+
+
+CREATE INDEX IF NOT EXISTS "member_active_days_day_idx" ON "public"."member_active_days" USING "btree" ("day");
+
+
+ALTER TABLE "public"."member_active_days" ENABLE ROW LEVEL SECURITY;
+
+
+CREATE OR REPLACE FUNCTION "public"."member_events_aggregate"() RETURNS "trigger"
+    LANGUAGE "plpgsql"
+    SET "search_path" TO 'public'
+    AS $$
+begin
+  insert into member_daily_stats (chat_id, day, joins, leaves)
+  select n.chat_id,
+         (n.created_at at time zone 'utc')::date,
+         count(*) filter (where n.kind = 'join'),
+         count(*) filter (where n.kind = 'leave')
+  from new_rows n
+  where n.kind in ('join', 'leave')
+  group by 1, 2
+  on conflict (chat_id, day) do update
+    set joins = member_daily_stats.joins + excluded.joins,
+        leaves = member_daily_stats.leaves + excluded.leaves;
+
+  with fresh as (
+    insert into member_active_days (chat_id, day, user_id)
+    select distinct n.chat_id, (n.created_at at time zone 'utc')::date, n.user_id
+    from new_rows n
+    where n.kind = 'active'
+    on conflict do nothing
+    returning chat_id, day
+  )
+  insert into member_daily_stats (chat_id, day, active)
+  select f.chat_id, f.day, count(*) from fresh f group by 1, 2
+  on conflict (chat_id, day) do update
+    set active = member_daily_stats.active + excluded.active;
+
+  return null;
+end;
+$$;
+
+
+ALTER FUNCTION "public"."member_events_aggregate"() OWNER TO "postgres";
+
+
+CREATE OR REPLACE TRIGGER "member_events_aggregate_insert"
+    AFTER INSERT ON "public"."member_events"
+    REFERENCING NEW TABLE AS "new_rows"
+    FOR EACH STATEMENT EXECUTE FUNCTION "public"."member_events_aggregate"();
+
+
+GRANT ALL ON TABLE "public"."member_events" TO "anon";
+GRANT ALL ON TABLE "public"."member_events" TO "authenticated";
+GRANT ALL ON TABLE "public"."member_events" TO "service_role";
+
+GRANT ALL ON SEQUENCE "public"."member_events_id_seq" TO "anon";
+GRANT ALL ON SEQUENCE "public"."member_events_id_seq" TO "authenticated";
+GRANT ALL ON SEQUENCE "public"."member_events_id_seq" TO "service_role";
+
+GRANT ALL ON TABLE "public"."member_daily_stats" TO "anon";
+GRANT ALL ON TABLE "public"."member_daily_stats" TO "authenticated";
+GRANT ALL ON TABLE "public"."member_daily_stats" TO "service_role";
+
+GRANT ALL ON TABLE "public"."member_active_days" TO "anon";
+GRANT ALL ON TABLE "public"."member_active_days" TO "authenticated";
+GRANT ALL ON TABLE "public"."member_active_days" TO "service_role";
@@ -0,0 +1,26 @@
+-- Курсор фоновой сверки списков с Telegram: (chat_id, members.id) последнего проверенного участника
+CREATE TABLE IF NOT EXISTS "public"."reconciler_state" (
+    "name" "text" NOT NULL,
+    "chat_id" bigint,
+    "member_id" bigint DEFAULT 0 NOT NULL,
+    "updated_at" timestamp with time zone DEFAULT "now"() NOT NULL
+);
+
+
+ALTER TABLE "public"."reconciler_state" OWNER TO "postgres";
+
+
+ALTER TABLE ONLY "public"."reconciler_state"
+    ADD CONSTRAINT "reconciler_state_pkey" PRIMARY KEY ("name");
+
+
+ALTER TABLE "public"."reconciler_state" ENABLE ROW LEVEL SECURITY;
+
+
+-- Сверка идёт по чату страницами по id
+CREATE INDEX IF NOT EXISTS "members_chat_id_id_idx" ON "public"."members" USING "btree" ("chat_id", "id");
+
+
+GRANT ALL ON TABLE "public"."reconciler_state" TO "anon";
+GRANT ALL ON TABLE "public"."reconciler_state" TO "authenticated";
+GRANT ALL ON TABLE "public"."reconciler_state" TO "service_role";
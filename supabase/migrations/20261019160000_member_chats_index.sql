@@ -0,0 +1,2 @@
+-- Inline-поиск: в каких чатах состоит пользователь
+CREATE INDEX IF NOT EXISTS "members_user_id_idx" ON "public"."members" USING "btree" ("user_id");
@@ -0,0 +1,6 @@
+-- Поиск по @username без учёта регистра (как в кэше участников) с использованием индекса
+ALTER TABLE "public"."members"
+    ADD COLUMN IF NOT EXISTS "username_lower" "text" GENERATED ALWAYS AS ("lower"("username")) STORED;
+
+
+CREATE INDEX IF NOT EXISTS "members_chat_username_lower_idx" ON "public"."members" USING "btree" ("chat_id", "username_lower");
@@ -0,0 +1,14 @@
+import os
+import sys
+
+from pathlib import Path
+
+# Модули бота плоские и импортируются из каталога bot/, как при запуске main.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bot"))
+
+# config.py требует токен и по умолчанию ждёт Supabase — тестам хватает SQLite
+os.environ.setdefault("BOT_TOKEN", "123456:TESTTESTTESTTESTTESTTESTTESTTESTTES")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+os.environ.setdefault("METRICS_PORT", "0")
+os.environ.setdefault("TRACE_SAMPLE_RATE", "0")
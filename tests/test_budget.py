@@ -0,0 +1,55 @@
+import asyncio
+
+import budget
+from budget import RequestBudget
+
+def _clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(budget.time, "monotonic", lambda: now[0])
+    return now
+
+def test_spend_and_refill(monkeypatch):
+    now = _clock(monkeypatch)
+    bucket = RequestBudget(rate=10)
+
+    for _ in range(10):
+        bucket.spend()
+    assert bucket.tokens == 0
+
+    now[0] += 0.5
+    bucket._refill()
+    assert bucket.tokens == 5
+
+    # Больше burst не копится
+    now[0] += 60
+    bucket._refill()
+    assert bucket.tokens == 10
+
+def test_debt_is_capped(monkeypatch):
+    _clock(monkeypatch)
+    bucket = RequestBudget(rate=10)
+    for _ in range(100):
+        bucket.spend()
+    assert bucket.tokens == -10
+
+def test_wait_sleeps_until_token_or_pause_ends(monkeypatch):
+    now = _clock(monkeypatch)
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(round(seconds, 3))
+        now[0] += seconds
+
+    monkeypatch.setattr(budget.asyncio, "sleep", fake_sleep)
+    bucket = RequestBudget(rate=10)
+
+    asyncio.run(bucket.wait("test"))
+    assert slept == []
+
+    bucket.tokens = -1
+    asyncio.run(bucket.wait("test"))
+    assert slept == [0.2]
+
+    bucket.pause(3)
+    asyncio.run(bucket.wait("test"))
+    assert slept == [0.2, 3]
@@ -0,0 +1,20 @@
+from helpers import parse_bulk_pairs
+
+def test_pairs_after_command():
+    pairs, invalid = parse_bulk_pairs("/setname\n@Alice_One Алиса Петрова\n  @bobby_two   Боб  \n")
+    assert pairs == [("alice_one", "Алиса Петрова"), ("bobby_two", "Боб")]
+    assert invalid == []
+
+def test_pair_on_command_line():
+    pairs, invalid = parse_bulk_pairs("/addrole @alice_one модератор\n@bobby_two бухгалтер")
+    assert pairs == [("alice_one", "модератор"), ("bobby_two", "бухгалтер")]
+    assert invalid == []
+
+def test_invalid_lines_are_reported():
+    pairs, invalid = parse_bulk_pairs("/setname\n@abc коротко\n@alice_one\nбез собаки\n\n@bobby_two Боб")
+    assert pairs == [("bobby_two", "Боб")]
+    assert invalid == ["@abc коротко", "@alice_one", "без собаки"]
+
+def test_command_only():
+    assert parse_bulk_pairs("/setname") == ([], [])
+    assert parse_bulk_pairs("") == ([], [])
@@ -0,0 +1,76 @@
+import base64
+import time
+
+import pytest
+
+import callbacks
+from callbacks import (
+    CALLBACK_DATA_LIMIT, CALLBACK_PREFIX, INLINE_VALUE_LIMIT, VALUE_STORE,
+    ActionExpired, decode_action, encode_action,
+)
+
+CHAT_ID = -1001234567890
+USER_ID = 7_123_456_789
+
+def test_round_trip_ascii():
+    data = encode_action(CHAT_ID, "name", USER_ID, "Alice")
+    assert len(data.encode("utf-8")) <= CALLBACK_DATA_LIMIT
+    assert decode_action(CHAT_ID, data) == ("name", USER_ID, "Alice")
+
+def test_cyrillic_value_stays_inline():
+    value = "Старший модератор чата"
+    assert len(value) <= INLINE_VALUE_LIMIT
+
+    VALUE_STORE.clear()
+    data = encode_action(CHAT_ID, "role", USER_ID, value)
+
+    assert len(data.encode("utf-8")) <= CALLBACK_DATA_LIMIT
+    assert not VALUE_STORE
+    assert decode_action(CHAT_ID, data) == ("role", USER_ID, value)
+
+def test_long_and_non_cp1251_values_go_to_store():
+    for value in ("x" * (INLINE_VALUE_LIMIT + 1), "🔥" * 10):
+        data = encode_action(CHAT_ID, "role", USER_ID, value)
+        assert len(data.encode("utf-8")) <= CALLBACK_DATA_LIMIT
+        assert decode_action(CHAT_ID, data) == ("role", USER_ID, value)
+
+def test_negative_and_large_user_ids():
+    for user_id in (1, 2 ** 52, -5):
+        data = encode_action(CHAT_ID, "name", user_id, "v")
+        assert decode_action(CHAT_ID, data) == ("name", user_id, "v")
+
+def test_tampered_data_is_rejected():
+    data = encode_action(CHAT_ID, "name", USER_ID, "Alice")
+    payload = data[len(CALLBACK_PREFIX):]
+    raw = bytearray(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+
+    # Меняем сами байты, а не символ base64: последний символ частично состоит из паддинга
+    for index in (0, len(raw) // 2, len(raw) - 1):
+        forged = bytearray(raw)
+        forged[index] ^= 0x01
+        forged_data = CALLBACK_PREFIX + base64.urlsafe_b64encode(bytes(forged)).rstrip(b"=").decode("ascii")
+        assert decode_action(CHAT_ID, forged_data) is None
+
+    assert decode_action(CHAT_ID, data[:10]) is None
+    assert decode_action(CHAT_ID, "su:!!!") is None
+    assert decode_action(CHAT_ID, "other:data") is None
+
+def test_other_chat_is_rejected():
+    data = encode_action(CHAT_ID, "name", USER_ID, "Alice")
+    assert decode_action(CHAT_ID + 1, data) is None
+
+def test_expired_button(monkeypatch):
+    data = encode_action(CHAT_ID, "name", USER_ID, "Alice", ttl=60)
+    now = time.time()
+    monkeypatch.setattr(callbacks.time, "time", lambda: now + 180)
+
+    with pytest.raises(ActionExpired):
+        decode_action(CHAT_ID, data)
+
+def test_evicted_value():
+    value = "x" * (INLINE_VALUE_LIMIT + 1)
+    data = encode_action(CHAT_ID, "role", USER_ID, value)
+    VALUE_STORE.clear()
+
+    with pytest.raises(ActionExpired):
+        decode_action(CHAT_ID, data)
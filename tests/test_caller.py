@@ -0,0 +1,43 @@
+import asyncio
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+import caller
+from caller import MENTIONS_PER_MESSAGE, call_parts, send_paced
+
+class FakeBot:
+    """Отклоняет вызовы send_message с номерами из errors (с нуля), остальные тексты запоминает."""
+
+    def __init__(self, errors: dict):
+        self.errors = errors
+        self.calls = 0
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        error = self.errors.get(self.calls)
+        self.calls += 1
+        if error:
+            raise error
+        self.sent.append(text)
+
+def _send(errors: dict, parts: list[str], monkeypatch) -> tuple[tuple[int, int], FakeBot]:
+    monkeypatch.setattr(caller, "CALL_INTERVAL", 0)
+    bot = FakeBot(errors)
+    return asyncio.run(send_paced(bot, 1, None, parts)), bot
+
+def test_rejected_part_is_skipped(monkeypatch):
+    result, bot = _send({1: TelegramBadRequest(None, "bad")}, ["a", "b", "c"], monkeypatch)
+    assert result == (2, 1)
+    assert bot.sent == ["a", "c"]
+
+def test_forbidden_stops_the_call(monkeypatch):
+    result, bot = _send({1: TelegramForbiddenError(None, "kicked")}, ["a", "b", "c"], monkeypatch)
+    assert result == (1, 2)
+    assert bot.sent == ["a"]
+
+def test_call_parts_respect_mention_limit():
+    members = [{"user_id": i, "full_name": f"Участник {i}"} for i in range(MENTIONS_PER_MESSAGE * 2 + 1)]
+    parts = call_parts("Все", "сбор", members)
+    assert len(parts) == 3
+    assert all(part.count("tg://user?id=") <= MENTIONS_PER_MESSAGE for part in parts)
+    assert "сбор" in parts[0] and "сбор" not in parts[1]
@@ -0,0 +1,127 @@
+import asyncio
+import io
+
+from aiogram import types
+
+import db
+from export import member_columns, render_csv, render_txt
+from handlers import importer
+from handlers.importer import iter_csv_rows, iter_txt_rows, txt_values
+
+MEMBERS = [
+    {"user_id": 1, "username": "alice_one", "full_name": "Alice", "external_name": "Алиса", "extra_role": "модератор"},
+    {"user_id": 2, "username": "bobby_two", "full_name": "Bob", "external_name": "", "extra_role": "бухгалтер"},
+    {"user_id": 3, "username": "carol_three", "full_name": "Carol", "external_name": "Кэрол", "extra_role": ""},
+    {"user_id": 4, "username": "dave_four", "full_name": "Dave", "external_name": "", "extra_role": ""},
+    {"user_id": 5, "username": "erin_five", "full_name": "Erin", "external_name": "Эрин — старшая", "extra_role": ""},
+]
+
+def _lines(data: bytes):
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", newline="")
+
+def _txt_round_trip(members, current=None):
+    columns = member_columns(members)
+    rows = [row for row in iter_txt_rows(_lines(render_txt(columns, range(len(members))))) if row]
+    by_username = {m["username"]: m for m in current or members}
+    return {row["username"]: txt_values(row["fields"], by_username[row["username"]]) for row in rows}
+
+def test_txt_round_trip_keeps_fields_apart():
+    values = _txt_round_trip(MEMBERS)
+    assert values == {
+        "alice_one": ("Алиса", "модератор"),
+        "bobby_two": ("", "бухгалтер"),
+        "carol_three": ("Кэрол", ""),
+        "dave_four": ("", ""),
+        "erin_five": ("Эрин — старшая", ""),
+    }
+
+def test_txt_role_only_into_empty_member():
+    # Роль без имени не превращается во внешнее имя, даже если у участника ещё ничего нет
+    blank = [dict(m, external_name="", extra_role="") for m in MEMBERS]
+    assert _txt_round_trip(MEMBERS, blank)["bobby_two"] == ("", "бухгалтер")
+
+def test_txt_single_field_matching_current_role():
+    # Старые выгрузки писали роль без имени одним полем
+    member = {"external_name": "", "extra_role": "бухгалтер"}
+    assert txt_values(["бухгалтер"], member) == ("", "бухгалтер")
+    assert txt_values(["Борис"], member) == ("Борис", "")
+
+def test_txt_unsplittable_fields_are_rejected():
+    member = {"external_name": "", "extra_role": ""}
+    assert txt_values(["а", "б", "в"], member) is None
+    assert txt_values(["а — б", "в"], {"external_name": "а — б", "extra_role": ""}) == ("а — б", "в")
+
+def test_txt_lines_without_username_are_invalid():
+    rows = list(iter_txt_rows(["📋 Список участников:", "", "1. Без ника — роль", "2. Ann (@ann_user)"]))
+    assert rows == [None, {"username": "ann_user", "fields": []}]
+
+def test_csv_round_trip():
+    columns = member_columns(MEMBERS)
+    rows = list(iter_csv_rows(_lines(render_csv(columns, range(len(MEMBERS))))))
+    assert [(r["user_id"], r["username"], r["external_name"], r["extra_role"]) for r in rows] == [
+        (m["user_id"], m["username"], m["external_name"], m["extra_role"]) for m in MEMBERS
+    ]
+
+def test_csv_rows_without_key_are_invalid():
+    rows = list(iter_csv_rows(["Username,External_Name\n", ",Имя\n", "@ann_user,Анна\n"]))
+    assert rows[0] is None
+    assert rows[1] == {"username": "ann_user", "user_id": None, "external_name": "Анна", "extra_role": ""}
+
+class Status:
+    def __init__(self):
+        self.texts = []
+
+    async def edit_text(self, text, **kwargs):
+        self.texts.append(text)
+
+def _run_import(monkeypatch, data: bytes, file_size=None, chunk=7):
+    streamed = []
+
+    async def get_file(file_id):
+        return types.File(file_id=file_id, file_unique_id="u", file_size=file_size, file_path="documents/a.txt")
+
+    async def stream_content(url, **kwargs):
+        for start in range(0, len(data), chunk):
+            streamed.append(start)
+            yield data[start:start + chunk]
+
+    monkeypatch.setattr(importer.bot, "get_file", get_file)
+    monkeypatch.setattr(importer.bot.session, "stream_content", stream_content)
+    monkeypatch.setattr(importer, "schedule_roster_refresh", lambda *args: None)
+
+    document = types.Document(file_id="f", file_unique_id="u", file_name="members.txt")
+    status = Status()
+
+    asyncio.run(importer.import_file(-700, document, status))
+    return status, streamed
+
+def test_import_file_applies_export(monkeypatch):
+    class User:
+        is_bot = False
+
+        def __init__(self, user_id, username):
+            self.id, self.username, self.full_name = user_id, username, username
+
+    db.upsert_user(-700, User(1, "alice_one"))
+    db.upsert_user(-700, User(2, "bobby_two"))
+
+    data = (
+        "📋 Список участников:\n\n"
+        "1. Alice (@alice_one) — Алиса\n"
+        "2. Bob (@bobby_two) —  — бухгалтер\n"
+        "3. Nobody (@nobody_here) — x\n"
+    ).encode("utf-8")
+    status, _ = _run_import(monkeypatch, data)
+
+    assert "Применено: <b>2</b>" in status.texts[-1]
+    assert "Не найдены в списке: <b>1</b>" in status.texts[-1]
+    values = {m["user_id"]: (m["external_name"], m["extra_role"]) for m in db.get_members(-700)}
+    assert values == {1: ("Алиса", ""), 2: ("", "бухгалтер")}
+
+def test_import_file_stops_download_over_limit(monkeypatch):
+    monkeypatch.setattr(importer, "IMPORT_MAX_SIZE", 20)
+    status, streamed = _run_import(monkeypatch, b"x" * 100, chunk=10)
+
+    assert status.texts == [importer.TOO_BIG]
+    # Размер заранее не известен: загрузка обрывается на первой части сверх лимита
+    assert streamed == [0, 10, 20]
@@ -0,0 +1,41 @@
+import asyncio
+
+from locks import member_lock, member_locks
+
+def test_overlapping_batches_do_not_deadlock():
+    order = []
+
+    async def batch(name, user_ids):
+        async with member_locks(1, user_ids):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        # Без сортировки ключей эти пакеты взяли бы замки навстречу друг другу
+        await asyncio.wait_for(
+            asyncio.gather(batch("a", [1, 2, 3]), batch("b", [3, 2, 1]), batch("c", [2, 2])),
+            timeout=1,
+        )
+
+    asyncio.run(main())
+    assert sorted(order) == ["a", "b", "c"]
+
+def test_batch_waits_for_single_member_lock():
+    events = []
+
+    async def single():
+        async with member_lock(1, 2):
+            events.append("single")
+            await asyncio.sleep(0.01)
+            events.append("single done")
+
+    async def batch():
+        await asyncio.sleep(0)
+        async with member_locks(1, [5, 2]):
+            events.append("batch")
+
+    async def main():
+        await asyncio.gather(single(), batch())
+
+    asyncio.run(main())
+    assert events == ["single", "single done", "batch"]
@@ -0,0 +1,67 @@
+import json
+import logging
+import queue
+import sys
+
+import logger as log_module
+from logger import JsonFormatter, NonBlockingQueueHandler, RateLimitFilter
+
+def _record(msg="шаблон %s", level=logging.INFO, exc_info=None):
+    return logging.LogRecord("test", level, __file__, 1, msg, ("x",), exc_info)
+
+def _clock(monkeypatch, start=1000.0):
+    now = [start]
+    monkeypatch.setattr(log_module.time, "monotonic", lambda: now[0])
+    return now
+
+def test_burst_per_window(monkeypatch):
+    now = _clock(monkeypatch)
+    limit = RateLimitFilter(window=10, burst=2)
+
+    assert [limit.filter(_record()) for _ in range(5)] == [True, True, False, False, False]
+    assert limit.suppressed_total == 3
+
+    # Первая запись следующего окна несёт число подавленных
+    now[0] += 10
+    record = _record()
+    assert limit.filter(record)
+    assert record.suppressed == 3
+    assert "3" in record.getMessage()
+
+def test_errors_and_other_keys_are_not_limited(monkeypatch):
+    _clock(monkeypatch)
+    limit = RateLimitFilter(window=10, burst=1)
+
+    assert limit.filter(_record())
+    assert not limit.filter(_record())
+    assert limit.filter(_record(level=logging.ERROR))
+    assert limit.filter(_record(msg="другой шаблон"))
+
+def test_flush_reports_quiet_end_of_burst(monkeypatch):
+    now = _clock(monkeypatch)
+    limit = RateLimitFilter(window=10, burst=1)
+    for _ in range(4):
+        limit.filter(_record())
+
+    assert limit.flush() == []
+    now[0] += 10
+    assert limit.flush() == [("test", "шаблон %s", 3)]
+    # Окно закрыто: следующая запись начинает новое без старого счёта
+    record = _record()
+    assert limit.filter(record)
+    assert not hasattr(record, "suppressed")
+
+def test_queued_exception_is_rendered_once():
+    try:
+        raise ValueError("сбой")
+    except ValueError:
+        record = _record(level=logging.ERROR, exc_info=sys.exc_info())
+
+    handler = NonBlockingQueueHandler(queue.Queue())
+    prepared = handler.prepare(record)
+    assert prepared.exc_info is None
+    assert "ValueError: сбой" in prepared.exc_text
+
+    entry = json.loads(JsonFormatter().format(prepared))
+    assert "ValueError: сбой" in entry["exc"]
+    assert "ValueError: сбой" in logging.Formatter().format(prepared)
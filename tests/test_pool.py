@@ -0,0 +1,20 @@
+import asyncio
+
+import pool
+from export import member_columns, render_export
+
+ROWS = [
+    {"user_id": i, "username": f"user_{i:03}", "full_name": f"Имя {i}", "external_name": "", "extra_role": ""}
+    for i in range(50)
+]
+
+def test_run_cpu_renders_in_worker_process():
+    columns = member_columns(ROWS)
+
+    async def main():
+        try:
+            return await pool.run_cpu("export", render_export, "csv", columns, "u")
+        finally:
+            pool.shutdown_pool()
+
+    assert asyncio.run(main()) == render_export("csv", columns, "u")
@@ -0,0 +1,36 @@
+import db
+import search
+from search import search_chats
+
+class User:
+    def __init__(self, user_id: int, username: str, full_name: str):
+        self.id = user_id
+        self.username = username
+        self.full_name = full_name
+        self.is_bot = False
+
+def _fill():
+    db.upsert_user(-101, User(1, "ivan_petrov", "Иван Петров"))
+    db.upsert_user(-101, User(2, "maria_ivanova", "Мария Иванова"))
+    db.upsert_user(-102, User(3, "ivan_sidorov", "Пётр Иванов"))
+
+def test_ranks_across_chats():
+    _fill()
+    found = search_chats([-101, -102], "ivan", 10)
+    # Начало слова выше подстроки, даже если подстрока нашлась в первом чате
+    assert [(rank, row.user_id) for rank, _, row in found] == [(1, 1), (1, 3), (2, 2)]
+    assert [row.user_id for _, _, row in search_chats([-101, -102], "ivan_sidorov", 10)] == [3]
+    assert len(search_chats([-101, -102], "ivan", 2)) == 2
+
+def test_cached_chats_are_not_reloaded(monkeypatch):
+    _fill()
+    search_chats([-101, -102], "иван", 10)
+
+    calls = []
+    monkeypatch.setattr(search, "get_members", lambda chat_id: calls.append(chat_id))
+    for chat_id in (-101, -102):
+        db.invalidate_members(chat_id)
+
+    found = search_chats([-101, -102], "петров", 10)
+    assert calls == []
+    assert [row.user_id for _, _, row in found] == [1]
@@ -0,0 +1,66 @@
+import pytest
+
+from storage.sqlite_backend import MAX_PARAMS, SqliteRepository
+
+CHAT_ID = -100500
+COUNT = MAX_PARAMS * 2 + 17
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = SqliteRepository(str(tmp_path / "test.db"))
+    repo.upsert_members([
+        {
+            "chat_id": CHAT_ID,
+            "user_id": user_id,
+            "username": f"User{user_id}",
+            "full_name": f"Name {user_id}",
+        }
+        for user_id in range(COUNT)
+    ])
+    return repo
+
+def test_upsert_members_past_max_params(repo):
+    assert len(repo.list_members(CHAT_ID)) == COUNT
+
+def test_members_by_ids_past_max_params_keeps_id_order(repo):
+    rows = repo.members_by_ids(CHAT_ID, list(reversed(range(COUNT))), "user_id")
+
+    assert [row["user_id"] for row in rows] == list(range(COUNT))
+    assert all("_order" not in row for row in rows)
+
+def test_members_by_usernames_past_max_params_ignores_case(repo):
+    usernames = [f"user{user_id}".upper() for user_id in range(COUNT)]
+
+    rows = repo.members_by_usernames(CHAT_ID, usernames, "user_id, username")
+
+    assert sorted(row["user_id"] for row in rows) == list(range(COUNT))
+
+def test_delete_members_past_max_params(repo):
+    repo.delete_members(CHAT_ID, list(range(COUNT - 1)))
+
+    assert [row["user_id"] for row in repo.list_members(CHAT_ID)] == [COUNT - 1]
+
+def test_chat_versions_past_max_params(repo):
+    versions = repo.chat_versions([CHAT_ID, *range(1, COUNT)])
+
+    assert versions[CHAT_ID] > 0
+    assert len(versions) == 1
+
+def test_tmplist_items_past_max_params(repo):
+    from datetime import datetime, timedelta, timezone
+
+    tmplist_id = repo.create_tmplist(CHAT_ID, 1, "raid", datetime.now(timezone.utc) + timedelta(hours=1))
+    user_ids = list(range(COUNT))
+
+    assert repo.add_tmplist_items(tmplist_id, user_ids) == COUNT
+    assert repo.add_tmplist_items(tmplist_id, user_ids[:10]) == 0
+
+    repo.remove_tmplist_items(tmplist_id, user_ids[:-3])
+    assert sorted(repo.tmplist_user_ids(tmplist_id)) == user_ids[-3:]
+
+def test_empty_lists_do_not_query(repo):
+    assert repo.members_by_ids(CHAT_ID, []) == []
+    assert repo.members_by_usernames(CHAT_ID, []) == []
+    assert repo.chat_versions([]) == {}
+    assert repo.add_tmplist_items("missing", []) == 0
+    repo.delete_members(CHAT_ID, [])
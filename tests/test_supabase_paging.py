@@ -0,0 +1,37 @@
+import sys
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+from storage.supabase_backend import SELECT_PAGE, SupabaseRepository
+
+# FakePostgrest из бенчмарка: PostgREST в памяти, с тем же ограничением max_rows
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bench"))
+from fakes import FakePostgrest  # noqa: E402
+
+CHAT_ID = -900
+COUNT = SELECT_PAGE * 2 + 5
+
+def _repo() -> tuple[SupabaseRepository, FakePostgrest]:
+    fake = FakePostgrest(max_rows=SELECT_PAGE)
+    repo = SupabaseRepository("http://postgrest.test", "test.test.test")
+    repo.client.postgrest.session._transport = fake.transport()
+    fake.seed("members", [
+        {"chat_id": CHAT_ID, "user_id": i, "username": f"user_{i}", "full_name": "", "external_name": "", "extra_role": ""}
+        for i in range(1, COUNT + 1)
+    ])
+    return repo, fake
+
+def test_list_members_reads_past_max_rows():
+    repo, fake = _repo()
+    rows = repo.list_members(CHAT_ID, "user_id, username")
+
+    assert [row["user_id"] for row in rows] == list(range(1, COUNT + 1))
+    # id добавлялся только для страниц и в ответ не попадает
+    assert set(rows[0]) == {"user_id", "username"}
+    assert fake.calls[("members", "GET")] == 3
+
+def test_changed_since_reads_past_max_rows():
+    repo, _ = _repo()
+    since = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    assert len(repo.members_changed_since(CHAT_ID, since, "id, user_id")) == COUNT
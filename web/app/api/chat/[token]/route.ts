@@ -15,6 +15,19 @@ export async function GET(req: Request) {
     process.env.SUPABASE_SERVICE_ROLE_KEY!,
   );
 
+  // Версия списка чата: дешёвый запрос, позволяющий ответить 304 без выборки участников
+  const { data: version } = await supabase.rpc("chat_version_for_token", {
+    p_token: token,
+  });
+  const etag = version != null ? `W/"${token}:${version}"` : null;
+
+  if (etag && req.headers.get("if-none-match") === etag) {
+    return new NextResponse(null, {
+      status: 304,
+      headers: { ETag: etag, "Cache-Control": "no-cache" },
+    });
+  }
+
   const { data, error } = await supabase.rpc("members_for_token", {
     p_token: token,
   });
@@ -23,5 +36,8 @@ export async function GET(req: Request) {
     return NextResponse.json({ error: error.message }, { status: 500 });
   }
 
-  return NextResponse.json({ members: data ?? [] });
+  return NextResponse.json(
+    { members: data ?? [] },
+    { headers: etag ? { ETag: etag, "Cache-Control": "no-cache" } : {} },
+  );
 }